@@ -1,12 +1,19 @@
 #!/usr/bin/env python
 """Run the MinerU Center server."""
 
+import os
+import subprocess
+import sys
+
 import uvicorn
 from app.config import settings
 
 
 def run():
     """Run the server."""
+    if settings.workers > 1:
+        run_workers()
+        return
     uvicorn.run(
         "app.main:app",
         host=settings.host,
@@ -15,5 +22,34 @@ def run():
     )
 
 
+def run_workers():
+    """Run settings.workers HTTP worker processes plus one scheduler process.
+
+    All of them run in cluster mode on the shared SQLite queue: the workers
+    accept, follow and serve tasks without dispatching, and the scheduler
+    process alone owns dispatch and the instance pool. It listens on
+    127.0.0.1:scheduler_port for its own /metrics; the workers forward
+    /api/stats, the stats WebSocket and the queue listings to it.
+    """
+    os.environ["MINERU_CENTER_CLUSTER_MODE"] = "true"
+    scheduler_port = settings.scheduler_port or settings.port + 1
+    scheduler = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(scheduler_port)],
+        env={**os.environ, "MINERU_CENTER_REPLICA_ID": settings.replica_id or f"scheduler-{os.getpid()}"}
+    )
+    os.environ["MINERU_CENTER_DISPATCH"] = "false"
+    os.environ["MINERU_CENTER_SCHEDULER_URL"] = f"http://127.0.0.1:{scheduler_port}"
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.host,
+            port=settings.port,
+            workers=settings.workers
+        )
+    finally:
+        scheduler.terminate()
+        scheduler.wait()
+
+
 if __name__ == "__main__":
     run()
@@ -2,5 +2,9 @@ from .tasks import router as tasks_router
 from .instances import router as instances_router
 from .config import router as config_router
 from .stats import router as stats_router
+from .cache import router as cache_router
+from .metrics import router as metrics_router
+from .batches import router as batches_router
 
-__all__ = ["tasks_router", "instances_router", "config_router", "stats_router"]
+__all__ = ["tasks_router", "instances_router", "config_router", "stats_router", "cache_router", "metrics_router",
+           "batches_router"]
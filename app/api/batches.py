@@ -0,0 +1,301 @@
+import io
+import json
+import logging
+import os
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Annotated, Any, Iterator
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import FormData, UploadFile
+from starlette.formparsers import MultiPartException
+
+from ..config import settings
+from ..models.batch import BatchResponse
+from ..models.config import CenterConfig
+from ..models.task import Task, TERMINAL_STATUSES
+from ..services.admission import AdmissionController, AdmissionRejected, client_id, tenant_id
+from ..services.result_store import RESULT_PARTS, ResultStore, iter_decompressed
+from ..services.scheduler import Scheduler
+from ..services.spool import FileSpool, is_archive
+from ..services import database
+
+router = APIRouter(prefix="/api/batches", tags=["batches"])
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("pending", "running", "retrying")
+
+
+def get_scheduler() -> Scheduler:
+    from ..main import scheduler
+    return scheduler
+
+
+def get_config() -> CenterConfig:
+    from ..main import config
+    return config
+
+
+def get_file_spool() -> FileSpool:
+    from ..main import file_spool
+    return file_spool
+
+
+def get_result_store() -> ResultStore:
+    from ..main import result_store
+    return result_store
+
+
+def get_admission() -> AdmissionController:
+    from ..main import admission
+    return admission
+
+
+def _batch_response(batch_id: str, name: str | None, created_at: str, total: int,
+                    counts: dict[str, int]) -> BatchResponse:
+    finished = sum(n for status, n in counts.items() if status in TERMINAL_STATUSES)
+    return BatchResponse(
+        batch_id=batch_id, name=name, created_at=created_at, total=total,
+        counts=counts, done=finished >= total
+    )
+
+
+# Form fields of POST /api/batches besides files, with their defaults (the /file_parse options)
+BATCH_FORM_FIELDS = {
+    "name": None,
+    "priority": "5",
+    "return_middle_json": "false",
+    "return_model_output": "false",
+    "return_md": "true",
+    "return_images": "false",
+    "start_page_id": "0",
+    "end_page_id": "99999",
+    "parse_method": "auto",
+    "lang_list": "ch",
+    "backend": "pipeline",
+}
+
+_BATCH_FORM_SCHEMA = {
+    "type": "object",
+    "required": ["files"],
+    "properties": {
+        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+        **{field: {"type": "string", "default": default} for field, default in BATCH_FORM_FIELDS.items()},
+    },
+}
+
+
+@router.post("", response_model=BatchResponse, openapi_extra={
+    "requestBody": {"required": True, "content": {"multipart/form-data": {"schema": _BATCH_FORM_SCHEMA}}}
+})
+async def create_batch(
+    request: Request,
+    sched: Annotated[Scheduler, Depends(get_scheduler)],
+    cfg: Annotated[CenterConfig, Depends(get_config)],
+    spool: Annotated[FileSpool, Depends(get_file_spool)],
+    admission: Annotated[AdmissionController, Depends(get_admission)],
+):
+    """Submit many documents as one batch.
+
+    Accepts up to ``MINERU_CENTER_BATCH_MAX_FILES`` ``files`` (PDFs or
+    images, and zip/tar archives whose PDF and image members are each a
+    task) sharing the MinerU /file_parse options. The form is parsed here
+    rather than by FastAPI, whose parser stops at 1000 files. All task rows
+    are written in one transaction and queued in one pass. Admission control
+    counts every document: the batch is rejected whole (503 or 429 with
+    Retry-After) if they don't all fit.
+    """
+    try:
+        async with request.form(max_files=settings.batch_max_files) as form:
+            return await _create_batch(request, form, sched, cfg, spool, admission)
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+
+async def _create_batch(request: Request, form: FormData, sched: Scheduler, cfg: CenterConfig,
+                        spool: FileSpool, admission: AdmissionController) -> BatchResponse:
+    files = [upload for upload in form.getlist("files") if isinstance(upload, UploadFile)]
+    if not files:
+        raise HTTPException(status_code=400, detail="No files in upload")
+    fields = {field: form.get(field, default) for field, default in BATCH_FORM_FIELDS.items()}
+    for field, value in fields.items():
+        if isinstance(value, UploadFile):
+            raise HTTPException(status_code=400, detail=f"Form field {field} must not be a file")
+    name = fields.pop("name")
+    try:
+        priority = int(fields.pop("priority"))
+    except ValueError:
+        priority = 0
+    if not 1 <= priority <= 10:
+        raise HTTPException(status_code=422, detail="priority must be an integer from 1 to 10")
+
+    if not cfg.enable_priority:
+        priority = 5
+    tenant = tenant_id(request, admission.trust_tenant_header)
+    try:
+        admission.check_capacity(priority)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+
+    # (file name, file_ref, size, pages) per document
+    documents: list[tuple[str, str, int, int | None]] = []
+
+    def release_all() -> None:
+        for _, file_ref, _, _ in documents:
+            spool.release(file_ref)
+
+    try:
+        for upload in files:
+            if is_archive(upload.filename):
+                documents.extend(await spool.save_archive(upload))
+            else:
+                documents.append((upload.filename, *await spool.save_upload(upload)))
+    except ValueError as e:
+        release_all()
+        raise HTTPException(status_code=400, detail=str(e))
+    if not documents:
+        raise HTTPException(status_code=400, detail="No documents in upload")
+    try:
+        admission.admit(client_id(request), priority, len(documents), tenant=tenant)
+    except AdmissionRejected as e:
+        release_all()
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+
+    options = fields
+    batch_id = str(uuid.uuid4())
+    tasks = [
+        Task(
+            payload={"file_name": file_name, "file_ref": file_ref, "file_size": size, "file_pages": pages, **options},
+            priority=priority,
+            batch_id=batch_id,
+            tenant=tenant
+        )
+        for file_name, file_ref, size, pages in documents
+    ]
+    # Documents parsed before with the same options complete from the result cache
+    queued = [task for task in tasks if not await sched.complete_from_cache(task)]
+
+    created_at = datetime.now().isoformat()
+    try:
+        await database.save_batch(batch_id, name, created_at, options, tasks)
+    except Exception as e:
+        logger.error(f"Failed to save batch {batch_id}: {e}")
+        for task in queued:
+            spool.release(task.payload["file_ref"])
+        raise HTTPException(status_code=500, detail="Failed to save batch")
+
+    await sched.submit(queued)
+    logger.info(f"Batch {batch_id}: {len(queued)} tasks queued, {len(tasks) - len(queued)} served from cache")
+
+    counts: dict[str, int] = {}
+    for task in tasks:
+        counts[task.status] = counts.get(task.status, 0) + 1
+    return _batch_response(batch_id, name, created_at, len(tasks), counts)
+
+
+@router.get("/{batch_id}", response_model=BatchResponse)
+async def get_batch(batch_id: str):
+    """Get batch progress: task counts per status."""
+    batch = await database.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _batch_response(batch["id"], batch["name"], batch["created_at"], batch["total"], batch["counts"])
+
+
+@router.get("/{batch_id}/tasks")
+async def get_batch_tasks(batch_id: str):
+    """List the batch's tasks (id, status, file_name, error) in submission order."""
+    tasks = await database.get_batch_tasks(batch_id)
+    if not tasks and await database.get_batch(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"batch_id": batch_id, "tasks": tasks}
+
+
+@router.delete("/{batch_id}")
+async def cancel_batch(
+    batch_id: str,
+    sched: Annotated[Scheduler, Depends(get_scheduler)]
+):
+    """Cancel every task of the batch that has not finished yet."""
+    tasks = await database.get_batch_tasks(batch_id)
+    if not tasks and await database.get_batch(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    cancelled = await sched.cancel_tasks([task["id"] for task in tasks if task["status"] in ACTIVE_STATUSES])
+    await database.flush()
+    return {"message": f"Cancelled {len(cancelled)} tasks", "batch_id": batch_id, "count": len(cancelled)}
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable write target that hands zipfile's output back to the generator."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_zip(members: list[tuple[str, str]], manifest: list[dict[str, Any]]) -> Iterator[bytes]:
+    """Zip archive of stored result parts plus manifest.json, built as it is sent."""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, path in members:
+            with archive.open(arcname, "w", force_zip64=True) as entry:
+                for chunk in iter_decompressed(path):
+                    entry.write(chunk)
+                    if data := sink.drain():
+                        yield data
+            if data := sink.drain():
+                yield data
+        archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    yield sink.drain()
+
+
+@router.get("/{batch_id}/results")
+async def download_batch_results(
+    batch_id: str,
+    store: Annotated[ResultStore, Depends(get_result_store)],
+    part: Annotated[str, Query(pattern=f"^({'|'.join(RESULT_PARTS)})$")] = "md"
+):
+    """Download the stored results of the batch's completed tasks as one zip.
+
+    Each completed task contributes one file (``part`` as in
+    ``GET /api/tasks/{id}/result``); manifest.json lists every task with its
+    status and the file holding its result.
+    """
+    tasks = await database.get_batch_tasks(batch_id)
+    if not tasks:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    extension = ".md" if part == "md" else ".json"
+    members, manifest, used = [], [], set()
+    for task in tasks:
+        path = store.path_for(task["id"], part)
+        arcname = None
+        if task["status"] == "completed" and os.path.exists(path):
+            stem = os.path.splitext(task["file_name"] or task["id"])[0]
+            arcname = f"{stem}{extension}"
+            if arcname in used:
+                arcname = f"{stem}-{task['id'][:8]}{extension}"
+            used.add(arcname)
+            members.append((arcname, path))
+        manifest.append({**task, "result": arcname})
+
+    return StreamingResponse(
+        _iter_zip(members, manifest),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="batch-{batch_id}-{part}.zip"'}
+    )
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import Annotated
+
+from ..services.result_cache import ResultCache
+
+router = APIRouter(prefix="/api/cache", tags=["cache"])
+
+
+def get_result_cache() -> ResultCache:
+    from ..main import result_cache
+    return result_cache
+
+
+@router.get("")
+async def get_cache_stats(
+    cache: Annotated[ResultCache, Depends(get_result_cache)]
+):
+    """Get result cache statistics."""
+    return cache.get_stats()
+
+
+@router.delete("")
+async def invalidate_cache(
+    cache: Annotated[ResultCache, Depends(get_result_cache)],
+    file_hash: str | None = None
+):
+    """Invalidate cached results.
+
+    Args:
+        file_hash: SHA-256 of a file; removes its entries for all parse options.
+            Without it, the whole cache is cleared.
+    """
+    if file_hash:
+        count = cache.invalidate_file(file_hash)
+    else:
+        count = cache.clear()
+    return {"message": f"Removed {count} cache entries", "count": count}
+
+
+@router.delete("/{key}")
+async def invalidate_cache_entry(
+    key: str,
+    cache: Annotated[ResultCache, Depends(get_result_cache)]
+):
+    """Invalidate a single cache entry."""
+    if cache.invalidate(key):
+        return {"message": "Cache entry removed", "key": key}
+    raise HTTPException(status_code=404, detail="Cache entry not found")
@@ -13,27 +13,39 @@ def get_instance_pool() -> InstancePool:
     return instance_pool
 
 
+def _to_response(instance: MinerUInstance, pool: InstancePool) -> InstanceResponse:
+    return InstanceResponse(
+        id=instance.id,
+        name=instance.name,
+        url=instance.url,
+        status=instance.status,
+        current_task_id=instance.current_task_id,
+        current_task_ids=sorted(instance.current_task_ids),
+        max_concurrency=instance.max_concurrency,
+        active_tasks=instance.active_tasks,
+        total_tasks=instance.total_tasks,
+        failed_tasks=instance.failed_tasks,
+        last_heartbeat=instance.last_heartbeat,
+        enabled=instance.enabled,
+        backend=str(instance.backend),
+        health_path=instance.health_path,
+        probe_latency=pool.get_probe_latency(instance.id),
+        ewma_latency=instance.ewma_latency,
+        ewma_seconds_per_page=instance.ewma_seconds_per_page,
+        breaker_state=instance.breaker_state,
+        error_rate=instance.error_rate,
+        consecutive_failures=instance.consecutive_failures,
+        breaker_transitions=instance.breaker_transitions
+    )
+
+
 @router.get("", response_model=list[InstanceResponse])
 async def list_instances(
     pool: Annotated[InstancePool, Depends(get_instance_pool)]
 ):
     """Get all instances."""
     instances = pool.get_all()
-    return [
-        InstanceResponse(
-            id=inst.id,
-            name=inst.name,
-            url=inst.url,
-            status=inst.status,
-            current_task_id=inst.current_task_id,
-            total_tasks=inst.total_tasks,
-            failed_tasks=inst.failed_tasks,
-            last_heartbeat=inst.last_heartbeat,
-            enabled=inst.enabled,
-            backend=str(inst.backend)
-        )
-        for inst in instances
-    ]
+    return [_to_response(inst, pool) for inst in instances]
 
 
 @router.post("", response_model=InstanceResponse)
@@ -45,7 +57,9 @@ async def add_instance(
     instance = pool.add_instance(
         url=instance_create.url,
         name=instance_create.name,
-        backend=instance_create.backend.value
+        backend=instance_create.backend.value,
+        max_concurrency=instance_create.max_concurrency,
+        health_path=instance_create.health_path
     )
 
     # Persist to SQLite
@@ -56,21 +70,12 @@ async def add_instance(
         enabled=instance.enabled,
         total_tasks=instance.total_tasks,
         failed_tasks=instance.failed_tasks,
-        backend=str(instance.backend)
+        backend=str(instance.backend),
+        max_concurrency=instance.max_concurrency,
+        health_path=instance.health_path
     )
 
-    return InstanceResponse(
-        id=instance.id,
-        name=instance.name,
-        url=instance.url,
-        status=instance.status,
-        current_task_id=instance.current_task_id,
-        total_tasks=instance.total_tasks,
-        failed_tasks=instance.failed_tasks,
-        last_heartbeat=instance.last_heartbeat,
-        enabled=instance.enabled,
-        backend=str(instance.backend)
-    )
+    return _to_response(instance, pool)
 
 
 @router.delete("/{instance_id}")
@@ -83,7 +88,7 @@ async def remove_instance(
     if not instance:
         raise HTTPException(status_code=404, detail="Instance not found")
 
-    if instance.current_task_id:
+    if instance.current_task_ids:
         raise HTTPException(
             status_code=400,
             detail="Cannot remove instance with running task"
@@ -108,7 +113,7 @@ async def update_instance(
         raise HTTPException(status_code=404, detail="Instance not found")
 
     # Cannot update URL while instance has a running task
-    if instance_update.url and instance.current_task_id:
+    if instance_update.url and instance.current_task_ids:
         raise HTTPException(
             status_code=400,
             detail="Cannot update URL while instance has running task"
@@ -119,7 +124,9 @@ async def update_instance(
         instance_id,
         name=instance_update.name,
         url=instance_update.url,
-        backend=instance_update.backend.value if instance_update.backend else None
+        backend=instance_update.backend.value if instance_update.backend else None,
+        max_concurrency=instance_update.max_concurrency,
+        health_path=instance_update.health_path
     )
 
     if not updated:
@@ -130,21 +137,12 @@ async def update_instance(
         instance_id,
         name=instance_update.name,
         url=instance_update.url,
-        backend=instance_update.backend.value if instance_update.backend else None
+        backend=instance_update.backend.value if instance_update.backend else None,
+        max_concurrency=instance_update.max_concurrency,
+        health_path=instance_update.health_path
     )
 
-    return InstanceResponse(
-        id=updated.id,
-        name=updated.name,
-        url=updated.url,
-        status=updated.status,
-        current_task_id=updated.current_task_id,
-        total_tasks=updated.total_tasks,
-        failed_tasks=updated.failed_tasks,
-        last_heartbeat=updated.last_heartbeat,
-        enabled=updated.enabled,
-        backend=str(updated.backend)
-    )
+    return _to_response(updated, pool)
 
 
 @router.post("/{instance_id}/enable")
@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from typing import Annotated
+
+from ..services.queue_manager import QueueManager
+from ..services.instance_pool import InstancePool
+from ..services.scheduler import Scheduler
+from ..utils.metrics import REGISTRY, gauge, histogram
+
+router = APIRouter(tags=["metrics"])
+
+# Refreshed from live state on every scrape
+QUEUE_DEPTH = gauge("mineru_center_queue_depth", "Queued tasks by priority", ("priority",))
+TENANT_QUEUE_DEPTH = gauge("mineru_center_tenant_queue_depth", "Queued tasks by tenant", ("tenant",))
+TENANT_TASKS_RUNNING = gauge("mineru_center_tenant_tasks_running", "Tasks running by tenant", ("tenant",))
+TASKS_RUNNING = gauge("mineru_center_tasks_running", "Tasks running on instances")
+TASKS_RETRYING = gauge("mineru_center_tasks_retrying", "Tasks waiting out a retry backoff")
+INSTANCE_INFO = gauge("mineru_center_instance_info", "Instance metadata (always 1)", ("instance_id", "name", "backend"))
+INSTANCE_UP = gauge("mineru_center_instance_up", "1 if the instance is idle or busy", ("instance_id",))
+INSTANCE_ACTIVE = gauge("mineru_center_instance_active_tasks", "Tasks running on the instance", ("instance_id",))
+INSTANCE_SLOTS = gauge("mineru_center_instance_slots", "Instance max_concurrency", ("instance_id",))
+INSTANCE_BREAKER_OPEN = gauge(
+    "mineru_center_instance_breaker_open", "1 if the instance's circuit breaker is not closed", ("instance_id",)
+)
+
+# Updated by event_loop_lag_loop in main.py
+EVENT_LOOP_LAG = gauge("mineru_center_event_loop_last_lag_seconds", "Latest event loop scheduling delay")
+EVENT_LOOP_LAG_SECONDS = histogram(
+    "mineru_center_event_loop_lag_seconds", "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+def get_queue_manager() -> QueueManager:
+    from ..main import queue_manager
+    return queue_manager
+
+
+def get_instance_pool() -> InstancePool:
+    from ..main import instance_pool
+    return instance_pool
+
+
+def get_scheduler() -> Scheduler:
+    from ..main import scheduler
+    return scheduler
+
+
+def collect(queue: QueueManager, pool: InstancePool, sched: Scheduler) -> None:
+    """Set the scrape-time gauges from the queue, scheduler and instance pool."""
+    QUEUE_DEPTH.clear()
+    for priority, count in queue.count_by_priority().items():
+        QUEUE_DEPTH.labels(priority).set(count)
+    TENANT_QUEUE_DEPTH.clear()
+    for tenant, count in queue.count_by_tenant().items():
+        TENANT_QUEUE_DEPTH.labels(tenant).set(count)
+    TENANT_TASKS_RUNNING.clear()
+    for tenant, count in sched.count_running_by_tenant().items():
+        TENANT_TASKS_RUNNING.labels(tenant).set(count)
+    TASKS_RUNNING.set(len(sched.get_all_running_tasks()))
+    TASKS_RETRYING.set(len(sched.get_all_retrying_tasks()))
+
+    for family in (INSTANCE_INFO, INSTANCE_UP, INSTANCE_ACTIVE, INSTANCE_SLOTS, INSTANCE_BREAKER_OPEN):
+        family.clear()
+    for inst in pool.get_all():
+        INSTANCE_INFO.labels(inst.id, inst.name, inst.backend).set(1)
+        INSTANCE_UP.labels(inst.id).set(1 if inst.status in ("idle", "busy") else 0)
+        INSTANCE_ACTIVE.labels(inst.id).set(inst.active_tasks)
+        INSTANCE_SLOTS.labels(inst.id).set(inst.max_concurrency)
+        INSTANCE_BREAKER_OPEN.labels(inst.id).set(0 if inst.breaker_state == "closed" else 1)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(
+    queue: Annotated[QueueManager, Depends(get_queue_manager)],
+    pool: Annotated[InstancePool, Depends(get_instance_pool)],
+    sched: Annotated[Scheduler, Depends(get_scheduler)]
+):
+    """Prometheus text exposition of center metrics."""
+    collect(queue, pool, sched)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,14 +1,32 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import Annotated
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Depends
+from typing import Annotated, Any
 import asyncio
 import json
+import logging
 
 from ..services.queue_manager import QueueManager
 from ..services.instance_pool import InstancePool
 from ..services.scheduler import Scheduler
+from ..services.result_cache import ResultCache
+from ..services.admission import AdmissionController
+from ..services.result_store import ResultStore
+from ..services.scheduler_proxy import SchedulerProxy, SchedulerUnavailable
 
 router = APIRouter(prefix="/api/stats", tags=["stats"])
 
+logger = logging.getLogger(__name__)
+
+# Stats WebSocket producer
+MIN_BROADCAST_INTERVAL = 0.5  # Coalesce bursts of changes into one diff
+FALLBACK_INTERVAL = 5.0  # Rebuild even without a change callback (e.g. counters)
+PROXY_POLL_INTERVAL = 1.0  # Snapshot fetches from the scheduler process (no change callbacks there)
+SEND_QUEUE_SIZE = 32  # Messages a client may lag behind before it is dropped
+QUEUED_TASKS_SHOWN = 20
+
+# Snapshot sections sent whole when changed, and sections keyed by id and diffed per item
+SCALAR_SECTIONS = ("queue", "tasks")
+KEYED_SECTIONS = ("instances", "queued_tasks", "running_tasks", "failed_tasks")
+
 
 def get_queue_manager() -> QueueManager:
     from ..main import queue_manager
@@ -25,16 +43,46 @@ def get_scheduler() -> Scheduler:
     return scheduler
 
 
+def get_result_cache() -> ResultCache:
+    from ..main import result_cache
+    return result_cache
+
+
+def get_result_store() -> ResultStore:
+    from ..main import result_store
+    return result_store
+
+
+def get_admission() -> AdmissionController:
+    from ..main import admission
+    return admission
+
+
+def get_scheduler_proxy() -> SchedulerProxy | None:
+    from ..main import scheduler_proxy
+    return scheduler_proxy
+
+
 @router.get("")
 async def get_stats(
     queue: Annotated[QueueManager, Depends(get_queue_manager)],
     pool: Annotated[InstancePool, Depends(get_instance_pool)],
-    sched: Annotated[Scheduler, Depends(get_scheduler)]
+    sched: Annotated[Scheduler, Depends(get_scheduler)],
+    cache: Annotated[ResultCache, Depends(get_result_cache)],
+    store: Annotated[ResultStore, Depends(get_result_store)],
+    admission: Annotated[AdmissionController, Depends(get_admission)],
+    proxy: Annotated[SchedulerProxy | None, Depends(get_scheduler_proxy)]
 ):
     """Get current statistics."""
+    if proxy is not None:
+        try:
+            return await proxy.get_json("/api/stats")
+        except SchedulerUnavailable:
+            raise HTTPException(status_code=502, detail="Scheduler process unavailable")
+
     instances = pool.get_all()
     running_tasks = sched.get_all_running_tasks()
-    queued_tasks = queue.get_all()
+    pending_count = queue.size()
     failed_tasks_list = sched.get_all_failed_tasks()
 
     total_tasks = sum(inst.total_tasks for inst in instances)
@@ -43,11 +91,13 @@ async def get_stats(
     idle_instances = sum(1 for inst in instances if inst.status == "idle" and inst.enabled)
     busy_instances = sum(1 for inst in instances if inst.status == "busy")
     offline_instances = sum(1 for inst in instances if inst.status in ["offline", "error"])
+    slots = pool.get_slot_usage()
 
     return {
         "queue": {
-            "pending": len(queued_tasks),
-            "running": len(running_tasks)
+            "pending": pending_count,
+            "running": len(running_tasks),
+            "retrying": len(sched.get_all_retrying_tasks())
         },
         "tasks": {
             "total": total_tasks,
@@ -58,30 +108,222 @@ async def get_stats(
             "total": len(instances),
             "idle": idle_instances,
             "busy": busy_instances,
-            "offline": offline_instances
+            "offline": offline_instances,
+            "slots_used": slots["used"],
+            "slots_total": slots["total"],
+            "slot_utilization": round(slots["used"] / slots["total"], 4) if slots["total"] else 0.0
+        },
+        "http": pool.clients.get_metrics(),
+        "cache": cache.get_stats(),
+        "results": store.get_stats(),
+        "admission": admission.get_stats(),
+        "tenants": sched.get_tenant_stats(),
+        "cluster": sched.cluster.get_stats() if sched.cluster is not None else None
+    }
+
+
+def build_snapshot(queue: QueueManager, pool: InstancePool, sched: Scheduler) -> dict[str, Any]:
+    """Dashboard state with list sections keyed by id (in display order)."""
+    instances = pool.get_all()
+    running_tasks = sched.get_all_running_tasks()
+    failed_tasks_list = sched.get_all_failed_tasks()
+
+    total_tasks = sum(inst.total_tasks for inst in instances)
+    historical_failed = sum(inst.failed_tasks for inst in instances)
+
+    return {
+        "queue": {
+            "pending": queue.size(),
+            "running": len(running_tasks),
+            "retrying": len(sched.get_all_retrying_tasks())
+        },
+        "tasks": {
+            "total": total_tasks,
+            "completed": total_tasks - historical_failed,
+            "failed": len(failed_tasks_list)  # Current pending failed tasks
+        },
+        "instances": {
+            inst.id: {
+                "id": inst.id,
+                "name": inst.name,
+                "url": inst.url,
+                "status": inst.status,
+                "current_task_id": inst.current_task_id,
+                "current_task_ids": sorted(inst.current_task_ids),
+                "max_concurrency": inst.max_concurrency,
+                "active_tasks": inst.active_tasks,
+                "breaker_state": inst.breaker_state,
+                "breaker_transitions": [t.model_dump(mode="json") for t in inst.breaker_transitions[-5:]],
+                "enabled": inst.enabled,
+                "backend": str(inst.backend)
+            }
+            for inst in instances
+        },
+        "queued_tasks": {
+            task.id: {
+                "id": task.id,
+                "priority": task.priority,
+                "effective_priority": queue.effective_priority(task),
+                "tenant": task.tenant,
+                "created_at": task.created_at.isoformat(),
+                "status": task.status
+            }
+            for task in queue.get_page(0, QUEUED_TASKS_SHOWN)
+        },
+        "running_tasks": {
+            task.id: {
+                "id": task.id,
+                "priority": task.priority,
+                "started_at": task.started_at.isoformat() if task.started_at else None,
+                "instance_id": task.instance_id,
+                "status": task.status
+            }
+            for task in running_tasks
+        },
+        "failed_tasks": {
+            task.id: {
+                "id": task.id,
+                "priority": task.priority,
+                "payload": task.payload,
+                "error": task.error,
+                "retry_count": task.retry_count,
+                "created_at": task.created_at.isoformat(),
+                "completed_at": task.completed_at.isoformat() if task.completed_at else None,
+            }
+            for task in failed_tasks_list
         }
     }
 
 
+@router.get("/snapshot", include_in_schema=False)
+async def get_snapshot(
+    queue: Annotated[QueueManager, Depends(get_queue_manager)],
+    pool: Annotated[InstancePool, Depends(get_instance_pool)],
+    sched: Annotated[Scheduler, Depends(get_scheduler)]
+):
+    """Keyed dashboard snapshot, fetched by worker processes for their stats WebSocket."""
+    return build_snapshot(queue, pool, sched)
+
+
+def full_message(snapshot: dict[str, Any]) -> dict[str, Any]:
+    """Snapshot with keyed sections turned back into lists."""
+    return {
+        key: list(value.values()) if key in KEYED_SECTIONS else value
+        for key, value in snapshot.items()
+    }
+
+
+def diff_snapshots(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
+    """Changes from old to new; empty when nothing changed.
+
+    Scalar sections are sent whole. Keyed sections become
+    ``{"upsert": [items], "remove": [ids], "order": [ids]}``.
+    """
+    changes: dict[str, Any] = {}
+    for key in SCALAR_SECTIONS:
+        if old[key] != new[key]:
+            changes[key] = new[key]
+    for key in KEYED_SECTIONS:
+        before, after = old[key], new[key]
+        upsert = [item for item_id, item in after.items() if before.get(item_id) != item]
+        remove = [item_id for item_id in before if item_id not in after]
+        if upsert or remove or list(before) != list(after):
+            changes[key] = {"upsert": upsert, "remove": remove, "order": list(after)}
+    return changes
+
+
 # WebSocket connections manager
 class ConnectionManager:
+    """Stats WebSocket clients fed by a single producer.
+
+    One producer task rebuilds the snapshot when the queue, pool or scheduler
+    report a change (at most every MIN_BROADCAST_INTERVAL), serialises the
+    diff once and hands the same text to every client's bounded outbox. A
+    client whose outbox is full is dropped; it gets a fresh snapshot when it
+    reconnects. With a scheduler proxy (worker processes) the snapshot is
+    fetched from the scheduler process every PROXY_POLL_INTERVAL instead.
+    """
+
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: dict[WebSocket, asyncio.Queue] = {}
+        self._dirty = asyncio.Event()
+        self._producer: asyncio.Task | None = None
+        self._subscribed: set[int] = set()
+        self._snapshot: dict[str, Any] | None = None
+        self._seq = 0
+        self._proxy: SchedulerProxy | None = None
+
+    def mark_dirty(self) -> None:
+        self._dirty.set()
+
+    def _subscribe(self, *sources) -> None:
+        """Register for change callbacks once per source."""
+        for source in sources:
+            if id(source) not in self._subscribed:
+                source.add_change_callback(self.mark_dirty)
+                self._subscribed.add(id(source))
 
-    async def connect(self, websocket: WebSocket):
+    async def _build(self, queue: QueueManager, pool: InstancePool, sched: Scheduler) -> dict[str, Any]:
+        if self._proxy is not None:
+            return await self._proxy.get_json("/api/stats/snapshot")
+        return build_snapshot(queue, pool, sched)
+
+    async def connect(self, websocket: WebSocket, queue: QueueManager, pool: InstancePool,
+                      sched: Scheduler, proxy: SchedulerProxy | None = None) -> asyncio.Queue:
+        """Accept a client and queue its initial snapshot.
+
+        Raises SchedulerUnavailable if the snapshot has to come from the
+        scheduler process and it doesn't answer.
+        """
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self._proxy = proxy
+        if proxy is None:
+            self._subscribe(queue, pool, sched)
+        if self._snapshot is None:
+            self._snapshot = await self._build(queue, pool, sched)
+        outbox: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        outbox.put_nowait(json.dumps({"type": "snapshot", "seq": self._seq, "data": full_message(self._snapshot)}))
+        self.active_connections[websocket] = outbox
+        if self._producer is None or self._producer.done():
+            self._producer = asyncio.create_task(self._produce(queue, pool, sched))
+        return outbox
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        self.active_connections.pop(websocket, None)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
+        """Serialise once and queue the text for every client, dropping slow ones."""
+        text = json.dumps(message)
+        for websocket, outbox in list(self.active_connections.items()):
+            try:
+                outbox.put_nowait(text)
+            except asyncio.QueueFull:
+                logger.warning("Dropping stats WebSocket client that fell behind")
+                self.disconnect(websocket)
+                while not outbox.empty():
+                    outbox.get_nowait()
+                outbox.put_nowait(None)  # Tells the client's sender to close
+
+    async def _produce(self, queue: QueueManager, pool: InstancePool, sched: Scheduler) -> None:
+        timeout = FALLBACK_INTERVAL if self._proxy is None else PROXY_POLL_INTERVAL
+        while self.active_connections:
             try:
-                await connection.send_json(message)
-            except Exception:
+                await asyncio.wait_for(self._dirty.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
                 pass
+            self._dirty.clear()
+            try:
+                snapshot = await self._build(queue, pool, sched)
+                changes = diff_snapshots(self._snapshot, snapshot)
+                self._snapshot = snapshot
+                if changes:
+                    self._seq += 1
+                    await self.broadcast({"type": "diff", "seq": self._seq, "data": changes})
+            except Exception as e:
+                logger.error(f"Stats broadcast error: {e}")
+            await asyncio.sleep(MIN_BROADCAST_INTERVAL)
+        # Nobody listening: the next client starts from a fresh snapshot
+        self._snapshot = None
 
 
 manager = ConnectionManager()
@@ -92,84 +334,30 @@ async def websocket_endpoint(
     websocket: WebSocket,
     queue: Annotated[QueueManager, Depends(get_queue_manager)],
     pool: Annotated[InstancePool, Depends(get_instance_pool)],
-    sched: Annotated[Scheduler, Depends(get_scheduler)]
+    sched: Annotated[Scheduler, Depends(get_scheduler)],
+    proxy: Annotated[SchedulerProxy | None, Depends(get_scheduler_proxy)]
 ):
-    """WebSocket endpoint for real-time stats updates."""
-    await manager.connect(websocket)
+    """WebSocket endpoint for real-time stats updates.
 
+    Sends a ``snapshot`` message on connect, then ``diff`` messages whenever
+    something changed.
+    """
     try:
-        while True:
-            # Send stats update every second
-            instances = pool.get_all()
-            running_tasks = sched.get_all_running_tasks()
-            queued_tasks = queue.get_all()
-            failed_tasks_list = sched.get_all_failed_tasks()
-
-            total_tasks = sum(inst.total_tasks for inst in instances)
-            historical_failed = sum(inst.failed_tasks for inst in instances)
-
-            stats = {
-                "type": "stats",
-                "data": {
-                    "queue": {
-                        "pending": len(queued_tasks),
-                        "running": len(running_tasks)
-                    },
-                    "tasks": {
-                        "total": total_tasks,
-                        "completed": total_tasks - historical_failed,
-                        "failed": len(failed_tasks_list)  # Current pending failed tasks
-                    },
-                    "instances": [
-                        {
-                            "id": inst.id,
-                            "name": inst.name,
-                            "url": inst.url,
-                            "status": inst.status,
-                            "current_task_id": inst.current_task_id,
-                            "enabled": inst.enabled,
-                            "backend": str(inst.backend)
-                        }
-                        for inst in instances
-                    ],
-                    "queued_tasks": [
-                        {
-                            "id": task.id,
-                            "priority": task.priority,
-                            "created_at": task.created_at.isoformat(),
-                            "status": task.status
-                        }
-                        for task in queued_tasks[:20]  # Limit to 20
-                    ],
-                    "running_tasks": [
-                        {
-                            "id": task.id,
-                            "priority": task.priority,
-                            "started_at": task.started_at.isoformat() if task.started_at else None,
-                            "instance_id": task.instance_id,
-                            "status": task.status
-                        }
-                        for task in running_tasks
-                    ],
-                    "failed_tasks": [
-                        {
-                            "id": task.id,
-                            "priority": task.priority,
-                            "payload": task.payload,
-                            "error": task.error,
-                            "retry_count": task.retry_count,
-                            "created_at": task.created_at.isoformat(),
-                            "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-                        }
-                        for task in failed_tasks_list
-                    ]
-                }
-            }
-
-            await websocket.send_json(stats)
-            await asyncio.sleep(1)
+        outbox = await manager.connect(websocket, queue, pool, sched, proxy)
+    except SchedulerUnavailable:
+        await websocket.close(code=1013)  # Try again later
+        return
 
+    try:
+        while True:
+            text = await outbox.get()
+            if text is None:
+                await websocket.close(code=1013)  # Try again later
+                break
+            await websocket.send_text(text)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception:
+        pass
+    finally:
         manager.disconnect(websocket)
@@ -1,14 +1,34 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Annotated
-
-from ..models.task import Task, TaskCreate, TaskResponse, TaskStatus
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Annotated, Any, AsyncIterator
+
+from ..models.task import Task, TaskBulkRequest, TaskCreate, TaskResponse, TaskStatus, TERMINAL_STATUSES
+from ..services.admission import AdmissionController, AdmissionRejected, client_id, tenant_id
 from ..services.queue_manager import QueueManager
 from ..services.scheduler import Scheduler
+from ..services.spool import FileSpool
+from ..services.result_store import RESULT_PARTS, ResultStore, iter_compressed, iter_decompressed
+from ..services.scheduler_proxy import SchedulerProxy, SchedulerUnavailable
 from ..services import database
 from ..models.config import CenterConfig
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 
+logger = logging.getLogger(__name__)
+
+# Long-poll and SSE
+MAX_WAIT = 60  # Longest ?wait= in seconds
+SSE_KEEPALIVE = 15.0  # Comment line sent when nothing happened, keeps proxies from timing out
+POSITION_UPDATE_INTERVAL = 1.0  # At most one queue position event per second per stream
+
 
 def get_queue_manager() -> QueueManager:
     from ..main import queue_manager
@@ -25,41 +45,110 @@ def get_config() -> CenterConfig:
     return config
 
 
+def get_file_spool() -> FileSpool:
+    from ..main import file_spool
+    return file_spool
+
+
+def get_result_store() -> ResultStore:
+    from ..main import result_store
+    return result_store
+
+
+def get_admission() -> AdmissionController:
+    from ..main import admission
+    return admission
+
+
+def get_scheduler_proxy() -> SchedulerProxy | None:
+    from ..main import scheduler_proxy
+    return scheduler_proxy
+
+
+async def _forward(proxy: SchedulerProxy, method: str, path: str, json: Any = None) -> JSONResponse:
+    """Answer with the scheduler process's response (worker processes, see scheduler_proxy)."""
+    try:
+        status_code, body = await proxy.request(method, path, json)
+    except SchedulerUnavailable:
+        raise HTTPException(status_code=502, detail="Scheduler process unavailable")
+    return JSONResponse(body, status_code=status_code)
+
+
 @router.post("", response_model=TaskResponse)
 async def create_task(
     task_create: TaskCreate,
-    queue: Annotated[QueueManager, Depends(get_queue_manager)],
     sched: Annotated[Scheduler, Depends(get_scheduler)],
-    cfg: Annotated[CenterConfig, Depends(get_config)]
+    cfg: Annotated[CenterConfig, Depends(get_config)],
+    spool: Annotated[FileSpool, Depends(get_file_spool)],
+    admission: Annotated[AdmissionController, Depends(get_admission)],
+    request: Request
 ):
-    """Submit a new task."""
-    # Check queue size
-    if queue.size() >= cfg.max_queue_size:
-        raise HTTPException(status_code=429, detail="Queue is full")
+    """Submit a new task.
+
+    Rejected with 503 when the queue is full and 429 when the client is over
+    its rate limit, both with a Retry-After header.
+    """
+    priority = task_create.priority if cfg.enable_priority else 5
+    tenant = tenant_id(request, admission.trust_tenant_header)
+    try:
+        admission.admit(client_id(request), priority, tenant=tenant)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+
+    # Move inline file content to the spool so the queued task only holds a reference
+    payload = dict(task_create.payload)
+    if "file_base64" in payload:
+        try:
+            file_content = base64.b64decode(payload.pop("file_base64"), validate=True)
+        except (binascii.Error, ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid file_base64")
+        file_ref, file_size, file_pages = await spool.save_bytes(file_content)
+        payload["file_ref"] = file_ref
+        payload["file_size"] = file_size
+        payload["file_pages"] = file_pages
 
     # Create task
     task = Task(
-        payload=task_create.payload,
-        priority=task_create.priority if cfg.enable_priority else 5
+        payload=payload,
+        priority=priority,
+        tenant=tenant
     )
 
+    # Identical document already parsed with the same options: skip the queue
+    cached = await sched.complete_from_cache(task)
+
     # Save task to database
-    file_name = task_create.payload.get("file_name") if task_create.payload else None
+    file_name = payload.get("file_name")
     try:
         await database.save_task(
             task_id=task.id,
             status=task.status.value,
             priority=task.priority,
-            payload=task_create.payload,
+            payload=payload,
             file_name=file_name,
-            created_at=task.created_at.isoformat()
+            created_at=task.created_at.isoformat(),
+            started_at=task.started_at.isoformat() if task.started_at else None,
+            completed_at=task.completed_at.isoformat() if task.completed_at else None,
+            duration=0.0 if cached else None,
+            tenant=task.tenant
         )
     except Exception as e:
         import logging
         logging.error(f"Failed to save task to database: {e}")
 
-    # Add to queue
-    position = queue.enqueue(task)
+    if cached:
+        return TaskResponse(
+            task_id=task.id,
+            status=task.status,
+            result=task.result
+        )
+
+    # Add to queue (in cluster mode the shared queue, where the position is unknown)
+    position = None
+    if sched.cluster is None:
+        position = sched.enqueue(task)
+    else:
+        await sched.submit([task])
 
     if task_create.async_mode:
         # Async mode: return immediately
@@ -82,40 +171,216 @@ async def create_task(
             raise HTTPException(status_code=500, detail="Task execution failed")
 
 
-@router.get("/{task_id}", response_model=TaskResponse)
-async def get_task(
-    task_id: str,
-    queue: Annotated[QueueManager, Depends(get_queue_manager)],
-    sched: Annotated[Scheduler, Depends(get_scheduler)]
-):
-    """Get task status and result."""
-    # Check queue
-    task = queue.get(task_id)
-    if task:
+def _task_response(task: Task, queue: QueueManager) -> TaskResponse:
+    if task.status == TaskStatus.PENDING:
         return TaskResponse(
             task_id=task.id,
             status=task.status,
-            position=queue.get_position(task_id),
+            position=queue.get_position(task.id),
             error=task.error
         )
+    return TaskResponse(
+        task_id=task.id,
+        status=task.status,
+        result=task.result,
+        error=task.error
+    )
+
+
+def _status_event(task: Task, queue: QueueManager) -> dict[str, Any]:
+    return {
+        "task_id": task.id,
+        "status": task.status,
+        "position": queue.get_position(task.id) if task.status == TaskStatus.PENDING else None,
+        "instance_id": task.instance_id,
+        "retry_count": task.retry_count,
+        "error": task.error
+    }
+
+
+async def _wait_for_terminal(sched: Scheduler, task: Task, timeout: float) -> None:
+    """Sleep until the task reaches a final state or timeout passes."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while task.status not in TERMINAL_STATUSES:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        # The future is shared by every waiter of this task; don't cancel it on timeout
+        await asyncio.wait({sched.next_task_event(task.id)}, timeout=remaining)
+
+
+@router.get("/{task_id}", response_model=TaskResponse)
+async def get_task(
+    task_id: str,
+    queue: Annotated[QueueManager, Depends(get_queue_manager)],
+    sched: Annotated[Scheduler, Depends(get_scheduler)],
+    wait: Annotated[float | None, Query(ge=0, le=MAX_WAIT)] = None
+):
+    """Get task status and result.
 
-    # Check running tasks
-    task = sched.get_running_task(task_id)
+    Args:
+        wait: Long-poll: block up to this many seconds until the task is
+            completed, failed, timed out or cancelled.
+    """
+    task = sched.find_task(task_id)
+    if task is None and wait and sched.cluster is not None:
+        # Accepted by another replica: follow its row while waiting
+        task = await sched.cluster.follow(task_id)
     if task:
-        return TaskResponse(
-            task_id=task.id,
-            status=task.status,
-            result=task.result,
-            error=task.error
-        )
+        if wait:
+            await _wait_for_terminal(sched, task, wait)
+        return _task_response(task, queue)
+
+    # No longer held by the scheduler: answer from the task history
+    row = await database.get_task(task_id)
+    if row:
+        return TaskResponse(task_id=row["id"], status=row["status"], error=row["error"])
 
     raise HTTPException(status_code=404, detail="Task not found")
 
 
+async def _task_event_stream(task: Task, queue: QueueManager, sched: Scheduler) -> AsyncIterator[str]:
+    """SSE stream of a task's status until it reaches a final state."""
+    def sse(event: str, data: dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    loop = asyncio.get_running_loop()
+    last = None
+    last_sent = next_position_at = loop.time()
+    while True:
+        current = _status_event(task, queue)
+        if current != last:
+            yield sse("status", current)
+            last_sent = loop.time()
+            if last is not None and current["position"] != last["position"]:
+                next_position_at = last_sent + POSITION_UPDATE_INTERVAL
+            last = current
+        if task.status in TERMINAL_STATUSES:
+            if task.result is not None:
+                yield sse("result", {"task_id": task.id, "result": task.result})
+            return
+
+        waiters = {sched.next_task_event(task.id)}
+        timeout = last_sent + SSE_KEEPALIVE - loop.time()
+        if task.status == TaskStatus.PENDING:
+            # Queue moves re-check the position, at most once per POSITION_UPDATE_INTERVAL
+            if loop.time() >= next_position_at:
+                waiters.add(sched.next_queue_event())
+            else:
+                timeout = min(timeout, next_position_at - loop.time())
+        await asyncio.wait(waiters, timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+        if loop.time() - last_sent >= SSE_KEEPALIVE:
+            yield ": keepalive\n\n"
+            last_sent = loop.time()
+
+
+@router.get("/{task_id}/events")
+async def task_events(
+    task_id: str,
+    queue: Annotated[QueueManager, Depends(get_queue_manager)],
+    sched: Annotated[Scheduler, Depends(get_scheduler)]
+):
+    """Server-Sent Events: ``status`` on every change (queue position, running,
+    retrying, final state) and ``result`` once a task completes."""
+    task = sched.find_task(task_id)
+    if task is None and sched.cluster is not None:
+        task = await sched.cluster.follow(task_id)
+    if task is None:
+        row = await database.get_task(task_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        final = {"task_id": row["id"], "status": row["status"], "position": None,
+                 "instance_id": row["instance_id"], "retry_count": row["retry_count"], "error": row["error"]}
+        body = iter([f"event: status\ndata: {json.dumps(final)}\n\n"])
+    else:
+        body = _task_event_stream(task, queue, sched)
+
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Inclusive (start, end) of a single ``bytes=`` range, or None to send the whole body.
+
+    Raises ValueError if the range can't be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[len("bytes="):].strip().partition("-")
+    if not sep or not (first + last).isdigit() or (first and last and int(first) > int(last)):
+        return None  # Malformed ranges are ignored
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+@router.get("/{task_id}/result")
+async def get_task_result(
+    task_id: str,
+    request: Request,
+    sched: Annotated[Scheduler, Depends(get_scheduler)],
+    store: Annotated[ResultStore, Depends(get_result_store)],
+    part: Annotated[str, Query(pattern=f"^({'|'.join(RESULT_PARTS)})$")] = "full"
+):
+    """Stream a completed task's stored result.
+
+    Args:
+        part: ``full`` (the MinerU response), ``md`` (markdown of all documents),
+            or ``middle_json``/``content_list``/``model_output``/``images``
+            (JSON keyed by document name).
+
+    Supports single ``Range: bytes=`` requests; without a Range, clients that
+    send ``Accept-Encoding: zstd`` get the stored zstd frame as is.
+    """
+    entry = await store.get_entry(task_id)
+    if entry is None:
+        task = sched.find_task(task_id)
+        if task is not None and task.status not in TERMINAL_STATUSES:
+            raise HTTPException(status_code=409, detail=f"Task is {task.status}")
+        raise HTTPException(status_code=404, detail="Result not found")
+    if part not in entry["parts"]:
+        raise HTTPException(status_code=404, detail=f"Result has no {part} part")
+
+    path = store.path_for(task_id, part)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Result not found")
+    size, stored = entry["parts"][part]
+    media_type = RESULT_PARTS[part]
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{task_id}-{part}"', "Vary": "Accept-Encoding"}
+
+    try:
+        byte_range = _parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is not None:
+        start, end = byte_range
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+        return StreamingResponse(
+            iter_decompressed(path, start, end), status_code=206, media_type=media_type, headers=headers
+        )
+    if "zstd" in request.headers.get("accept-encoding", ""):
+        headers.update({"Content-Encoding": "zstd", "Content-Length": str(stored)})
+        return StreamingResponse(iter_compressed(path), media_type=media_type, headers=headers)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(iter_decompressed(path), media_type=media_type, headers=headers)
+
+
 @router.get("")
 async def list_tasks(
     queue: Annotated[QueueManager, Depends(get_queue_manager)],
     sched: Annotated[Scheduler, Depends(get_scheduler)],
+    proxy: Annotated[SchedulerProxy | None, Depends(get_scheduler_proxy)],
     status: str | None = None,
     page: int = 1,
     page_size: int = 50
@@ -123,29 +388,37 @@ async def list_tasks(
     """Get list of tasks with pagination.
 
     Args:
-        status: Filter by status (pending, running, completed, failed, or None for all)
+        status: Filter by status (pending, running, retrying, completed, failed, or None for all)
         page: Page number (1-indexed)
         page_size: Number of items per page (default 50)
     """
+    if proxy is not None and status in ("pending", "running", "retrying"):
+        # Held in the scheduler process's memory, not this worker's
+        try:
+            return await proxy.get_json("/api/tasks", {"status": status, "page": page, "page_size": page_size})
+        except SchedulerUnavailable:
+            raise HTTPException(status_code=502, detail="Scheduler process unavailable")
+
     # For pending and running status, combine database data with in-memory data for accuracy
     if status == "pending":
         # Get pending tasks from queue (in-memory) for accurate queue position
+        start = (page - 1) * page_size
         tasks = []
-        for task in queue.get_all():
+        for i, task in enumerate(queue.get_page(start, page_size)):
             tasks.append({
                 "task_id": task.id,
                 "status": task.status,
                 "priority": task.priority,
+                "effective_priority": queue.effective_priority(task),
                 "file_name": task.payload.get("file_name") if task.payload else None,
                 "created_at": task.created_at.isoformat(),
-                "position": queue.get_position(task.id)
+                "position": start + i + 1,
+                "parent_id": task.parent_id,
+                "shard_index": task.shard_index,
+                "tenant": task.tenant
             })
 
-        total = len(tasks)
-        # Apply pagination
-        start = (page - 1) * page_size
-        end = start + page_size
-        tasks = tasks[start:end]
+        total = queue.size()
 
         return {"tasks": tasks, "total": total, "page": page, "page_size": page_size}
 
@@ -167,7 +440,10 @@ async def list_tasks(
                 "started_at": task.started_at.isoformat() if task.started_at else None,
                 "instance_id": task.instance_id,
                 "instance_name": instance.name if instance else None,
-                "retry_count": task.retry_count
+                "retry_count": task.retry_count,
+                "parent_id": task.parent_id,
+                "shard_index": task.shard_index,
+                "tenant": task.tenant
             })
 
         total = len(tasks)
@@ -178,6 +454,29 @@ async def list_tasks(
 
         return {"tasks": tasks, "total": total, "page": page, "page_size": page_size}
 
+    elif status == "retrying":
+        # Tasks waiting out a retry backoff, soonest first
+        tasks = []
+        for task in sched.get_all_retrying_tasks():
+            tasks.append({
+                "task_id": task.id,
+                "status": task.status,
+                "priority": task.priority,
+                "file_name": task.payload.get("file_name") if task.payload else None,
+                "created_at": task.created_at.isoformat(),
+                "error": task.error,
+                "retry_count": task.retry_count,
+                "parent_id": task.parent_id,
+                "shard_index": task.shard_index,
+                "tenant": task.tenant
+            })
+
+        total = len(tasks)
+        start = (page - 1) * page_size
+        tasks = tasks[start:start + page_size]
+
+        return {"tasks": tasks, "total": total, "page": page, "page_size": page_size}
+
     else:
         # For completed, failed, or all tasks - query from database
         db_tasks, total = await database.get_tasks_by_status(status, page, page_size)
@@ -196,7 +495,10 @@ async def list_tasks(
                 "instance_name": task["instance_name"],
                 "error": task["error"],
                 "retry_count": task["retry_count"],
-                "duration": task["duration"]
+                "duration": task["duration"],
+                "parent_id": task["parent_id"],
+                "shard_index": task["shard_index"],
+                "tenant": task["tenant"]
             })
 
         return {"tasks": tasks, "total": total, "page": page, "page_size": page_size}
@@ -213,11 +515,68 @@ async def cancel_task(
     raise HTTPException(status_code=404, detail="Task not found or already completed")
 
 
+@router.post("/bulk")
+async def bulk_action(
+    request: TaskBulkRequest,
+    sched: Annotated[Scheduler, Depends(get_scheduler)],
+    proxy: Annotated[SchedulerProxy | None, Depends(get_scheduler_proxy)]
+):
+    """Cancel, retry or reprioritise many tasks at once.
+
+    Targets the listed ``task_ids`` and/or the tasks matching ``status`` and
+    ``batch_id``. Tasks the action doesn't apply to (e.g. retrying a task that
+    has not failed) are skipped. Queue changes are applied in one pass and
+    persisted in one transaction.
+    """
+    if request.task_ids is None and request.status is None and request.batch_id is None:
+        raise HTTPException(status_code=400, detail="task_ids, status or batch_id is required")
+    if request.action == "set_priority" and request.priority is None:
+        raise HTTPException(status_code=400, detail="priority is required for set_priority")
+    if proxy is not None:
+        # Selections and retries act on tasks the scheduler process holds
+        return await _forward(proxy, "POST", "/api/tasks/bulk", request.model_dump(mode="json"))
+
+    if request.status is None and request.batch_id is None:
+        task_ids = list(dict.fromkeys(request.task_ids))
+    else:
+        task_ids = [task.id for task in sched.select_tasks(request.status, request.batch_id)]
+        if request.task_ids is not None:
+            wanted = set(request.task_ids)
+            task_ids = [task_id for task_id in task_ids if task_id in wanted]
+
+    if request.action == "cancel":
+        affected = await sched.cancel_tasks(task_ids)
+    elif request.action == "retry":
+        affected = await sched.retry_failed_tasks(task_ids)
+    else:
+        affected = await sched.set_priority(task_ids, request.priority)
+    # Tasks whose new state could not be committed (the writes are retried in the background)
+    failed: list[str] = []
+    if not await database.flush():
+        logger.error(f"Failed to persist bulk {request.action} of {len(affected)} tasks")
+        failed = affected
+
+    message = f"{request.action}: {len(affected)} of {len(task_ids)} tasks"
+    if failed:
+        message += f", {len(failed)} not saved to the database"
+    return {
+        "message": message,
+        "action": request.action,
+        "matched": len(task_ids),
+        "count": len(affected),
+        "task_ids": affected,
+        "failed": failed
+    }
+
+
 @router.get("/failed/list")
 async def list_failed_tasks(
-    sched: Annotated[Scheduler, Depends(get_scheduler)]
+    sched: Annotated[Scheduler, Depends(get_scheduler)],
+    proxy: Annotated[SchedulerProxy | None, Depends(get_scheduler_proxy)]
 ):
     """Get list of all failed tasks."""
+    if proxy is not None:
+        return await _forward(proxy, "GET", "/api/tasks/failed/list")
     tasks = []
     for task in sched.get_all_failed_tasks():
         tasks.append({
@@ -236,9 +595,12 @@ async def list_failed_tasks(
 @router.post("/{task_id}/retry")
 async def retry_task(
     task_id: str,
-    sched: Annotated[Scheduler, Depends(get_scheduler)]
+    sched: Annotated[Scheduler, Depends(get_scheduler)],
+    proxy: Annotated[SchedulerProxy | None, Depends(get_scheduler_proxy)]
 ):
     """Retry a single failed task."""
+    if proxy is not None:
+        return await _forward(proxy, "POST", f"/api/tasks/{quote(task_id, safe='')}/retry")
     if await sched.retry_failed_task(task_id):
         return {"message": "Task requeued for retry", "task_id": task_id}
     raise HTTPException(status_code=404, detail="Failed task not found")
@@ -246,8 +608,11 @@ async def retry_task(
 
 @router.post("/retry-all")
 async def retry_all_tasks(
-    sched: Annotated[Scheduler, Depends(get_scheduler)]
+    sched: Annotated[Scheduler, Depends(get_scheduler)],
+    proxy: Annotated[SchedulerProxy | None, Depends(get_scheduler_proxy)]
 ):
     """Retry all failed tasks."""
+    if proxy is not None:
+        return await _forward(proxy, "POST", "/api/tasks/retry-all")
     count = await sched.retry_all_failed_tasks()
     return {"message": f"Requeued {count} tasks for retry", "count": count}
@@ -9,6 +9,53 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = False
+    # HTTP worker processes; above 1, app.py also starts a dedicated scheduler
+    # process (on 127.0.0.1:scheduler_port, default port + 1) and runs all of
+    # them in cluster mode
+    workers: int = 1
+    scheduler_port: int = 0
+
+    # HTTP connection pool to MinerU instances (one pooled client per instance URL)
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry: float = 60.0
+    http2: bool = True
+
+    # Health probes running at once across all instances
+    health_check_concurrency: int = 16
+
+    # Upload spool (content-addressed files referenced by queued tasks)
+    spool_dir: str = os.path.join(os.path.dirname(__file__), "..", "data", "spool")
+
+    # Result cache for duplicate documents
+    result_cache_dir: str = os.path.join(os.path.dirname(__file__), "..", "data", "result_cache")
+    result_cache_max_entries: int = 1000
+    result_cache_max_bytes: int = 1024 * 1024 * 1024
+
+    # Result store for completed tasks (GET /api/tasks/{id}/result)
+    result_store_dir: str = os.path.join(os.path.dirname(__file__), "..", "data", "results")
+    result_store_ttl: float = 7 * 24 * 3600  # Seconds; 0 keeps results until evicted by size
+    result_store_max_bytes: int = 10 * 1024 * 1024 * 1024
+    result_store_level: int = 3  # zstd compression level
+
+    # Files (multipart parts) accepted by one POST /api/batches
+    batch_max_files: int = 10000
+
+    # SQLite write-behind buffering
+    db_flush_interval: float = 0.05
+    db_max_pending_writes: int = 5000
+
+    # Cluster mode: replicas sharing the database, spool_dir and result_store_dir
+    cluster_mode: bool = False
+    replica_id: str = ""  # Defaults to <hostname>-<pid>
+    lease_seconds: float = 30.0  # Task/instance leases expire this long after the last renewal
+    cluster_poll_interval: float = 0.5  # Seconds between shared-queue claims and remote task refreshes
+    dispatch: bool = True  # False: accept and serve tasks but leave dispatch to other replicas
+    # Non-dispatching replicas forward stats and queue listings here (set by app.py for its workers)
+    scheduler_url: str = ""
+
+    # Honour X-Tenant-Id (set by a trusted gateway); otherwise tenants come from X-API-Key only
+    trust_tenant_header: bool = False
 
     # Static files
     static_dir: str = os.path.join(os.path.dirname(__file__), "..", "ui", "dist")
@@ -1,23 +1,32 @@
 import asyncio
-import base64
 import logging
 import os
+import socket
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, UploadFile, File, Form
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
 from .models.config import CenterConfig
-from .models.instance import InstanceStatus
 from .models.task import Task, TaskStatus
 from .services.queue_manager import QueueManager
 from .services.instance_pool import InstancePool
 from .services.scheduler import Scheduler
+from .services.mineru_client import MinerUClientRegistry
+from .services.spool import FileSpool
+from .services.result_cache import ResultCache
+from .services.result_store import ResultStore
+from .services.cluster import ClusterCoordinator
+from .services.scheduler_proxy import SchedulerProxy
+from .services.admission import AdmissionController, AdmissionRejected, client_id, tenant_id
 from .services import database
-from .api import tasks_router, instances_router, config_router, stats_router
+from .api import (
+    tasks_router, instances_router, config_router, stats_router, cache_router, metrics_router, batches_router
+)
+from .api.metrics import EVENT_LOOP_LAG, EVENT_LOOP_LAG_SECONDS
 
 # Setup logging
 logging.basicConfig(
@@ -29,18 +38,58 @@ logger = logging.getLogger(__name__)
 # Global instances
 config = CenterConfig()
 queue_manager = QueueManager()
-instance_pool = InstancePool()
-scheduler = Scheduler(queue_manager, instance_pool, config)
+client_registry = MinerUClientRegistry(
+    max_connections=settings.http_max_connections,
+    max_keepalive_connections=settings.http_max_keepalive_connections,
+    keepalive_expiry=settings.http_keepalive_expiry,
+    http2=settings.http2,
+)
+instance_pool = InstancePool(clients=client_registry, health_check_concurrency=settings.health_check_concurrency)
+file_spool = FileSpool(settings.spool_dir, shared=settings.cluster_mode)
+result_cache = ResultCache(
+    settings.result_cache_dir,
+    max_entries=settings.result_cache_max_entries,
+    max_bytes=settings.result_cache_max_bytes,
+    shared=settings.cluster_mode,
+)
+result_store = ResultStore(
+    settings.result_store_dir,
+    ttl=settings.result_store_ttl,
+    max_bytes=settings.result_store_max_bytes,
+    level=settings.result_store_level,
+)
+scheduler = Scheduler(
+    queue_manager, instance_pool, config,
+    spool=file_spool, result_cache=result_cache, result_store=result_store
+)
+admission = AdmissionController(queue_manager, instance_pool, scheduler, settings.trust_tenant_header)
+
+# Cluster coordinator (cluster mode only)
+cluster: ClusterCoordinator | None = None
+
+# Replicas that don't dispatch have no queue, running tasks or instance state of
+# their own: views of those are fetched from the scheduler process
+dispatching = not settings.cluster_mode or settings.dispatch
+scheduler_proxy = SchedulerProxy(settings.scheduler_url) if not dispatching and settings.scheduler_url else None
 
 # Health check task
 health_check_task: asyncio.Task | None = None
 
+# Event loop lag sampling
+EVENT_LOOP_LAG_INTERVAL = 0.5
+loop_lag_task: asyncio.Task | None = None
+
+# Result store retention sweeps
+result_store_prune_task: asyncio.Task | None = None
+
 
 def set_global_config(new_config: CenterConfig) -> None:
     """Update global config."""
     global config
     config = new_config
     scheduler.config = new_config
+    queue_manager.set_fair_share(new_config.enable_fair_share, new_config.tenant_weights)
+    queue_manager.set_aging(new_config.aging_interval)
 
 
 async def save_config_to_db(new_config: CenterConfig) -> None:
@@ -49,11 +98,11 @@ async def save_config_to_db(new_config: CenterConfig) -> None:
 
 
 async def health_check_loop():
-    """Periodic health check loop."""
+    """Periodic health check loop: probe the instances that are due, then sleep until the next one."""
     while True:
         try:
-            await instance_pool.health_check(config.instance_timeout)
-            await asyncio.sleep(config.health_check_interval)
+            await instance_pool.health_check(config.instance_timeout, config.health_check_interval)
+            await asyncio.sleep(instance_pool.seconds_until_next_probe())
         except asyncio.CancelledError:
             break
         except Exception as e:
@@ -61,41 +110,61 @@ async def health_check_loop():
             await asyncio.sleep(5)
 
 
+async def event_loop_lag_loop(interval: float = EVENT_LOOP_LAG_INTERVAL):
+    """Measure how late the event loop wakes a sleeping coroutine."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - started - interval, 0.0)
+            EVENT_LOOP_LAG.set(lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+        except asyncio.CancelledError:
+            break
+
+
 async def load_persisted_data():
     """Load persisted configuration and instances from database."""
-    global config
 
     # Initialize database
-    await database.init_database()
+    await database.init_database(
+        flush_interval=settings.db_flush_interval,
+        max_pending=settings.db_max_pending_writes
+    )
+
+    await result_store.load()
 
     # Load config
-    config = await database.load_config()
-    scheduler.config = config
+    set_global_config(await database.load_config())
     logger.info(f"Loaded config from database: task_timeout={config.task_timeout}s")
 
     # Load instances
     instances = await database.load_instances()
     for inst_data in instances:
-        instance = instance_pool.add_instance(
-            inst_data["url"], inst_data["name"],
-            backend=inst_data.get("backend", "pipeline")
-        )
-        # Override the auto-generated ID with the persisted one
-        instance_pool._instances.pop(instance.id)
-        instance.id = inst_data["id"]
-        instance.enabled = inst_data["enabled"]
-        instance.total_tasks = inst_data["total_tasks"]
-        instance.failed_tasks = inst_data["failed_tasks"]
-        instance.status = InstanceStatus.IDLE if instance.enabled else InstanceStatus.DISABLED
-        instance_pool._instances[instance.id] = instance
+        instance_pool.restore_instance(inst_data)
 
     logger.info(f"Loaded {len(instances)} instances from database")
 
+    if settings.cluster_mode:
+        # Other replicas may be running: interrupted tasks come back through lease expiry
+        return
+
+    # Re-queue tasks interrupted by the previous shutdown or crash
+    recovered = await scheduler.recover_tasks()
+    purged = await file_spool.purge_unreferenced()
+    logger.info(
+        f"Recovered {recovered['pending'] + recovered['interrupted']} tasks "
+        f"({recovered['pending']} pending, {recovered['interrupted']} interrupted while running); "
+        f"{recovered['shards_dropped']} shard tasks dropped, {recovered['missing_file']} failed without a spooled file, "
+        f"{purged} unreferenced spool files removed"
+    )
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
-    global health_check_task
+    global health_check_task, loop_lag_task, result_store_prune_task, cluster
 
     # Startup
     logger.info("Starting MinerU Center...")
@@ -104,7 +173,24 @@ async def lifespan(app: FastAPI):
     await load_persisted_data()
 
     await scheduler.start()
-    health_check_task = asyncio.create_task(health_check_loop())
+    if settings.cluster_mode:
+        cluster = ClusterCoordinator(
+            settings.replica_id or f"{socket.gethostname()}-{os.getpid()}",
+            scheduler, instance_pool, file_spool, result_store,
+            lease_seconds=settings.lease_seconds,
+            poll_interval=settings.cluster_poll_interval,
+            apply_config=set_global_config,
+            dispatch=settings.dispatch
+        )
+        scheduler.cluster = cluster
+        await cluster.start()
+    if dispatching:
+        # Instance health only matters to the replica that dispatches to them
+        health_check_task = asyncio.create_task(health_check_loop())
+        if result_store.ttl:
+            # Expired results are dropped even when no new results come in
+            result_store_prune_task = asyncio.create_task(result_store.prune_loop())
+    loop_lag_task = asyncio.create_task(event_loop_lag_loop())
     logger.info("MinerU Center started successfully")
 
     yield
@@ -112,12 +198,20 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down MinerU Center...")
     await scheduler.stop()
-    if health_check_task:
-        health_check_task.cancel()
-        try:
-            await health_check_task
-        except asyncio.CancelledError:
-            pass
+    if cluster is not None:
+        await cluster.stop()
+    for background_task in (health_check_task, loop_lag_task, result_store_prune_task):
+        if background_task:
+            background_task.cancel()
+            try:
+                await background_task
+            except asyncio.CancelledError:
+                pass
+    await client_registry.aclose()
+    if scheduler_proxy is not None:
+        await scheduler_proxy.aclose()
+    # Commit any buffered task writes before exiting
+    await database.close_database()
     logger.info("MinerU Center shut down successfully")
 
 
@@ -143,10 +237,14 @@ app.include_router(tasks_router)
 app.include_router(instances_router)
 app.include_router(config_router)
 app.include_router(stats_router)
+app.include_router(cache_router)
+app.include_router(metrics_router)
+app.include_router(batches_router)
 
 
 @app.post("/file_parse")
 async def mineru_compatible_file_parse(
+    request: Request,
     files: UploadFile = File(...),
     return_middle_json: str = Form("false"),
     return_model_output: str = Form("false"),
@@ -165,14 +263,25 @@ async def mineru_compatible_file_parse(
     Accepts the same multipart/form-data payload as MinerU's /file_parse endpoint.
     Supports both sync and async modes via the 'async' form field.
     """
-    # Read file content and encode to base64
-    file_content = await files.read()
-    file_base64 = base64.b64encode(file_content).decode("utf-8")
+    # Admission control before spooling the upload
+    tenant = tenant_id(request, admission.trust_tenant_header)
+    try:
+        admission.admit(client_id(request), 5, tenant=tenant)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            {"error": e.detail, "status": "error", "retry_after": e.retry_after},
+            status_code=e.status_code, headers=e.headers
+        )
+
+    # Stream the upload to the on-disk spool; the task only keeps a reference
+    file_ref, file_size, file_pages = await file_spool.save_upload(files)
 
-    # Build payload with file data and form parameters
+    # Build payload with file reference and form parameters
     payload = {
         "file_name": files.filename,
-        "file_base64": file_base64,
+        "file_ref": file_ref,
+        "file_size": file_size,
+        "file_pages": file_pages,
         "return_middle_json": return_middle_json,
         "return_model_output": return_model_output,
         "return_md": return_md,
@@ -187,12 +296,11 @@ async def mineru_compatible_file_parse(
 
     is_async = async_mode.lower() == "true"
 
-    # Check queue size limit
-    if queue_manager.size() >= config.max_queue_size:
-        return {"error": "Queue is full", "status": "error"}
-
     # Create a task with the payload
-    task = Task(payload=payload)
+    task = Task(payload=payload, tenant=tenant)
+
+    # Identical document already parsed with the same options: skip the queue
+    cached = await scheduler.complete_from_cache(task)
 
     # Save task to database
     try:
@@ -202,17 +310,26 @@ async def mineru_compatible_file_parse(
             priority=task.priority,
             payload=payload,
             file_name=files.filename,
-            created_at=task.created_at.isoformat()
+            created_at=task.created_at.isoformat(),
+            started_at=task.started_at.isoformat() if task.started_at else None,
+            completed_at=task.completed_at.isoformat() if task.completed_at else None,
+            duration=0.0 if cached else None,
+            tenant=task.tenant
         )
     except Exception as e:
         logger.error(f"Failed to save task to database: {e}")
 
+    if cached:
+        if is_async:
+            return {"task_id": task.id}
+        return task.result
+
     # For sync mode, pre-register the future before enqueueing
     # to avoid race condition where task completes before wait_for_task
     if not is_async:
         scheduler.pre_register_task_future(task.id)
 
-    queue_manager.enqueue(task)
+    await scheduler.submit([task])
 
     if is_async:
         return {"task_id": task.id}
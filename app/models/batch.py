@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class BatchResponse(BaseModel):
+    batch_id: str
+    name: str | None = None
+    created_at: str
+    total: int
+    counts: dict[str, int]  # Tasks per status
+    done: bool  # Every task completed, failed, timed out or was cancelled
@@ -1,5 +1,9 @@
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+SelectionPolicyName = Literal["round_robin", "least_outstanding", "ewma_latency", "p2c"]
+
 
 class CenterConfig(BaseModel):
     # Timeout management
@@ -9,6 +13,31 @@ class CenterConfig(BaseModel):
     # Queue management
     max_queue_size: int = Field(default=100, ge=1, description="Maximum queue length")
     enable_priority: bool = Field(default=True, description="Enable priority scheduling")
+    aging_interval: int = Field(
+        default=0, ge=0, description="Seconds of waiting that raise a queued task's priority one level (0 = off)"
+    )
+    enable_result_cache: bool = Field(default=True, description="Serve duplicate documents from the result cache")
+
+    # Admission control
+    priority_reserve: float = Field(
+        default=0.1, ge=0, lt=1,
+        description="Share of max_queue_size only tasks of reserve_min_priority or higher may use"
+    )
+    reserve_min_priority: int = Field(default=8, ge=1, le=10, description="Lowest priority admitted into the reserve")
+    rate_limit_per_client: float = Field(
+        default=0, ge=0, description="Tasks per second each client may submit (0 = unlimited)"
+    )
+    rate_limit_burst: int = Field(default=20, ge=1, description="Tasks a client may submit at once")
+
+    # Per-tenant fair share
+    enable_fair_share: bool = Field(
+        default=False, description="Serve tenants round-robin (by weight) within each priority"
+    )
+    tenant_weights: dict[str, float] = Field(
+        default_factory=dict, description="Fair-share weight per tenant (default 1)"
+    )
+    tenant_max_queued: int = Field(default=0, ge=0, description="Queued tasks allowed per tenant (0 = unlimited)")
+    tenant_max_running: int = Field(default=0, ge=0, description="Running tasks allowed per tenant (0 = unlimited)")
 
     # Retry strategy
     max_retries: int = Field(default=3, ge=0, description="Maximum retry attempts")
@@ -17,6 +46,28 @@ class CenterConfig(BaseModel):
     # Instance management
     health_check_interval: int = Field(default=30, ge=5, description="Health check interval in seconds")
     instance_timeout: int = Field(default=10, ge=1, description="Instance request timeout in seconds")
+    selection_policy: SelectionPolicyName = Field(
+        default="least_outstanding",
+        description="How to pick an instance: round_robin, least_outstanding, ewma_latency or p2c"
+    )
+
+    # Circuit breaker
+    breaker_consecutive_failures: int = Field(
+        default=5, ge=0, description="Trip an instance's breaker after this many failures in a row (0 = off)"
+    )
+    breaker_error_rate: float = Field(
+        default=0.5, ge=0, le=1, description="Trip when this share of recent tasks failed (0 = off)"
+    )
+    breaker_window: int = Field(default=20, ge=1, description="Recent task outcomes used for the error rate")
+    breaker_min_requests: int = Field(default=10, ge=1, description="Outcomes needed before the error rate applies")
+    breaker_open_seconds: int = Field(default=30, ge=1, description="Seconds a tripped instance is skipped before a probe")
+
+    # Page-range sharding
+    shard_min_pages: int = Field(
+        default=0, ge=0,
+        description="Split documents with at least this many pages across instances (0 = off)"
+    )
+    shard_pages: int = Field(default=100, ge=1, description="Pages per shard")
 
 
 class ConfigUpdate(BaseModel):
@@ -24,7 +75,25 @@ class ConfigUpdate(BaseModel):
     queue_timeout: int | None = None
     max_queue_size: int | None = None
     enable_priority: bool | None = None
+    aging_interval: int | None = None
+    enable_result_cache: bool | None = None
+    priority_reserve: float | None = None
+    reserve_min_priority: int | None = None
+    rate_limit_per_client: float | None = None
+    rate_limit_burst: int | None = None
+    enable_fair_share: bool | None = None
+    tenant_weights: dict[str, float] | None = None
+    tenant_max_queued: int | None = None
+    tenant_max_running: int | None = None
     max_retries: int | None = None
     retry_delay: int | None = None
     health_check_interval: int | None = None
     instance_timeout: int | None = None
+    selection_policy: SelectionPolicyName | None = None
+    breaker_consecutive_failures: int | None = None
+    breaker_error_rate: float | None = None
+    breaker_window: int | None = None
+    breaker_min_requests: int | None = None
+    breaker_open_seconds: int | None = None
+    shard_min_pages: int | None = None
+    shard_pages: int | None = None
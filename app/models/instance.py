@@ -12,38 +12,109 @@ class InstanceStatus(str, Enum):
     DISABLED = "disabled"
 
 
+class BreakerState(str, Enum):
+    CLOSED = "closed"        # Dispatching normally
+    OPEN = "open"            # Tripped: skipped by selection until the cool-down ends
+    HALF_OPEN = "half_open"  # Cool-down over: one probe task decides
+
+
+class BreakerTransition(BaseModel):
+    at: datetime
+    from_state: BreakerState
+    to_state: BreakerState
+    reason: str
+
+    class Config:
+        use_enum_values = True
+
+
 class BackendType(str, Enum):
     """MinerU backend types"""
     PIPELINE = "pipeline"
     VLLM_ASYNC_ENGINE = "vllm-async-engine"
 
 
+# Concurrent tasks per instance when none is configured
+DEFAULT_MAX_CONCURRENCY = {
+    BackendType.PIPELINE: 1,
+    BackendType.VLLM_ASYNC_ENGINE: 4,
+}
+
+
+# Probed by the health check; MinerU has no dedicated health endpoint
+DEFAULT_HEALTH_PATH = "/openapi.json"
+
+
+def default_max_concurrency(backend: "BackendType | str") -> int:
+    return DEFAULT_MAX_CONCURRENCY.get(BackendType(backend), 1)
+
+
 class MinerUInstance(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     url: str
     status: InstanceStatus = InstanceStatus.OFFLINE
-    current_task_id: str | None = None
+    current_task_ids: set[str] = Field(default_factory=set)
+    max_concurrency: int = Field(default=1, ge=1)
     total_tasks: int = 0
     failed_tasks: int = 0
     last_heartbeat: datetime | None = None
     enabled: bool = True
     backend: BackendType = BackendType.PIPELINE
+    health_path: str = DEFAULT_HEALTH_PATH
+    # Adaptive health probing (time.monotonic() values)
+    next_probe_at: float | None = None
+    healthy_probes: int = 0  # Consecutive successful probes
+    last_success_at: float | None = None  # Last successful task, counts as a heartbeat
+    # Selection policy inputs: moving averages of successful task durations
+    ewma_latency: float | None = None
+    ewma_seconds_per_page: float | None = None
+    # Circuit breaker (see services/circuit_breaker.py)
+    breaker_state: BreakerState = BreakerState.CLOSED
+    breaker_open_until: float | None = None  # time.monotonic() deadline while OPEN
+    breaker_probe_task_id: str | None = None
+    breaker_outcomes: list[bool] = Field(default_factory=list)  # Rolling window, True = success
+    consecutive_failures: int = 0
+    breaker_transitions: list[BreakerTransition] = Field(default_factory=list)
 
     class Config:
         use_enum_values = True
 
+    @property
+    def current_task_id(self) -> str | None:
+        """One of the running tasks (kept for single-slot callers)."""
+        return next(iter(self.current_task_ids), None)
+
+    @property
+    def active_tasks(self) -> int:
+        return len(self.current_task_ids)
+
+    @property
+    def free_slots(self) -> int:
+        return max(self.max_concurrency - len(self.current_task_ids), 0)
+
+    @property
+    def error_rate(self) -> float | None:
+        """Failure share of the breaker's rolling window (None while empty)."""
+        if not self.breaker_outcomes:
+            return None
+        return self.breaker_outcomes.count(False) / len(self.breaker_outcomes)
+
 
 class InstanceCreate(BaseModel):
     name: str
     url: str
     backend: BackendType = BackendType.PIPELINE
+    max_concurrency: int | None = Field(default=None, ge=1)  # None = backend default
+    health_path: str | None = Field(default=None, pattern=r"^/")  # None = /openapi.json
 
 
 class InstanceUpdate(BaseModel):
     name: str | None = None
     url: str | None = None
     backend: BackendType | None = None
+    max_concurrency: int | None = Field(default=None, ge=1)
+    health_path: str | None = Field(default=None, pattern=r"^/")
 
 
 class InstanceResponse(BaseModel):
@@ -52,8 +123,19 @@ class InstanceResponse(BaseModel):
     url: str
     status: str
     current_task_id: str | None
+    current_task_ids: list[str]
+    max_concurrency: int
+    active_tasks: int
     total_tasks: int
     failed_tasks: int
     last_heartbeat: datetime | None
     enabled: bool
     backend: str
+    health_path: str
+    probe_latency: dict
+    ewma_latency: float | None
+    ewma_seconds_per_page: float | None
+    breaker_state: str
+    error_rate: float | None
+    consecutive_failures: int
+    breaker_transitions: list[BreakerTransition]
@@ -1,6 +1,6 @@
 from enum import Enum
 from datetime import datetime
-from typing import Any
+from typing import Any, Literal
 from pydantic import BaseModel, Field
 import uuid
 
@@ -8,12 +8,21 @@ import uuid
 class TaskStatus(str, Enum):
     PENDING = "pending"
     RUNNING = "running"
+    RETRYING = "retrying"  # Waiting out a retry backoff
     COMPLETED = "completed"
     FAILED = "failed"
     TIMEOUT = "timeout"
     CANCELLED = "cancelled"
 
 
+TERMINAL_STATUSES = frozenset({TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.TIMEOUT, TaskStatus.CANCELLED})
+
+# Tenant of tasks submitted without an X-API-Key (or trusted X-Tenant-Id)
+DEFAULT_TENANT = "default"
+# Highest task priority (also the cap on the effective priority of aged tasks)
+MAX_PRIORITY = 10
+
+
 class Task(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     payload: dict[str, Any] = Field(default_factory=dict)
@@ -26,6 +35,17 @@ class Task(BaseModel):
     error: str | None = None
     retry_count: int = 0
     instance_id: str | None = None
+    # Page-range shards of a split document point at their parent task
+    parent_id: str | None = None
+    shard_index: int | None = None
+    # Tasks submitted together through POST /api/batches
+    batch_id: str | None = None
+    # API client the task is accounted to for fair share and quotas
+    tenant: str = DEFAULT_TENANT
+    # Queue order time if not created_at: shards keep their parent's place in the queue
+    order_at: datetime | None = Field(default=None, exclude=True)
+    # time.monotonic() of the last enqueue, for the queue wait metric
+    enqueued_at: float | None = Field(default=None, exclude=True)
 
     def __lt__(self, other: "Task") -> bool:
         # Higher priority comes first (max heap behavior)
@@ -47,6 +67,19 @@ class TaskCreate(BaseModel):
         populate_by_name = True
 
 
+class TaskBulkRequest(BaseModel):
+    action: Literal["cancel", "retry", "set_priority"]
+    # Tasks to act on: explicit ids, or every task held by the scheduler
+    # matching the filters (both may be combined)
+    task_ids: list[str] | None = None
+    status: TaskStatus | None = None
+    batch_id: str | None = None
+    priority: int | None = Field(default=None, ge=1, le=10)  # Required for set_priority
+
+    class Config:
+        use_enum_values = True
+
+
 class TaskResponse(BaseModel):
     task_id: str
     status: str
@@ -1,6 +1,6 @@
 from .queue_manager import QueueManager
 from .instance_pool import InstancePool
 from .scheduler import Scheduler
-from .mineru_client import MinerUClient
+from .mineru_client import MinerUClient, MinerUClientRegistry
 
-__all__ = ["QueueManager", "InstancePool", "Scheduler", "MinerUClient"]
+__all__ = ["QueueManager", "InstancePool", "Scheduler", "MinerUClient", "MinerUClientRegistry"]
@@ -0,0 +1,224 @@
+"""Admission control for new tasks.
+
+Requests are checked against three limits before their tasks are queued:
+
+- Queue capacity. Tasks below ``reserve_min_priority`` may only fill
+  ``max_queue_size * (1 - priority_reserve)`` of the queue; the rest is kept
+  for high-priority work. A full queue is rejected with 503 and a
+  ``Retry-After`` equal to the time the instances need to drain the excess,
+  estimated from their observed per-task latency.
+- Per-client rate. Each client (``X-API-Key`` header, else its address) has
+  a token bucket refilled at ``rate_limit_per_client`` tasks per second up to
+  ``rate_limit_burst``; an empty bucket is rejected with 429 and the time
+  until enough tokens are back.
+- Per-tenant quota. A tenant (its API key; ``X-Tenant-Id`` only from a
+  trusted gateway, see ``tenant_id``) may have at most
+  ``tenant_max_queued`` tasks queued; more is rejected with 429 and the
+  time the instances need to drain the excess.
+"""
+
+import hashlib
+import math
+import time
+from typing import TYPE_CHECKING, Any
+
+from fastapi import Request
+
+from ..models.instance import BreakerState, InstanceStatus, MinerUInstance
+from ..models.task import DEFAULT_TENANT
+from ..utils.metrics import counter
+
+if TYPE_CHECKING:
+    from .queue_manager import QueueManager
+    from .instance_pool import InstancePool
+    from .scheduler import Scheduler
+
+ADMISSION_REJECTED = counter(
+    "mineru_center_admission_rejected_total", "Requests rejected by admission control", ("reason",)
+)
+
+# Retry-After bounds (seconds), and the value used while no instance has a latency sample
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 3600
+UNKNOWN_RETRY_AFTER = 30
+# Token buckets kept before full (idle) buckets are dropped
+MAX_BUCKETS = 10000
+
+
+class AdmissionRejected(Exception):
+    """A request the center can't take now; retry after ``retry_after`` seconds."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"Retry-After": str(self.retry_after)}
+
+
+def client_id(request: Request) -> str:
+    """Identify the client a request comes from.
+
+    Only the API key and the remote address count: a free-form client id
+    header would let a client pick a fresh token bucket per request.
+    """
+    key = request.headers.get("x-api-key")
+    if key:
+        return key
+    return request.client.host if request.client else "unknown"
+
+
+def tenant_id(request: Request, trust_header: bool = False) -> str:
+    """Identify the tenant a request's tasks are accounted to.
+
+    The API key decides the tenant when there is one; it is hashed so it
+    doesn't show up in stats, metrics or the database. ``X-Tenant-Id`` is
+    self-declared and only honoured with ``trust_header`` (a gateway in
+    front of the center sets it), otherwise any client could spend another
+    tenant's quota or take a fresh fair-share turn.
+    """
+    key = request.headers.get("x-api-key")
+    if key:
+        return "key-" + hashlib.sha256(key.encode()).hexdigest()[:12]
+    tenant = request.headers.get("x-tenant-id") if trust_header else None
+    return tenant or DEFAULT_TENANT
+
+
+def estimate_throughput(instances: list[MinerUInstance]) -> float | None:
+    """Tasks per second the available instances complete, from their latency EWMA.
+
+    Instances without a sample yet count at the average per-slot rate of the
+    others. Returns None when no available instance has been measured.
+    """
+    available = [
+        inst for inst in instances
+        if inst.enabled and inst.status in (InstanceStatus.IDLE, InstanceStatus.BUSY)
+        and inst.breaker_state == BreakerState.CLOSED
+    ]
+    measured = [inst for inst in available if inst.ewma_latency]
+    if not measured:
+        return None
+    per_slot = sum(1 / inst.ewma_latency for inst in measured) / len(measured)
+    return sum(inst.max_concurrency * (1 / inst.ewma_latency if inst.ewma_latency else per_slot)
+               for inst in available)
+
+
+class TokenBucket:
+    """Refills ``rate`` tokens per second up to ``burst``."""
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, rate: float, burst: float, now: float) -> None:
+        self.tokens = min(self.tokens + (now - self.updated) * rate, burst)
+        self.updated = now
+
+
+class AdmissionController:
+    """Decide whether new tasks may be queued (limits come from the live CenterConfig)."""
+
+    def __init__(self, queue: "QueueManager", pool: "InstancePool", scheduler: "Scheduler",
+                 trust_tenant_header: bool = False):
+        self.queue = queue
+        self.pool = pool
+        self.scheduler = scheduler
+        self.trust_tenant_header = trust_tenant_header  # Passed to tenant_id
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def load(self) -> tuple[int, float | None]:
+        """Queued tasks and the estimated tasks/second they drain at.
+
+        In cluster mode both cover the whole cluster (pending rows and the
+        throughput every dispatching replica reports).
+        """
+        cluster = self.scheduler.cluster
+        if cluster is not None:
+            return cluster.pending_tasks, cluster.throughput or None
+        return self.queue.size(), estimate_throughput(self.pool.get_all())
+
+    def drain_seconds(self, tasks: int) -> int:
+        """Retry-After for a client that needs ``tasks`` queued tasks to finish first."""
+        _, throughput = self.load()
+        if not throughput:
+            return UNKNOWN_RETRY_AFTER
+        return min(max(math.ceil(tasks / throughput), MIN_RETRY_AFTER), MAX_RETRY_AFTER)
+
+    def check_capacity(self, priority: int, count: int = 1) -> None:
+        """Raise AdmissionRejected (503) if the queue can't take count tasks of this priority."""
+        config = self.scheduler.config
+        limit = config.max_queue_size
+        if priority < config.reserve_min_priority:
+            limit = math.floor(limit * (1 - config.priority_reserve))
+        depth, _ = self.load()
+        excess = depth + count - limit
+        if excess > 0:
+            ADMISSION_REJECTED.labels("queue_full").inc()
+            raise AdmissionRejected(503, "Queue is full", self.drain_seconds(excess))
+
+    def check_tenant_quota(self, tenant: str, count: int = 1) -> None:
+        """Raise AdmissionRejected (429) if the tenant can't queue count more tasks."""
+        limit = self.scheduler.config.tenant_max_queued
+        if not limit:
+            return
+        cluster = self.scheduler.cluster
+        if cluster is not None:
+            queued = cluster.pending_by_tenant.get(tenant, 0)
+        else:
+            queued = self.queue.count_for_tenant(tenant)
+        excess = queued + count - limit
+        if excess > 0:
+            ADMISSION_REJECTED.labels("tenant_quota").inc()
+            raise AdmissionRejected(429, "Tenant queue quota exceeded", self.drain_seconds(excess))
+
+    def take_tokens(self, client: str, count: int = 1) -> None:
+        """Raise AdmissionRejected (429) if client is over its rate limit, else spend count tokens."""
+        config = self.scheduler.config
+        rate, burst = config.rate_limit_per_client, config.rate_limit_burst
+        if not rate:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= MAX_BUCKETS:
+                self._prune(rate, burst, now)
+            bucket = self._buckets[client] = TokenBucket(burst, now)
+        bucket.refill(rate, burst, now)
+        if count > burst:
+            # A request larger than the bucket is let through once the bucket is full
+            count = burst
+        if bucket.tokens < count:
+            ADMISSION_REJECTED.labels("rate_limited").inc()
+            retry_after = math.ceil((count - bucket.tokens) / rate)
+            raise AdmissionRejected(429, "Rate limit exceeded", max(retry_after, MIN_RETRY_AFTER))
+        bucket.tokens -= count
+
+    def admit(self, client: str, priority: int, count: int = 1, tenant: str = DEFAULT_TENANT) -> None:
+        """Check queue capacity, the tenant's quota, then the client's rate limit.
+
+        Rejected requests spend no tokens.
+        """
+        self.check_capacity(priority, count)
+        self.check_tenant_quota(tenant, count)
+        self.take_tokens(client, count)
+
+    def _prune(self, rate: float, burst: float, now: float) -> None:
+        """Forget clients whose bucket has refilled completely."""
+        for client, bucket in list(self._buckets.items()):
+            bucket.refill(rate, burst, now)
+            if bucket.tokens >= burst:
+                del self._buckets[client]
+
+    def get_stats(self) -> dict[str, Any]:
+        depth, throughput = self.load()
+        rejected = {reason: ADMISSION_REJECTED.get(reason) for reason in ("queue_full", "tenant_quota", "rate_limited")}
+        return {
+            "queued": depth,
+            "throughput": round(throughput, 4) if throughput else None,
+            "drain_seconds": round(depth / throughput, 1) if throughput else None,
+            "clients": len(self._buckets),
+            "rejected": {reason: int(child.value) if child else 0 for reason, child in rejected.items()},
+        }
@@ -0,0 +1,105 @@
+"""Per-instance circuit breaker.
+
+The scheduler reports every task outcome on an instance. The breaker trips
+(CLOSED -> OPEN) on ``breaker_consecutive_failures`` failures in a row or when
+the failure share of the last ``breaker_window`` outcomes reaches
+``breaker_error_rate``. An OPEN instance is skipped by selection for
+``breaker_open_seconds``; it then goes HALF_OPEN and receives a single probe
+task. The probe's success closes the breaker, its failure opens it again;
+other tasks finishing meanwhile (sent before the breaker tripped) don't.
+
+State lives on the MinerUInstance; callers hold the pool lock.
+"""
+
+import logging
+import time
+from datetime import datetime
+
+from ..models.config import CenterConfig
+from ..models.instance import BreakerState, BreakerTransition, MinerUInstance
+
+logger = logging.getLogger(__name__)
+
+# Transitions kept per instance for the API
+MAX_TRANSITIONS = 20
+
+
+def _transition(instance: MinerUInstance, to_state: BreakerState, reason: str) -> None:
+    from_state = BreakerState(instance.breaker_state)
+    instance.breaker_state = to_state
+    instance.breaker_transitions.append(BreakerTransition(
+        at=datetime.now(), from_state=from_state, to_state=to_state, reason=reason
+    ))
+    del instance.breaker_transitions[:-MAX_TRANSITIONS]
+    logger.warning(f"Instance {instance.name} breaker {from_state.value} -> {to_state.value}: {reason}")
+
+
+def _trip(instance: MinerUInstance, config: CenterConfig, reason: str) -> None:
+    instance.breaker_open_until = time.monotonic() + config.breaker_open_seconds
+    instance.breaker_probe_task_id = None
+    _transition(instance, BreakerState.OPEN, reason)
+
+
+def allows_dispatch(instance: MinerUInstance, now: float | None = None) -> bool:
+    """Whether selection may hand this instance a task (moves OPEN -> HALF_OPEN when due)."""
+    if instance.breaker_state == BreakerState.OPEN:
+        if (now or time.monotonic()) < (instance.breaker_open_until or 0.0):
+            return False
+        _transition(instance, BreakerState.HALF_OPEN, "cool-down elapsed, probing")
+    if instance.breaker_state == BreakerState.HALF_OPEN:
+        return instance.breaker_probe_task_id is None
+    return True
+
+
+def on_dispatch(instance: MinerUInstance, task_id: str) -> None:
+    """Mark the task sent to a HALF_OPEN instance as its probe."""
+    if instance.breaker_state == BreakerState.HALF_OPEN and instance.breaker_probe_task_id is None:
+        instance.breaker_probe_task_id = task_id
+
+
+def on_release(instance: MinerUInstance, task_id: str) -> None:
+    """Free the probe slot if the probe ended without an outcome (e.g. cancelled)."""
+    if instance.breaker_probe_task_id == task_id:
+        instance.breaker_probe_task_id = None
+
+
+def record_outcome(instance: MinerUInstance, task_id: str, success: bool, config: CenterConfig) -> None:
+    """Fold one task outcome into the breaker and apply the resulting transition.
+
+    While HALF_OPEN only the probe's outcome moves the breaker: tasks sent
+    before it tripped that finish now are counted but decide nothing.
+    """
+    instance.breaker_outcomes.append(success)
+    del instance.breaker_outcomes[:-config.breaker_window]
+    instance.consecutive_failures = 0 if success else instance.consecutive_failures + 1
+
+    if instance.breaker_state == BreakerState.HALF_OPEN:
+        if task_id != instance.breaker_probe_task_id:
+            return
+        instance.breaker_probe_task_id = None
+        if success:
+            instance.breaker_outcomes.clear()
+            _transition(instance, BreakerState.CLOSED, "probe succeeded")
+        else:
+            _trip(instance, config, "probe failed")
+        return
+
+    if instance.breaker_state != BreakerState.CLOSED or success:
+        return
+    if config.breaker_consecutive_failures and instance.consecutive_failures >= config.breaker_consecutive_failures:
+        _trip(instance, config, f"{instance.consecutive_failures} consecutive failures")
+        return
+    rate = instance.error_rate
+    if (config.breaker_error_rate and len(instance.breaker_outcomes) >= config.breaker_min_requests
+            and rate >= config.breaker_error_rate):
+        _trip(instance, config, f"error rate {rate:.0%} over last {len(instance.breaker_outcomes)} tasks")
+
+
+def reset(instance: MinerUInstance, reason: str) -> None:
+    """Close the breaker and forget its history (e.g. when an operator re-enables it)."""
+    instance.breaker_outcomes.clear()
+    instance.consecutive_failures = 0
+    instance.breaker_open_until = None
+    instance.breaker_probe_task_id = None
+    if instance.breaker_state != BreakerState.CLOSED:
+        _transition(instance, BreakerState.CLOSED, reason)
@@ -0,0 +1,358 @@
+"""Cluster mode: several center replicas sharing one durable queue.
+
+Every replica points at the same SQLite database, spool directory and result
+store directory. Submitted tasks are only written to the database; each
+replica claims pending rows up to its free instance slots under a lease it
+renews while it holds them, so a row is dispatched by one replica at a time.
+Instances are leased the same way (one replica dispatches to each instance,
+rebalanced to a fair share as replicas come and go), so instance slots are
+never double-booked. When a replica stops renewing, its leases expire and the
+other replicas reclaim its tasks and instances.
+
+A replica started with ``dispatch=False`` (the HTTP workers of the
+multi-worker mode, see app.py) only submits and follows tasks: it takes no
+leases and does not count towards the instance fair share.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable
+
+from ..models.config import CenterConfig
+from ..models.instance import BackendType, DEFAULT_HEALTH_PATH, InstanceStatus, default_max_concurrency
+from ..models.task import DEFAULT_TENANT, Task, TaskStatus, TERMINAL_STATUSES
+from .admission import estimate_throughput
+from .scheduler import TASK_TIMEOUTS
+from . import database
+
+if TYPE_CHECKING:
+    from .scheduler import Scheduler
+    from .instance_pool import InstancePool
+    from .spool import FileSpool
+    from .result_store import ResultStore
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps of the shared spool, and the age a spooled file
+# needs before a sweep may remove it (covers uploads not yet saved as tasks)
+SPOOL_SWEEP_INTERVAL = 300.0
+SPOOL_MIN_AGE = 600.0
+# Seconds between refreshes of the cluster-wide queue depth and throughput
+LOAD_INTERVAL = 1.0
+
+
+class ClusterCoordinator:
+    """Lease tasks and instances from the shared database for one replica."""
+
+    def __init__(
+        self,
+        replica_id: str,
+        scheduler: "Scheduler",
+        pool: "InstancePool",
+        spool: "FileSpool",
+        result_store: "ResultStore",
+        lease_seconds: float = 30.0,
+        poll_interval: float = 0.5,
+        apply_config: Callable[[CenterConfig], None] | None = None,
+        dispatch: bool = True
+    ):
+        self.replica_id = replica_id
+        self.scheduler = scheduler
+        self.pool = pool
+        self.spool = spool
+        self.result_store = result_store
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.apply_config = apply_config
+        self.dispatch = dispatch
+        self.live_replicas = 1
+        self.reclaimed = 0
+        # Cluster-wide load for admission control, refreshed every LOAD_INTERVAL
+        self.pending_tasks = 0
+        self.pending_by_tenant: dict[str, int] = {}
+        self.throughput = 0.0
+        # Tasks submitted through this replica that no replica has finished yet
+        # and this one does not hold: refreshed from their rows
+        self._remote: dict[str, Task] = {}
+        self._owned_instances: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+        # A freed slot may let this replica claim more work
+        self.pool.add_change_callback(self.wake)
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        if self.dispatch:
+            database.set_lease_owner(self.replica_id)
+        else:
+            self.pool.set_owned_instances(set())
+        await self._heartbeat()
+        self._task = asyncio.create_task(self._run_loop())
+        role = "dispatching" if self.dispatch else "submit-only"
+        logger.info(f"Cluster replica {self.replica_id} started ({role}, {self.live_replicas} live replicas)")
+
+    async def stop(self) -> None:
+        """Stop claiming and hand this replica's tasks and instances back."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if not self.dispatch:
+            return
+        released = await database.release_task_leases(self.replica_id)
+        await database.release_replica(self.replica_id)
+        logger.info(f"Cluster replica {self.replica_id} stopped, {released} unfinished tasks released")
+
+    async def submit(self, tasks: list[Task]) -> None:
+        """Put new tasks (rows already saved) in the shared queue."""
+        await database.flush()
+        for task in tasks:
+            self._remote[task.id] = task
+        self.wake()
+
+    def find_task(self, task_id: str) -> Task | None:
+        return self._remote.get(task_id)
+
+    async def follow(self, task_id: str) -> Task | None:
+        """Start following an unfinished task another replica accepted, so it can be waited on here."""
+        task = self._remote.get(task_id)
+        if task is not None:
+            return task
+        row = await database.get_task(task_id)
+        if row is None or row["status"] in TERMINAL_STATUSES or row["parent_id"] is not None:
+            return None
+        task = self._remote[task_id] = Task(
+            id=row["id"],
+            payload=row["payload"] or {},
+            priority=row["priority"],
+            status=row["status"],
+            created_at=datetime.fromisoformat(row["created_at"]),
+            started_at=datetime.fromisoformat(row["started_at"]) if row["started_at"] else None,
+            instance_id=row["instance_id"],
+            retry_count=row["retry_count"] or 0,
+            batch_id=row["batch_id"],
+            tenant=row["tenant"] or DEFAULT_TENANT
+        )
+        return task
+
+    async def cancel(self, task_ids: list[str]) -> list[str]:
+        """Cancel unfinished tasks this replica does not hold. Returns the ids cancelled."""
+        cancelled = await database.cancel_tasks_anywhere(task_ids)
+        now = datetime.now()
+        for task_id in cancelled:
+            task = self._remote.pop(task_id, None)
+            if task is not None:
+                task.status = TaskStatus.CANCELLED
+                task.completed_at = now
+                await self.scheduler.resolve_remote(task)
+        return cancelled
+
+    async def _run_loop(self) -> None:
+        """Claim work and follow remote tasks every poll interval; renew leases every lease/3."""
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time() + self.lease_seconds / 3
+        next_sweep = loop.time() + SPOOL_SWEEP_INTERVAL
+        next_load = loop.time()
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                if loop.time() >= next_heartbeat:
+                    next_heartbeat = loop.time() + self.lease_seconds / 3
+                    await self._heartbeat()
+                if self.dispatch:
+                    await self._claim()
+                await self._poll_remote()
+                if loop.time() >= next_load:
+                    next_load = loop.time() + LOAD_INTERVAL
+                    self.pending_by_tenant, self.throughput = await database.get_cluster_load(
+                        time.time() - self.lease_seconds
+                    )
+                    self.pending_tasks = sum(self.pending_by_tenant.values())
+                if self.dispatch and loop.time() >= next_sweep:
+                    next_sweep = loop.time() + SPOOL_SWEEP_INTERVAL
+                    await self._sweep_spool()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Cluster coordination error: {e}")
+                await asyncio.sleep(1)
+
+    async def _heartbeat(self) -> None:
+        """Renew leases, reclaim expired ones, rebalance instances and pick up shared changes."""
+        if self.apply_config is not None:
+            config = await database.load_config()
+            if config != self.scheduler.config:
+                self.apply_config(config)
+        instances = await database.load_instances()
+        self._sync_instances(instances)
+        if not self.dispatch:
+            return
+
+        now = time.time()
+        owned = [inst for inst in self.pool.get_all() if inst.id in self._owned_instances]
+        self.live_replicas = await database.heartbeat_replica(
+            self.replica_id, now, now - self.lease_seconds, estimate_throughput(owned) or 0.0
+        )
+        leased = await database.renew_leases(self.replica_id, now + self.lease_seconds)
+        await self._drop_lost_tasks(leased)
+        reclaimed = await database.reclaim_expired_leases(now)
+        if reclaimed:
+            self.reclaimed += reclaimed
+            logger.warning(f"Reclaimed {reclaimed} tasks from expired replica leases")
+        timed_out = await database.timeout_unclaimed_tasks(self.scheduler.config.queue_timeout)
+        if timed_out:
+            TASK_TIMEOUTS.labels("queue").inc(len(timed_out))
+            logger.warning(f"{len(timed_out)} unclaimed tasks timed out in the shared queue")
+
+        instance_ids = sorted(inst["id"] for inst in instances)
+        share = math.ceil(len(instance_ids) / max(self.live_replicas, 1))
+        idle = {inst.id for inst in self.pool.get_all() if inst.active_tasks == 0}
+        owned = await database.lease_instances(
+            self.replica_id, instance_ids, share, idle, now, now + self.lease_seconds
+        )
+        if owned != self._owned_instances:
+            logger.info(f"Replica {self.replica_id} now dispatches to {len(owned)}/{len(instance_ids)} instances")
+        self._owned_instances = owned
+        self.pool.set_owned_instances(owned)
+
+    async def _drop_lost_tasks(self, leased: set[str]) -> None:
+        """Stop holding tasks whose lease this replica no longer has.
+
+        Tasks another replica reclaimed are aborted here (their requests to
+        the instances cancelled) and followed through the database like
+        tasks other replicas run, so waiters here still get the outcome.
+        """
+        lost = self.scheduler.held_task_ids() - leased
+        if not lost:
+            return
+        states = await database.get_task_states(list(lost))
+        cancelled, reclaimed = [], []
+        for task_id in lost:
+            state = states.get(task_id)
+            if state is None or state["status"] == TaskStatus.CANCELLED.value:
+                cancelled.append(task_id)
+            elif state["lease_owner"] != self.replica_id or state["status"] in TERMINAL_STATUSES:
+                reclaimed.append(task_id)
+        if cancelled:
+            await self.scheduler.cancel_tasks(cancelled)
+        if reclaimed:
+            logger.warning(f"Lost the lease on {len(reclaimed)} tasks to other replicas, aborting them")
+            for task in await self.scheduler.abort_tasks(reclaimed):
+                self._remote[task.id] = task
+
+    def _sync_instances(self, rows: list[dict[str, Any]]) -> None:
+        """Mirror instances added, changed or removed through other replicas."""
+        known = {inst.id: inst for inst in self.pool.get_all()}
+        for row in rows:
+            instance = known.pop(row["id"], None)
+            if instance is None:
+                self.pool.restore_instance(row)
+                continue
+            backend = BackendType(row["backend"] or BackendType.PIPELINE)
+            wanted = (
+                row["name"], row["url"].rstrip("/"), backend,
+                row["max_concurrency"] or default_max_concurrency(backend),
+                row["health_path"] or DEFAULT_HEALTH_PATH
+            )
+            if wanted != (instance.name, instance.url, instance.backend, instance.max_concurrency,
+                          instance.health_path):
+                name, url, _, max_concurrency, health_path = wanted
+                self.pool.update_instance(
+                    row["id"], name=name, url=url, backend=backend.value,
+                    max_concurrency=max_concurrency, health_path=health_path
+                )
+            if row["enabled"] and not instance.enabled:
+                self.pool.enable_instance(row["id"])
+            elif not row["enabled"] and instance.enabled:
+                self.pool.disable_instance(row["id"])
+        for instance_id in known:
+            self.pool.remove_instance(instance_id)
+
+    def _free_slots(self) -> int:
+        slots = 0
+        for inst in self.pool.get_all():
+            if (inst.id in self._owned_instances and inst.enabled
+                    and inst.status in (InstanceStatus.IDLE, InstanceStatus.BUSY)):
+                slots += inst.free_slots
+        return slots
+
+    async def _claim(self) -> None:
+        """Lease as many pending tasks as this replica's instances can start now."""
+        limit = self._free_slots() - self.scheduler.queue.size()
+        if limit <= 0:
+            return
+        config = self.scheduler.config
+        rows = await database.claim_tasks(
+            self.replica_id, limit, time.time() + self.lease_seconds,
+            fair_share=config.enable_fair_share, weights=config.tenant_weights,
+            tenant_max_running=config.tenant_max_running, aging_interval=config.aging_interval
+        )
+        if not rows:
+            return
+        tasks = []
+        for row in rows:
+            task = self._remote.pop(row["id"], None)
+            if task is None:
+                task = Task(
+                    id=row["id"],
+                    payload=row["payload"] or {},
+                    priority=row["priority"],
+                    created_at=datetime.fromisoformat(row["created_at"]),
+                    retry_count=row["retry_count"] or 0,
+                    batch_id=row["batch_id"],
+                    tenant=row["tenant"] or DEFAULT_TENANT
+                )
+            tasks.append(task)
+        self.scheduler.enqueue_many(tasks)
+
+    async def _poll_remote(self) -> None:
+        """Refresh tasks submitted here that other replicas run, and wake their waiters."""
+        if not self._remote:
+            return
+        states = await database.get_task_states(list(self._remote))
+        for task_id, state in states.items():
+            task = self._remote.get(task_id)
+            if task is None or (task.status == state["status"] and task.instance_id == state["instance_id"]):
+                continue
+            task.status = TaskStatus(state["status"])
+            task.instance_id = state["instance_id"]
+            task.retry_count = state["retry_count"] or 0
+            task.error = state["error"]
+            task.started_at = datetime.fromisoformat(state["started_at"]) if state["started_at"] else None
+            task.completed_at = datetime.fromisoformat(state["completed_at"]) if state["completed_at"] else None
+            if task.status in TERMINAL_STATUSES:
+                del self._remote[task_id]
+                if task.status == TaskStatus.COMPLETED:
+                    data = await self.result_store.read(task_id)
+                    task.result = json.loads(data) if data is not None else None
+            await self.scheduler.resolve_remote(task)
+
+    async def _sweep_spool(self) -> None:
+        """Remove shared spool files that no replica's tasks reference."""
+        referenced = await database.get_active_file_refs(time.time() - self.lease_seconds)
+        removed = await self.spool.purge_unreferenced(referenced, min_age=SPOOL_MIN_AGE)
+        if removed:
+            logger.info(f"Removed {removed} unreferenced files from the shared spool")
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "replica_id": self.replica_id,
+            "dispatch": self.dispatch,
+            "live_replicas": self.live_replicas,
+            "owned_instances": sorted(self._owned_instances),
+            "remote_tasks": len(self._remote),
+            "reclaimed": self.reclaimed,
+        }
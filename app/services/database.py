@@ -1,23 +1,234 @@
-"""SQLite database service for persistent storage."""
+"""SQLite database service for persistent storage.
 
+All access goes through a single long-lived connection in WAL mode. Task
+writes (save_task, update_task_status) and instance stats are buffered in a
+write-behind queue that coalesces updates per row and commits them in one
+transaction every FLUSH_INTERVAL seconds.
+"""
+
+import asyncio
 import os
 import json
+import logging
+import time
 import aiosqlite
 from typing import Any
 from datetime import datetime
 
 from ..models.config import CenterConfig
+from ..models.task import DEFAULT_TENANT, Task
+from ..utils.metrics import histogram
+
+logger = logging.getLogger(__name__)
 
 # Database file path
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "mineru_center.db")
 
+# Write-behind defaults
+FLUSH_INTERVAL = 0.05  # Max seconds a buffered write waits before commit
+MAX_PENDING_WRITES = 5000  # Buffered rows before writers have to flush inline
+FLUSH_RETRY_DELAY = 1.0  # Seconds before buffered writes are retried after a failed commit
+
+TASK_COLUMNS = ("id", "status", "priority", "payload", "file_name", "created_at", "started_at",
+                "completed_at", "instance_id", "instance_name", "error", "retry_count", "duration",
+                "parent_id", "shard_index", "batch_id", "tenant", "lease_owner")
+
+DB_WRITE_SECONDS = histogram(
+    "mineru_center_db_write_seconds",
+    "Task status writes into the write-behind buffer (op=buffer, incl. backpressure flushes) and its commits (op=flush)",
+    ("op",)
+)
+
+_conn: aiosqlite.Connection | None = None
+_conn_lock = asyncio.Lock()
+
+
+class _WriteBehindQueue:
+    """Buffers task/instance-stat writes and commits them in batches.
 
-async def init_database() -> None:
-    """Initialize the database and create tables."""
-    # Ensure data directory exists
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    Writes for the same task are merged, so PENDING → RUNNING → COMPLETED
+    transitions within one flush interval become a single row write.
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    With a ``lease_owner`` (cluster mode) updates are fenced: they only apply
+    to rows this replica still leases, so a replica that lost a lease can't
+    overwrite the status written by the replica that reclaimed the task.
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING_WRITES):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._inserts: dict[str, dict[str, Any]] = {}  # task_id -> full row
+        self._updates: dict[str, dict[str, Any]] = {}  # task_id -> changed columns
+        self._instance_stats: dict[str, tuple[int, int]] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.lease_owner: str | None = None
+
+    def pending(self) -> int:
+        return len(self._inserts) + len(self._updates) + len(self._instance_stats)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write out everything still buffered."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Let more writes accumulate, bounded by flush_interval
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            if not await self.flush():
+                self._wakeup.set()
+                await asyncio.sleep(FLUSH_RETRY_DELAY)
+
+    async def _submitted(self) -> None:
+        """Wake the flush loop; flush inline when the buffer is full (backpressure)."""
+        self.start()
+        self._wakeup.set()
+        if self.pending() >= self.max_pending:
+            await self.flush()
+
+    async def put_task(self, row: dict[str, Any]) -> None:
+        task_id = row["id"]
+        # A full row replaces any buffered partial update
+        self._updates.pop(task_id, None)
+        self._inserts[task_id] = row
+        await self._submitted()
+
+    async def put_task_update(self, task_id: str, fields: dict[str, Any]) -> None:
+        if task_id in self._inserts:
+            self._inserts[task_id].update(fields)
+        else:
+            self._updates.setdefault(task_id, {}).update(fields)
+        await self._submitted()
+
+    async def put_task_updates(self, updates: dict[str, dict[str, Any]]) -> None:
+        """Buffer updates for many tasks at once; the next flush commits them together."""
+        for task_id, fields in updates.items():
+            if task_id in self._inserts:
+                self._inserts[task_id].update(fields)
+            else:
+                self._updates.setdefault(task_id, {}).update(fields)
+        await self._submitted()
+
+    async def put_instance_stats(self, instance_id: str, total_tasks: int, failed_tasks: int) -> None:
+        self._instance_stats[instance_id] = (total_tasks, failed_tasks)
+        await self._submitted()
+
+    def _requeue(self, inserts: dict[str, dict[str, Any]], updates: dict[str, dict[str, Any]],
+                 instance_stats: dict[str, tuple[int, int]]) -> None:
+        """Put the writes of a failed flush back; writes buffered since then take precedence."""
+        for task_id, row in inserts.items():
+            if task_id in self._inserts:
+                continue
+            row.update(self._updates.pop(task_id, {}))
+            self._inserts[task_id] = row
+        for task_id, fields in updates.items():
+            if task_id in self._inserts:
+                continue
+            self._updates[task_id] = {**fields, **self._updates.get(task_id, {})}
+        for instance_id, stats in instance_stats.items():
+            self._instance_stats.setdefault(instance_id, stats)
+
+    async def flush(self) -> bool:
+        """Commit all buffered writes in a single transaction.
+
+        Returns False if the commit failed; the writes then stay buffered
+        for the next flush.
+        """
+        async with self._flush_lock:
+            if not self.pending():
+                return True
+            inserts, self._inserts = self._inserts, {}
+            updates, self._updates = self._updates, {}
+            instance_stats, self._instance_stats = self._instance_stats, {}
+
+            # Group partial updates by column set so each group is one executemany
+            grouped: dict[tuple[str, ...], list[tuple]] = {}
+            owner = self.lease_owner
+            fence = (owner,) if owner is not None else ()
+            for task_id, fields in updates.items():
+                columns = tuple(sorted(fields))
+                grouped.setdefault(columns, []).append(
+                    tuple(fields[c] for c in columns) + (task_id,) + fence
+                )
+
+            started = time.perf_counter()
+            db = await _get_connection()
+            async with _conn_lock:
+                try:
+                    if inserts:
+                        await db.executemany(f"""
+                            INSERT OR REPLACE INTO tasks ({', '.join(TASK_COLUMNS)})
+                            VALUES ({', '.join('?' for _ in TASK_COLUMNS)})
+                        """, [tuple(row.get(c) for c in TASK_COLUMNS) for row in inserts.values()])
+                    fenced = 0
+                    for columns, params in grouped.items():
+                        assignments = ", ".join(f"{c} = ?" for c in columns)
+                        cursor = await db.executemany(
+                            f"UPDATE tasks SET {assignments} WHERE id = ?"
+                            + (" AND lease_owner = ?" if fence else ""), params
+                        )
+                        if fence:
+                            fenced += len(params) - cursor.rowcount
+                    if instance_stats:
+                        await db.executemany(
+                            "UPDATE instances SET total_tasks = ?, failed_tasks = ? WHERE id = ?",
+                            [(total, failed, iid) for iid, (total, failed) in instance_stats.items()]
+                        )
+                    await db.commit()
+                    DB_WRITE_SECONDS.labels("flush").observe(time.perf_counter() - started)
+                    if fenced:
+                        logger.warning(f"Ignored {fenced} task updates: the lease moved to another replica")
+                except Exception as e:
+                    try:
+                        await db.rollback()
+                    except Exception:
+                        pass
+                    self._requeue(inserts, updates, instance_stats)
+                    logger.error(
+                        f"Failed to flush {len(inserts) + len(updates)} task writes, will retry: {e}"
+                    )
+                    return False
+            return True
+
+
+_writer = _WriteBehindQueue()
+
+
+async def _get_connection() -> aiosqlite.Connection:
+    """Return the shared connection, opening it on first use."""
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        _conn = await aiosqlite.connect(DB_PATH)
+        await _conn.execute("PRAGMA journal_mode=WAL")
+        await _conn.execute("PRAGMA synchronous=NORMAL")
+        await _conn.execute("PRAGMA busy_timeout=5000")
+        _conn.row_factory = aiosqlite.Row
+    return _conn
+
+
+async def init_database(flush_interval: float = FLUSH_INTERVAL,
+                        max_pending: int = MAX_PENDING_WRITES) -> None:
+    """Open the shared connection, create tables and start the write-behind flusher."""
+    _writer.flush_interval = flush_interval
+    _writer.max_pending = max_pending
+
+    db = await _get_connection()
+    async with _conn_lock:
         # Config table - stores key-value pairs
         await db.execute("""
             CREATE TABLE IF NOT EXISTS config (
@@ -45,6 +256,18 @@ async def init_database() -> None:
         except Exception:
             pass  # Column already exists
 
+        # Migrate: add max_concurrency column if missing (NULL = backend default for old rows)
+        try:
+            await db.execute("ALTER TABLE instances ADD COLUMN max_concurrency INTEGER")
+        except Exception:
+            pass  # Column already exists
+
+        # Migrate: add health_path column if missing (NULL = default probe path)
+        try:
+            await db.execute("ALTER TABLE instances ADD COLUMN health_path TEXT")
+        except Exception:
+            pass  # Column already exists
+
         # Tasks table - stores task history
         await db.execute("""
             CREATE TABLE IF NOT EXISTS tasks (
@@ -64,6 +287,15 @@ async def init_database() -> None:
             )
         """)
 
+        # Migrate: page-range shards reference their parent task, batch tasks their batch,
+        # every task its tenant, and claimed tasks their cluster lease
+        for column in ("parent_id TEXT", "shard_index INTEGER", "batch_id TEXT", "tenant TEXT",
+                       "lease_owner TEXT", "lease_expires REAL"):
+            try:
+                await db.execute(f"ALTER TABLE tasks ADD COLUMN {column}")
+            except Exception:
+                pass  # Column already exists
+
         # Create indexes for tasks table
         await db.execute("""
             CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)
@@ -71,16 +303,97 @@ async def init_database() -> None:
         await db.execute("""
             CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)
         """)
+        await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_parent_id ON tasks(parent_id)
+        """)
+        await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_batch_id ON tasks(batch_id)
+        """)
+
+        await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_lease_owner ON tasks(lease_owner)
+        """)
+
+        # Cluster mode: live replicas and which replica dispatches to each instance
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS replicas (
+                id TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL
+            )
+        """)
+        # Migrate: add throughput column if missing (tasks/second the replica's instances drain)
+        try:
+            await db.execute("ALTER TABLE replicas ADD COLUMN throughput REAL DEFAULT 0")
+        except Exception:
+            pass  # Column already exists
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS instance_leases (
+                instance_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+        # Batches table - one row per POST /api/batches
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS batches (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                created_at TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                options TEXT
+            )
+        """)
+
+        # Result store index - one row per stored task result
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS task_results (
+                task_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                stored_bytes INTEGER NOT NULL,
+                parts TEXT NOT NULL
+            )
+        """)
+        await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_task_results_created_at ON task_results(created_at)
+        """)
 
         await db.commit()
 
+    _writer.start()
+
+
+def set_lease_owner(owner: str | None) -> None:
+    """Fence buffered task updates to rows leased by owner (cluster mode), or stop fencing."""
+    _writer.lease_owner = owner
+
+
+async def close_database() -> None:
+    """Flush buffered writes and close the shared connection."""
+    global _conn
+    await _writer.stop()
+    if _conn is not None:
+        async with _conn_lock:
+            await _conn.close()
+        _conn = None
+
+
+async def flush() -> bool:
+    """Commit buffered writes now (used before reads that must see them).
+
+    Returns False if the commit failed; the writes stay buffered and are
+    retried by the flusher.
+    """
+    return await _writer.flush()
+
 
 async def load_config() -> CenterConfig:
     """Load configuration from database."""
     config_data = {}
 
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
+        db = await _get_connection()
+        async with _conn_lock:
             async with db.execute("SELECT key, value FROM config") as cursor:
                 async for row in cursor:
                     key, value = row
@@ -97,12 +410,12 @@ async def load_config() -> CenterConfig:
 
 async def save_config(config: CenterConfig) -> None:
     """Save configuration to database."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        for key, value in config.model_dump().items():
-            await db.execute(
-                "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)",
-                (key, json.dumps(value))
-            )
+    db = await _get_connection()
+    async with _conn_lock:
+        await db.executemany(
+            "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in config.model_dump().items()]
+        )
         await db.commit()
 
 
@@ -111,8 +424,8 @@ async def load_instances() -> list[dict[str, Any]]:
     instances = []
 
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
+        db = await _get_connection()
+        async with _conn_lock:
             async with db.execute("SELECT * FROM instances") as cursor:
                 async for row in cursor:
                     instances.append({
@@ -123,6 +436,8 @@ async def load_instances() -> list[dict[str, Any]]:
                         "total_tasks": row["total_tasks"],
                         "failed_tasks": row["failed_tasks"],
                         "backend": row["backend"] if "backend" in row.keys() else "pipeline",
+                        "max_concurrency": row["max_concurrency"] if "max_concurrency" in row.keys() else None,
+                        "health_path": row["health_path"] if "health_path" in row.keys() else None,
                     })
     except Exception:
         pass
@@ -132,30 +447,34 @@ async def load_instances() -> list[dict[str, Any]]:
 
 async def save_instance(instance_id: str, name: str, url: str, enabled: bool = True,
                         total_tasks: int = 0, failed_tasks: int = 0,
-                        backend: str = "pipeline") -> None:
+                        backend: str = "pipeline", max_concurrency: int | None = None,
+                        health_path: str | None = None) -> None:
     """Save or update an instance in database."""
     from datetime import datetime
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    db = await _get_connection()
+    async with _conn_lock:
         await db.execute("""
             INSERT OR REPLACE INTO instances
-            (id, name, url, enabled, total_tasks, failed_tasks, created_at, backend)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            (id, name, url, enabled, total_tasks, failed_tasks, created_at, backend, max_concurrency, health_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (instance_id, name, url, int(enabled), total_tasks, failed_tasks,
-              datetime.now().isoformat(), backend))
+              datetime.now().isoformat(), backend, max_concurrency, health_path))
         await db.commit()
 
 
 async def delete_instance(instance_id: str) -> None:
     """Delete an instance from database."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    db = await _get_connection()
+    async with _conn_lock:
         await db.execute("DELETE FROM instances WHERE id = ?", (instance_id,))
         await db.commit()
 
 
 async def update_instance_enabled(instance_id: str, enabled: bool) -> None:
     """Update instance enabled status."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    db = await _get_connection()
+    async with _conn_lock:
         await db.execute(
             "UPDATE instances SET enabled = ? WHERE id = ?",
             (int(enabled), instance_id)
@@ -164,8 +483,10 @@ async def update_instance_enabled(instance_id: str, enabled: bool) -> None:
 
 
 async def update_instance_config(instance_id: str, name: str | None = None,
-                                  url: str | None = None, backend: str | None = None) -> None:
-    """Update instance configuration (name, url, backend)."""
+                                  url: str | None = None, backend: str | None = None,
+                                  max_concurrency: int | None = None,
+                                  health_path: str | None = None) -> None:
+    """Update instance configuration (name, url, backend, max_concurrency, health_path)."""
     updates = []
     params = []
     if name is not None:
@@ -177,12 +498,19 @@ async def update_instance_config(instance_id: str, name: str | None = None,
     if backend is not None:
         updates.append("backend = ?")
         params.append(backend)
+    if max_concurrency is not None:
+        updates.append("max_concurrency = ?")
+        params.append(max_concurrency)
+    if health_path is not None:
+        updates.append("health_path = ?")
+        params.append(health_path)
 
     if not updates:
         return
 
     params.append(instance_id)
-    async with aiosqlite.connect(DB_PATH) as db:
+    db = await _get_connection()
+    async with _conn_lock:
         await db.execute(
             f"UPDATE instances SET {', '.join(updates)} WHERE id = ?",
             tuple(params)
@@ -191,71 +519,185 @@ async def update_instance_config(instance_id: str, name: str | None = None,
 
 
 async def update_instance_stats(instance_id: str, total_tasks: int, failed_tasks: int) -> None:
-    """Update instance task statistics."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE instances SET total_tasks = ?, failed_tasks = ? WHERE id = ?",
-            (total_tasks, failed_tasks, instance_id)
-        )
-        await db.commit()
+    """Update instance task statistics (buffered, see _WriteBehindQueue)."""
+    await _writer.put_instance_stats(instance_id, total_tasks, failed_tasks)
 
 
 # ============================================
 # Task-related database functions
 # ============================================
 
+def _task_row(task_id: str, status: str, priority: int, payload: dict | None,
+              file_name: str | None, created_at: str, started_at: str | None = None,
+              completed_at: str | None = None, instance_id: str | None = None,
+              instance_name: str | None = None, error: str | None = None,
+              retry_count: int = 0, duration: float | None = None,
+              parent_id: str | None = None, shard_index: int | None = None,
+              batch_id: str | None = None, tenant: str | None = None,
+              lease_owner: str | None = None) -> dict[str, Any]:
+    # Remove file_base64 from payload if present
+    if payload:
+        payload = {k: v for k, v in payload.items() if k != 'file_base64'}
+
+    return {
+        "id": task_id,
+        "status": status,
+        "priority": priority,
+        "payload": json.dumps(payload) if payload else None,
+        "file_name": file_name,
+        "created_at": created_at,
+        "started_at": started_at,
+        "completed_at": completed_at,
+        "instance_id": instance_id,
+        "instance_name": instance_name,
+        "error": error,
+        "retry_count": retry_count,
+        "duration": duration,
+        "parent_id": parent_id,
+        "shard_index": shard_index,
+        "batch_id": batch_id,
+        "tenant": tenant,
+        "lease_owner": lease_owner,
+    }
+
+
 async def save_task(task_id: str, status: str, priority: int, payload: dict | None,
                     file_name: str | None, created_at: str, started_at: str | None = None,
                     completed_at: str | None = None, instance_id: str | None = None,
                     instance_name: str | None = None, error: str | None = None,
-                    retry_count: int = 0, duration: float | None = None) -> None:
+                    retry_count: int = 0, duration: float | None = None,
+                    parent_id: str | None = None, shard_index: int | None = None,
+                    batch_id: str | None = None, tenant: str | None = None,
+                    lease_owner: str | None = None) -> None:
     """Save or update a task record in the database.
 
+    The write is buffered and committed by the write-behind flusher. Rows
+    updated later by a replica in cluster mode need its ``lease_owner``.
+
     Note: payload should NOT include file_base64 to avoid large data storage.
     """
-    # Remove file_base64 from payload if present
-    if payload:
-        payload = {k: v for k, v in payload.items() if k != 'file_base64'}
-
-    payload_json = json.dumps(payload) if payload else None
-
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("""
-            INSERT OR REPLACE INTO tasks
-            (id, status, priority, payload, file_name, created_at, started_at,
-             completed_at, instance_id, instance_name, error, retry_count, duration)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (task_id, status, priority, payload_json, file_name, created_at,
-              started_at, completed_at, instance_id, instance_name, error,
-              retry_count, duration))
-        await db.commit()
+    await _writer.put_task(_task_row(
+        task_id, status, priority, payload, file_name, created_at, started_at, completed_at,
+        instance_id, instance_name, error, retry_count, duration, parent_id, shard_index,
+        batch_id=batch_id, tenant=tenant, lease_owner=lease_owner
+    ))
 
 
 async def update_task_status(task_id: str, status: str, **kwargs) -> None:
     """Update task status and optional fields.
 
+    The update is buffered and merged with other pending writes for the same
+    task before being committed by the write-behind flusher.
+
     Allowed kwargs: started_at, completed_at, instance_id, instance_name,
                    error, retry_count, duration
     """
-    updates = ["status = ?"]
-    params = [status]
+    started = time.perf_counter()
+    fields = {"status": status}
 
     allowed_fields = ['started_at', 'completed_at', 'instance_id', 'instance_name',
                       'error', 'retry_count', 'duration']
 
     for field in allowed_fields:
         if field in kwargs:
-            updates.append(f"{field} = ?")
-            params.append(kwargs[field])
+            fields[field] = kwargs[field]
 
-    params.append(task_id)
+    await _writer.put_task_update(task_id, fields)
+    DB_WRITE_SECONDS.labels("buffer").observe(time.perf_counter() - started)
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            f"UPDATE tasks SET {', '.join(updates)} WHERE id = ?",
-            tuple(params)
+
+async def update_tasks(updates: dict[str, dict[str, Any]]) -> None:
+    """Update many tasks (task_id -> changed columns) in one transaction.
+
+    The updates are buffered together, so a single flush commits them with
+    one executemany per column set; call flush() to wait for the commit.
+
+    Allowed columns: status, priority and the update_task_status kwargs.
+    """
+    allowed_fields = {'status', 'priority', 'started_at', 'completed_at', 'instance_id',
+                      'instance_name', 'error', 'retry_count', 'duration'}
+    for fields in updates.values():
+        unknown = set(fields) - allowed_fields
+        if unknown:
+            raise ValueError(f"Cannot update task columns {sorted(unknown)}")
+    if updates:
+        await _writer.put_task_updates(updates)
+
+
+# Batch-related database functions
+# ============================================
+
+async def save_batch(batch_id: str, name: str | None, created_at: str, options: dict[str, Any],
+                     tasks: list[Task]) -> None:
+    """Insert a batch and all of its task rows in one transaction.
+
+    Unlike save_task this commits immediately, so the rows exist before the
+    tasks are enqueued and the batch is visible as soon as the call returns.
+    """
+    rows = [
+        _task_row(
+            task.id, task.status, task.priority, task.payload, task.payload.get("file_name"),
+            task.created_at.isoformat(),
+            started_at=task.started_at.isoformat() if task.started_at else None,
+            completed_at=task.completed_at.isoformat() if task.completed_at else None,
+            duration=0.0 if task.completed_at else None,
+            batch_id=batch_id,
+            tenant=task.tenant
         )
-        await db.commit()
+        for task in tasks
+    ]
+    db = await _get_connection()
+    async with _conn_lock:
+        try:
+            await db.execute(
+                "INSERT INTO batches (id, name, created_at, total, options) VALUES (?, ?, ?, ?, ?)",
+                (batch_id, name, created_at, len(tasks), json.dumps(options))
+            )
+            await db.executemany(f"""
+                INSERT OR REPLACE INTO tasks ({', '.join(TASK_COLUMNS)})
+                VALUES ({', '.join('?' for _ in TASK_COLUMNS)})
+            """, [tuple(row[c] for c in TASK_COLUMNS) for row in rows])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def get_batch(batch_id: str) -> dict[str, Any] | None:
+    """Get a batch with its task counts per status, or None."""
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)) as cursor:
+            row = await cursor.fetchone()
+        if not row:
+            return None
+        async with db.execute(
+            # Shards share their parent's batch but aren't documents of it
+            "SELECT status, COUNT(*) FROM tasks WHERE batch_id = ? AND parent_id IS NULL GROUP BY status",
+            (batch_id,)
+        ) as cursor:
+            counts = {status: count for status, count in await cursor.fetchall()}
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "created_at": row["created_at"],
+        "total": row["total"],
+        "options": json.loads(row["options"]) if row["options"] else {},
+        "counts": counts,
+    }
+
+
+async def get_batch_tasks(batch_id: str) -> list[dict[str, Any]]:
+    """(id, status, file_name, error) of every task in a batch (not its shards), in submission order."""
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute(
+            "SELECT id, status, file_name, error FROM tasks WHERE batch_id = ? AND parent_id IS NULL ORDER BY rowid",
+            (batch_id,)
+        ) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
 
 
 async def get_tasks_by_status(status: str | None = None, page: int = 1,
@@ -273,9 +715,9 @@ async def get_tasks_by_status(status: str | None = None, page: int = 1,
     tasks = []
     offset = (page - 1) * page_size
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
         # Build query based on status filter
         if status:
             # For "failed" status, also include "timeout" status
@@ -317,33 +759,64 @@ async def get_tasks_by_status(status: str | None = None, page: int = 1,
         # Get paginated data
         async with db.execute(data_query, data_params) as cursor:
             async for row in cursor:
-                task_data = {
-                    "id": row["id"],
-                    "status": row["status"],
-                    "priority": row["priority"],
-                    "file_name": row["file_name"],
-                    "created_at": row["created_at"],
-                    "started_at": row["started_at"],
-                    "completed_at": row["completed_at"],
-                    "instance_id": row["instance_id"],
-                    "instance_name": row["instance_name"],
-                    "error": row["error"],
-                    "retry_count": row["retry_count"],
-                    "duration": row["duration"],
-                }
-                # Parse payload JSON
-                if row["payload"]:
-                    try:
-                        task_data["payload"] = json.loads(row["payload"])
-                    except json.JSONDecodeError:
-                        task_data["payload"] = None
-                else:
-                    task_data["payload"] = None
-                tasks.append(task_data)
+                tasks.append(_task_from_row(row))
 
     return tasks, total
 
 
+def _task_from_row(row: aiosqlite.Row) -> dict[str, Any]:
+    task_data = {
+        "id": row["id"],
+        "status": row["status"],
+        "priority": row["priority"],
+        "file_name": row["file_name"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "completed_at": row["completed_at"],
+        "instance_id": row["instance_id"],
+        "instance_name": row["instance_name"],
+        "error": row["error"],
+        "retry_count": row["retry_count"],
+        "duration": row["duration"],
+        "parent_id": row["parent_id"],
+        "shard_index": row["shard_index"],
+        "batch_id": row["batch_id"],
+        "tenant": row["tenant"],
+    }
+    # Parse payload JSON
+    if row["payload"]:
+        try:
+            task_data["payload"] = json.loads(row["payload"])
+        except json.JSONDecodeError:
+            task_data["payload"] = None
+    else:
+        task_data["payload"] = None
+    return task_data
+
+
+async def get_task(task_id: str) -> dict[str, Any] | None:
+    """Get one task row by id (after flushing buffered writes), or None."""
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)) as cursor:
+            row = await cursor.fetchone()
+    return _task_from_row(row) if row else None
+
+
+async def get_unfinished_tasks() -> list[dict[str, Any]]:
+    """Task rows left pending, running or retrying, in dispatch order (priority, then age)."""
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute("""
+            SELECT * FROM tasks
+            WHERE status IN ('pending', 'running', 'retrying')
+            ORDER BY priority DESC, created_at ASC
+        """) as cursor:
+            return [_task_from_row(row) async for row in cursor]
+
+
 async def get_task_stats() -> dict[str, int]:
     """Get task statistics by status.
 
@@ -354,12 +827,15 @@ async def get_task_stats() -> dict[str, int]:
         "total": 0,
         "pending": 0,
         "running": 0,
+        "retrying": 0,
         "completed": 0,
         "failed": 0,  # Includes both "failed" and "timeout"
         "cancelled": 0
     }
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
         async with db.execute("""
             SELECT status, COUNT(*) as count
             FROM tasks
@@ -372,6 +848,8 @@ async def get_task_stats() -> dict[str, int]:
                     stats["pending"] = count
                 elif status == "running":
                     stats["running"] = count
+                elif status == "retrying":
+                    stats["retrying"] = count
                 elif status == "completed":
                     stats["completed"] = count
                 elif status in ("failed", "timeout"):
@@ -389,9 +867,9 @@ async def get_pending_tasks_position(task_id: str) -> int:
     - Higher priority, OR
     - Same priority but created earlier
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
         # First get the task's priority and created_at
         async with db.execute(
             "SELECT priority, created_at FROM tasks WHERE id = ?",
@@ -411,3 +889,395 @@ async def get_pending_tasks_position(task_id: str) -> int:
         """, (priority, priority, created_at)) as cursor:
             row = await cursor.fetchone()
             return row[0] if row else 0
+
+
+async def save_result_index(task_id: str, created_at: float, stored_bytes: int,
+                            parts: dict[str, list[int]]) -> int | None:
+    """Index a stored result. parts maps part name to [size, stored_bytes].
+
+    Returns the stored bytes of the entry it replaced, or None if the task
+    had no stored result.
+    """
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute("SELECT stored_bytes FROM task_results WHERE task_id = ?", (task_id,)) as cursor:
+            row = await cursor.fetchone()
+        await db.execute(
+            "INSERT OR REPLACE INTO task_results (task_id, created_at, stored_bytes, parts) VALUES (?, ?, ?, ?)",
+            (task_id, created_at, stored_bytes, json.dumps(parts))
+        )
+        await db.commit()
+    return row[0] if row else None
+
+
+async def get_result_index(task_id: str) -> dict[str, Any] | None:
+    """Get the index entry of a stored result, or None."""
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute(
+            "SELECT created_at, stored_bytes, parts FROM task_results WHERE task_id = ?", (task_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+    if not row:
+        return None
+    return {"created_at": row["created_at"], "stored_bytes": row["stored_bytes"], "parts": json.loads(row["parts"])}
+
+
+async def get_expired_results(created_before: float, limit: int) -> list[tuple[str, int]]:
+    """(task_id, stored_bytes) of results created before a timestamp."""
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute(
+            "SELECT task_id, stored_bytes FROM task_results WHERE created_at <= ? ORDER BY created_at LIMIT ?",
+            (created_before, limit)
+        ) as cursor:
+            return [(row[0], row[1]) for row in await cursor.fetchall()]
+
+
+async def get_oldest_results(limit: int) -> list[tuple[str, int]]:
+    """(task_id, stored_bytes) of the oldest stored results."""
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute(
+            "SELECT task_id, stored_bytes FROM task_results ORDER BY created_at LIMIT ?", (limit,)
+        ) as cursor:
+            return [(row[0], row[1]) for row in await cursor.fetchall()]
+
+
+async def delete_result_index(task_ids: list[str]) -> None:
+    """Remove result index entries."""
+    db = await _get_connection()
+    async with _conn_lock:
+        await db.executemany("DELETE FROM task_results WHERE task_id = ?", [(tid,) for tid in task_ids])
+        await db.commit()
+
+
+async def get_result_store_size() -> tuple[int, int]:
+    """Number of stored results and their total stored bytes."""
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute("SELECT COUNT(*), COALESCE(SUM(stored_bytes), 0) FROM task_results") as cursor:
+            row = await cursor.fetchone()
+    return row[0], row[1]
+
+
+# Cluster-related database functions
+# ============================================
+# Replicas sharing the database coordinate through leases. Each function runs
+# in one BEGIN IMMEDIATE transaction, which takes SQLite's write lock before
+# reading, so two replicas can never claim the same row.
+
+_UNFINISHED_SQL = "('pending', 'running', 'retrying')"
+
+
+async def _immediate(work):
+    """Run work(db) in a BEGIN IMMEDIATE transaction and return its result."""
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            result = await work(db)
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+    return result
+
+
+async def claim_tasks(
+    owner: str,
+    limit: int,
+    expires_at: float,
+    fair_share: bool = False,
+    weights: dict[str, float] | None = None,
+    tenant_max_running: int = 0,
+    aging_interval: float = 0
+) -> list[dict[str, Any]]:
+    """Lease up to limit unclaimed pending tasks to owner, in dispatch order.
+
+    Dispatch order is the one QueueManager uses: higher band first, then
+    FIFO, or with fair share the tenant's virtual finish tag ``(leased + n) /
+    weight`` for its n-th pending task of that priority, where leased is the
+    tenant's unfinished tasks already leased to any replica. The band is the
+    priority, raised with aging by the aging_interval boundaries passed
+    since the task's aging clock: its creation time, or that of the task
+    after it in its priority's fair order if older. Tenants with
+    tenant_max_running leased tasks are skipped, and the others get at most
+    the rest of their quota. Shard children are never claimed: they belong to
+    the replica that split their parent.
+    """
+    if limit <= 0:
+        return []
+    now = time.time()
+
+    async def work(db: aiosqlite.Connection) -> list[dict[str, Any]]:
+        async with db.execute(f"""
+            WITH leased AS (
+                SELECT COALESCE(tenant, :default) AS tenant, COUNT(*) AS count FROM tasks
+                WHERE lease_owner IS NOT NULL AND parent_id IS NULL AND status IN {_UNFINISHED_SQL}
+                GROUP BY 1
+            ), pending AS (
+                SELECT tasks.*, COALESCE(leased.count, 0) AS leased,
+                    CASE WHEN :fair_share THEN (COALESCE(leased.count, 0) + ROW_NUMBER() OVER (
+                        PARTITION BY COALESCE(tasks.tenant, :default), priority ORDER BY created_at
+                    )) / COALESCE(weights.value, 1.0) ELSE 0 END AS tag,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY COALESCE(tasks.tenant, :default) ORDER BY priority DESC, created_at
+                    ) AS quota_rank,
+                    :now - (julianday(:now_iso) - julianday(created_at)) * 86400 AS queued_at
+                FROM tasks
+                LEFT JOIN leased ON leased.tenant = COALESCE(tasks.tenant, :default)
+                LEFT JOIN json_each(:weights) AS weights ON weights.key = COALESCE(tasks.tenant, :default)
+                WHERE status = 'pending' AND lease_owner IS NULL AND parent_id IS NULL
+            ), aged AS (
+                SELECT *, MIN(queued_at) OVER (
+                    PARTITION BY priority ORDER BY tag DESC, created_at DESC, id DESC
+                ) AS aged_at
+                FROM pending
+            )
+            SELECT * FROM aged
+            WHERE :max_running = 0 OR leased + quota_rank <= :max_running
+            ORDER BY
+                CASE WHEN :interval > 0
+                    THEN priority + CAST(:now / :interval AS INTEGER) - CAST(aged_at / :interval AS INTEGER)
+                    ELSE priority END DESC,
+                tag, created_at ASC
+            LIMIT :limit
+        """, {
+            "default": DEFAULT_TENANT, "fair_share": fair_share, "weights": json.dumps(weights or {}),
+            "max_running": tenant_max_running, "interval": aging_interval,
+            "now": now, "now_iso": datetime.fromtimestamp(now).isoformat(), "limit": limit
+        }) as cursor:
+            rows = [_task_from_row(row) for row in await cursor.fetchall()]
+        await db.executemany(
+            "UPDATE tasks SET lease_owner = ?, lease_expires = ? WHERE id = ?",
+            [(owner, expires_at, row["id"]) for row in rows]
+        )
+        return rows
+
+    return await _immediate(work)
+
+
+async def timeout_unclaimed_tasks(queue_timeout: float) -> list[str]:
+    """Time out pending tasks no replica claimed within queue_timeout seconds of creation.
+
+    The shared-queue counterpart of Scheduler._check_timeouts, which only
+    sees the tasks its replica claimed. Returns the timed-out ids.
+    """
+    now = datetime.now()
+    cutoff = datetime.fromtimestamp(now.timestamp() - queue_timeout).isoformat()
+
+    async def work(db: aiosqlite.Connection) -> list[str]:
+        async with db.execute("""
+            SELECT id FROM tasks
+            WHERE status = 'pending' AND lease_owner IS NULL AND parent_id IS NULL AND created_at < ?
+        """, (cutoff,)) as cursor:
+            task_ids = [row[0] for row in await cursor.fetchall()]
+        await db.executemany("""
+            UPDATE tasks SET status = 'timeout', completed_at = ?, error = 'Queue timeout'
+            WHERE id = ?
+        """, [(now.isoformat(), task_id) for task_id in task_ids])
+        return task_ids
+
+    return await _immediate(work)
+
+
+async def renew_leases(owner: str, expires_at: float) -> set[str]:
+    """Extend owner's leases on its unfinished tasks. Returns the ids still leased."""
+
+    async def work(db: aiosqlite.Connection) -> set[str]:
+        await db.execute(f"""
+            UPDATE tasks SET lease_expires = ?
+            WHERE lease_owner = ? AND status IN {_UNFINISHED_SQL}
+        """, (expires_at, owner))
+        async with db.execute(
+            f"SELECT id FROM tasks WHERE lease_owner = ? AND status IN {_UNFINISHED_SQL}", (owner,)
+        ) as cursor:
+            return {row[0] for row in await cursor.fetchall()}
+
+    return await _immediate(work)
+
+
+async def _return_to_pool(db: aiosqlite.Connection, task_ids: list[str]) -> None:
+    """Make leased tasks claimable again; cancel the shards of split parents."""
+    await db.executemany("""
+        UPDATE tasks SET status = 'pending', lease_owner = NULL, lease_expires = NULL,
+            started_at = NULL, instance_id = NULL, instance_name = NULL
+        WHERE id = ?
+    """, [(task_id,) for task_id in task_ids])
+    await db.executemany(f"""
+        UPDATE tasks SET status = 'cancelled', completed_at = ?,
+            error = 'Interrupted by replica failover; the parent task is split again'
+        WHERE parent_id = ? AND status IN {_UNFINISHED_SQL}
+    """, [(datetime.now().isoformat(), task_id) for task_id in task_ids])
+
+
+async def reclaim_expired_leases(now: float) -> int:
+    """Return unfinished tasks whose lease expired to the pending pool.
+
+    The tasks of a replica that stopped renewing run again from scratch on
+    whichever replica claims them (shards, leased with their parent, are
+    cancelled). Returns the number of tasks reclaimed.
+    """
+
+    async def work(db: aiosqlite.Connection) -> int:
+        async with db.execute(f"""
+            SELECT id FROM tasks
+            WHERE lease_owner IS NOT NULL AND lease_expires < ? AND status IN {_UNFINISHED_SQL}
+                AND parent_id IS NULL
+        """, (now,)) as cursor:
+            ids = [row[0] for row in await cursor.fetchall()]
+        await _return_to_pool(db, ids)
+        return len(ids)
+
+    return await _immediate(work)
+
+
+async def release_task_leases(owner: str) -> int:
+    """Give owner's unfinished tasks back to the pending pool (clean shutdown)."""
+
+    async def work(db: aiosqlite.Connection) -> int:
+        async with db.execute(f"""
+            SELECT id FROM tasks WHERE lease_owner = ? AND status IN {_UNFINISHED_SQL} AND parent_id IS NULL
+        """, (owner,)) as cursor:
+            ids = [row[0] for row in await cursor.fetchall()]
+        await _return_to_pool(db, ids)
+        return len(ids)
+
+    return await _immediate(work)
+
+
+async def cancel_tasks_anywhere(task_ids: list[str]) -> list[str]:
+    """Mark unfinished tasks cancelled whichever replica holds them. Returns the ids changed.
+
+    A replica holding one of them notices on its next lease renewal and
+    stops it.
+    """
+
+    async def work(db: aiosqlite.Connection) -> list[str]:
+        placeholders = ", ".join("?" for _ in task_ids)
+        async with db.execute(f"""
+            SELECT id FROM tasks WHERE id IN ({placeholders}) AND status IN {_UNFINISHED_SQL}
+        """, task_ids) as cursor:
+            ids = [row[0] for row in await cursor.fetchall()]
+        now = datetime.now().isoformat()
+        await db.executemany(
+            "UPDATE tasks SET status = 'cancelled', completed_at = ? WHERE id = ?",
+            [(now, task_id) for task_id in ids]
+        )
+        return ids
+
+    if not task_ids:
+        return []
+    return await _immediate(work)
+
+
+async def get_task_states(task_ids: list[str]) -> dict[str, dict[str, Any]]:
+    """Current status columns of tasks, keyed by id."""
+    if not task_ids:
+        return {}
+    await _writer.flush()
+    db = await _get_connection()
+    placeholders = ", ".join("?" for _ in task_ids)
+    async with _conn_lock:
+        async with db.execute(f"""
+            SELECT id, status, started_at, completed_at, instance_id, error, retry_count, lease_owner
+            FROM tasks WHERE id IN ({placeholders})
+        """, task_ids) as cursor:
+            return {row["id"]: dict(row) for row in await cursor.fetchall()}
+
+
+async def heartbeat_replica(replica_id: str, now: float, live_after: float, throughput: float = 0.0) -> int:
+    """Record a replica heartbeat and drop stale replicas. Returns the live replica count."""
+
+    async def work(db: aiosqlite.Connection) -> int:
+        await db.execute(
+            "INSERT OR REPLACE INTO replicas (id, heartbeat, throughput) VALUES (?, ?, ?)",
+            (replica_id, now, throughput)
+        )
+        await db.execute("DELETE FROM replicas WHERE heartbeat < ?", (live_after,))
+        async with db.execute("SELECT COUNT(*) FROM replicas") as cursor:
+            return (await cursor.fetchone())[0]
+
+    return await _immediate(work)
+
+
+async def lease_instances(owner: str, instance_ids: list[str], share: int, releasable: set[str],
+                          now: float, expires_at: float) -> set[str]:
+    """Rebalance instance leases and return the instances owner may dispatch to.
+
+    owner renews its leases, gives back releasable (idle) instances it holds
+    beyond share, then takes unleased or expired instances up to share. An
+    instance is leased to at most one replica, so its slots are never
+    double-booked.
+    """
+
+    async def work(db: aiosqlite.Connection) -> set[str]:
+        await db.execute("DELETE FROM instance_leases WHERE expires_at < ?", (now,))
+        placeholders = ", ".join("?" for _ in instance_ids) or "NULL"
+        await db.execute(
+            f"DELETE FROM instance_leases WHERE instance_id NOT IN ({placeholders})", instance_ids
+        )
+        async with db.execute("SELECT instance_id, owner FROM instance_leases") as cursor:
+            leases = {row[0]: row[1] for row in await cursor.fetchall()}
+        owned = [instance_id for instance_id in instance_ids if leases.get(instance_id) == owner]
+        for instance_id in [i for i in owned if i in releasable][:max(len(owned) - share, 0)]:
+            await db.execute("DELETE FROM instance_leases WHERE instance_id = ?", (instance_id,))
+            owned.remove(instance_id)
+        for instance_id in instance_ids:
+            if len(owned) >= share:
+                break
+            if instance_id not in leases:
+                owned.append(instance_id)
+        await db.executemany(
+            "INSERT OR REPLACE INTO instance_leases (instance_id, owner, expires_at) VALUES (?, ?, ?)",
+            [(instance_id, owner, expires_at) for instance_id in owned]
+        )
+        return set(owned)
+
+    return await _immediate(work)
+
+
+async def get_cluster_load(live_after: float) -> tuple[dict[str, int], float]:
+    """Pending tasks per tenant in the shared queue and the summed throughput of live replicas."""
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute(
+            "SELECT tenant, COUNT(*) FROM tasks WHERE status = 'pending' GROUP BY tenant"
+        ) as cursor:
+            pending: dict[str, int] = {}
+            async for tenant, count in cursor:
+                tenant = tenant or DEFAULT_TENANT
+                pending[tenant] = pending.get(tenant, 0) + count
+        async with db.execute(
+            "SELECT COALESCE(SUM(throughput), 0) FROM replicas WHERE heartbeat >= ?", (live_after,)
+        ) as cursor:
+            throughput = (await cursor.fetchone())[0]
+    return pending, throughput
+
+
+async def release_replica(replica_id: str) -> None:
+    """Drop a replica's heartbeat row and instance leases."""
+
+    async def work(db: aiosqlite.Connection) -> None:
+        await db.execute("DELETE FROM instance_leases WHERE owner = ?", (replica_id,))
+        await db.execute("DELETE FROM replicas WHERE id = ?", (replica_id,))
+
+    await _immediate(work)
+
+
+async def get_active_file_refs(live_after: float) -> set[str]:
+    """Spooled files still needed: those of unfinished tasks, and of failed
+    tasks a live replica could still retry."""
+    await _writer.flush()
+    db = await _get_connection()
+    async with _conn_lock:
+        async with db.execute(f"""
+            SELECT DISTINCT json_extract(payload, '$.file_ref') FROM tasks
+            WHERE status IN {_UNFINISHED_SQL}
+               OR (status IN ('failed', 'timeout')
+                   AND lease_owner IN (SELECT id FROM replicas WHERE heartbeat >= ?))
+        """, (live_after,)) as cursor:
+            return {row[0] for row in await cursor.fetchall() if row[0]}
@@ -1,19 +1,50 @@
+import asyncio
+import random
 import threading
+import time
 from datetime import datetime
-from typing import Callable
-import httpx
+from typing import Any, Callable
 
-from ..models.instance import MinerUInstance, InstanceStatus, BackendType
+from ..models.config import CenterConfig
+from ..models.instance import (
+    MinerUInstance, InstanceStatus, BackendType, BreakerState, DEFAULT_HEALTH_PATH, default_max_concurrency
+)
+from ..utils.metrics import Histogram, histogram
+from . import circuit_breaker
+from .mineru_client import MinerUClientRegistry
+from .selection import EWMA_ALPHA, SELECTION_POLICIES, SelectionPolicy
+
+# Adaptive probing: unhealthy instances are re-probed quickly, healthy ones
+# back off up to HEALTHY_BACKOFF_MAX x health_check_interval
+UNHEALTHY_PROBE_INTERVAL = 5.0
+HEALTHY_BACKOFF_MAX = 4
+PROBE_JITTER = 0.1
+PROBE_SECONDS = histogram("mineru_center_health_probe_seconds", "Health probe latency", ("instance_id",))
+
+# Upper bound on the health loop's sleep, so new instances are probed promptly
+HEALTH_CHECK_TICK = 1.0
+
+
+def _ewma(current: float | None, sample: float) -> float:
+    if current is None:
+        return sample
+    return EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * current
 
 
 class InstancePool:
     """MinerU instance pool manager."""
 
-    def __init__(self, health_check_timeout: int = 10):
+    def __init__(self, health_check_timeout: int = 10, clients: MinerUClientRegistry | None = None,
+                 health_check_concurrency: int = 16):
         self._instances: dict[str, MinerUInstance] = {}
+        self.clients = clients or MinerUClientRegistry()
         self._lock = threading.Lock()
         self._health_check_timeout = health_check_timeout
+        self._probe_semaphore = asyncio.Semaphore(health_check_concurrency)
         self._on_change_callbacks: list[Callable] = []
+        self._policies: dict[str, SelectionPolicy] = {}
+        # Cluster mode: instances this replica holds a lease on (None = all)
+        self._owned: set[str] | None = None
 
     def add_change_callback(self, callback: Callable) -> None:
         """Add a callback to be called when pool changes."""
@@ -27,10 +58,37 @@ class InstancePool:
             except Exception:
                 pass
 
-    def add_instance(self, url: str, name: str, backend: str = "pipeline") -> MinerUInstance:
+    def add_instance(self, url: str, name: str, backend: str = "pipeline",
+                     max_concurrency: int | None = None, health_path: str | None = None) -> MinerUInstance:
         """Add a new instance to the pool."""
         backend_type = BackendType(backend) if backend else BackendType.PIPELINE
-        instance = MinerUInstance(name=name, url=url.rstrip("/"), backend=backend_type)
+        instance = MinerUInstance(
+            name=name,
+            url=url.rstrip("/"),
+            backend=backend_type,
+            max_concurrency=max_concurrency or default_max_concurrency(backend_type),
+            health_path=health_path or DEFAULT_HEALTH_PATH
+        )
+        with self._lock:
+            self._instances[instance.id] = instance
+            self._notify_change()
+        return instance
+
+    def restore_instance(self, data: dict[str, Any]) -> MinerUInstance:
+        """Add an instance loaded from the database, keeping its id, state and counters."""
+        backend_type = BackendType(data.get("backend") or BackendType.PIPELINE)
+        instance = MinerUInstance(
+            id=data["id"],
+            name=data["name"],
+            url=data["url"].rstrip("/"),
+            backend=backend_type,
+            max_concurrency=data.get("max_concurrency") or default_max_concurrency(backend_type),
+            health_path=data.get("health_path") or DEFAULT_HEALTH_PATH,
+            enabled=data["enabled"],
+            total_tasks=data["total_tasks"],
+            failed_tasks=data["failed_tasks"],
+            status=InstanceStatus.IDLE if data["enabled"] else InstanceStatus.DISABLED
+        )
         with self._lock:
             self._instances[instance.id] = instance
             self._notify_change()
@@ -40,13 +98,22 @@ class InstancePool:
         """Remove instance from pool."""
         with self._lock:
             if instance_id in self._instances:
-                del self._instances[instance_id]
+                instance = self._instances.pop(instance_id)
+                PROBE_SECONDS.remove(instance_id)
+                self._release_client_unlocked(instance.url)
                 self._notify_change()
                 return True
             return False
 
+    def _release_client_unlocked(self, url: str) -> None:
+        """Drop the pooled client for url if no remaining instance uses it. Must hold lock."""
+        if not any(inst.url == url for inst in self._instances.values()):
+            self.clients.discard(url)
+
     def update_instance(self, instance_id: str, name: str | None = None,
-                        url: str | None = None, backend: str | None = None) -> MinerUInstance | None:
+                        url: str | None = None, backend: str | None = None,
+                        max_concurrency: int | None = None,
+                        health_path: str | None = None) -> MinerUInstance | None:
         """Update instance configuration."""
         with self._lock:
             if instance_id not in self._instances:
@@ -54,10 +121,19 @@ class InstancePool:
             instance = self._instances[instance_id]
             if name is not None:
                 instance.name = name
-            if url is not None:
+            if url is not None and url.rstrip("/") != instance.url:
+                old_url = instance.url
                 instance.url = url.rstrip("/")
+                self._release_client_unlocked(old_url)
+                self._reset_probe_unlocked(instance)
             if backend is not None:
-                instance.backend = BackendType(backend)
+                instance.backend = BackendType(backend).value
+            if max_concurrency is not None:
+                instance.max_concurrency = max_concurrency
+                self._update_slot_status_unlocked(instance)
+            if health_path is not None and health_path != instance.health_path:
+                instance.health_path = health_path
+                self._reset_probe_unlocked(instance)
             self._notify_change()
             return instance
 
@@ -66,13 +142,57 @@ class InstancePool:
         with self._lock:
             return self._instances.get(instance_id)
 
-    def get_idle_instance(self) -> MinerUInstance | None:
-        """Get first available idle instance."""
+    def get_idle_instance(self, policy: str = "least_outstanding") -> MinerUInstance | None:
+        """Pick an instance with a free slot using the named selection policy.
+
+        Instances whose circuit breaker is open (or half-open with a probe
+        already running) are skipped.
+        """
+        with self._lock:
+            candidates = [
+                instance for instance in self._instances.values()
+                if instance.status == InstanceStatus.IDLE and instance.enabled and instance.free_slots
+                and (self._owned is None or instance.id in self._owned)
+                and circuit_breaker.allows_dispatch(instance)
+            ]
+            if not candidates:
+                return None
+            if policy not in self._policies:
+                self._policies[policy] = SELECTION_POLICIES[policy]()
+            return self._policies[policy].select(candidates)
+
+    def record_latency(self, instance_id: str, seconds: float, pages: int | None = None) -> None:
+        """Fold a successful task's duration into the instance's moving averages."""
         with self._lock:
-            for instance in self._instances.values():
-                if instance.status == InstanceStatus.IDLE and instance.enabled:
-                    return instance
-            return None
+            instance = self._instances.get(instance_id)
+            if not instance:
+                return
+            instance.ewma_latency = _ewma(instance.ewma_latency, seconds)
+            if pages:
+                instance.ewma_seconds_per_page = _ewma(instance.ewma_seconds_per_page, seconds / pages)
+
+    def record_outcome(self, instance_id: str, task_id: str, success: bool, config: CenterConfig) -> None:
+        """Feed a task's outcome to the instance's circuit breaker."""
+        with self._lock:
+            instance = self._instances.get(instance_id)
+            if not instance:
+                return
+            if success:
+                instance.last_success_at = time.monotonic()
+            state = instance.breaker_state
+            circuit_breaker.record_outcome(instance, task_id, success, config)
+            if instance.breaker_state != state:
+                self._notify_change()
+
+    def next_breaker_probe_at(self) -> float | None:
+        """Earliest future time.monotonic() at which an open breaker may go half-open."""
+        now = time.monotonic()
+        with self._lock:
+            deadlines = [
+                inst.breaker_open_until for inst in self._instances.values()
+                if inst.breaker_state == BreakerState.OPEN and (inst.breaker_open_until or 0.0) > now
+            ]
+            return min(deadlines, default=None)
 
     def set_status(self, instance_id: str, status: InstanceStatus) -> None:
         """Set instance status."""
@@ -81,13 +201,51 @@ class InstancePool:
                 self._instances[instance_id].status = status
                 self._notify_change()
 
-    def set_current_task(self, instance_id: str, task_id: str | None) -> None:
-        """Set current task for instance."""
+    def _mark_reachable(self, instance_id: str) -> None:
+        """Bring an OFFLINE or ERROR instance back: IDLE, or BUSY if its slots are still taken."""
         with self._lock:
-            if instance_id in self._instances:
-                self._instances[instance_id].current_task_id = task_id
+            instance = self._instances.get(instance_id)
+            if instance and instance.status in (InstanceStatus.OFFLINE, InstanceStatus.ERROR):
+                instance.status = InstanceStatus.IDLE
+                self._update_slot_status_unlocked(instance)
                 self._notify_change()
 
+    def acquire_slot(self, instance_id: str, task_id: str) -> None:
+        """Mark a task as running on an instance; BUSY once every slot is taken."""
+        with self._lock:
+            instance = self._instances.get(instance_id)
+            if instance:
+                instance.current_task_ids.add(task_id)
+                circuit_breaker.on_dispatch(instance, task_id)
+                self._update_slot_status_unlocked(instance)
+                self._notify_change()
+
+    def release_slot(self, instance_id: str, task_id: str) -> None:
+        """Free the slot held by a task."""
+        with self._lock:
+            instance = self._instances.get(instance_id)
+            if instance:
+                instance.current_task_ids.discard(task_id)
+                circuit_breaker.on_release(instance, task_id)
+                if instance.enabled:
+                    instance.status = InstanceStatus.IDLE
+                    self._update_slot_status_unlocked(instance)
+                self._notify_change()
+
+    def _update_slot_status_unlocked(self, instance: MinerUInstance) -> None:
+        """Switch between IDLE (free slot) and BUSY (all slots taken). Must hold lock."""
+        if instance.status in (InstanceStatus.IDLE, InstanceStatus.BUSY):
+            instance.status = InstanceStatus.BUSY if not instance.free_slots else InstanceStatus.IDLE
+
+    def get_slot_usage(self) -> dict[str, int]:
+        """Running tasks and total slots across enabled instances."""
+        with self._lock:
+            enabled = [inst for inst in self._instances.values() if inst.enabled]
+            return {
+                "used": sum(inst.active_tasks for inst in enabled),
+                "total": sum(inst.max_concurrency for inst in enabled),
+            }
+
     def increment_total_tasks(self, instance_id: str) -> None:
         """Increment total tasks counter."""
         with self._lock:
@@ -110,7 +268,10 @@ class InstancePool:
         """Enable instance."""
         with self._lock:
             if instance_id in self._instances:
-                self._instances[instance_id].enabled = True
+                instance = self._instances[instance_id]
+                instance.enabled = True
+                circuit_breaker.reset(instance, "instance enabled")
+                self._reset_probe_unlocked(instance)
                 self._notify_change()
                 return True
             return False
@@ -126,34 +287,92 @@ class InstancePool:
                 return True
             return False
 
+    def set_owned_instances(self, instance_ids: set[str] | None) -> None:
+        """Restrict dispatch to the instances this replica leases (None lifts the restriction)."""
+        with self._lock:
+            if instance_ids == self._owned:
+                return
+            self._owned = None if instance_ids is None else set(instance_ids)
+            self._notify_change()
+
+    def is_owned(self, instance_id: str) -> bool:
+        return self._owned is None or instance_id in self._owned
+
     def get_all(self) -> list[MinerUInstance]:
         """Get all instances."""
         with self._lock:
             return list(self._instances.values())
 
-    async def health_check(self, timeout: int | None = None) -> None:
-        """Check health of all instances.
+    def _reset_probe_unlocked(self, instance: MinerUInstance) -> None:
+        """Probe on the next health check tick. Must hold lock."""
+        instance.next_probe_at = None
+        instance.healthy_probes = 0
+
+    def get_probe_latency(self, instance_id: str) -> dict[str, Any]:
+        """Health probe latency histogram for an instance."""
+        return (PROBE_SECONDS.get(instance_id) or Histogram()).snapshot()
+
+    def seconds_until_next_probe(self) -> float:
+        """How long the health loop may sleep before an instance is due."""
+        now = time.monotonic()
+        with self._lock:
+            due = [inst.next_probe_at or now for inst in self._instances.values() if inst.enabled]
+        return min(max(min(due, default=now + HEALTH_CHECK_TICK) - now, 0.0), HEALTH_CHECK_TICK)
+
+    async def health_check(self, timeout: int | None = None, interval: float = 30.0) -> None:
+        """Probe every enabled instance that is due, concurrently.
 
-        MinerU API doesn't have a /health endpoint, so we use /docs or /openapi.json instead.
+        MinerU API doesn't have a /health endpoint, so by default we probe
+        /openapi.json; each instance can set a lighter ``health_path``.
+        Probes share the pooled per-instance connections and at most
+        ``health_check_concurrency`` run at once. An instance that completed a
+        task within the last interval counts as healthy without a probe.
         """
         timeout = timeout or self._health_check_timeout
-        instances = self.get_all()
+        now = time.monotonic()
+        due = [
+            inst for inst in self.get_all()
+            if inst.enabled and (inst.next_probe_at is None or inst.next_probe_at <= now)
+        ]
+        if due:
+            await asyncio.gather(*(self._probe(inst, timeout, interval) for inst in due))
 
-        for instance in instances:
-            if not instance.enabled:
-                continue
+    async def _probe(self, instance: MinerUInstance, timeout: float, interval: float) -> None:
+        healthy_status = instance.status in (InstanceStatus.IDLE, InstanceStatus.BUSY)
+        if healthy_status and instance.last_success_at and time.monotonic() - instance.last_success_at < interval:
+            # Served a task successfully since the last probe: that is our heartbeat
+            self.update_heartbeat(instance.id)
+            self._schedule_probe(instance, healthy=True, interval=interval)
+            return
 
+        async with self._probe_semaphore:
+            started = time.monotonic()
             try:
-                async with httpx.AsyncClient(timeout=timeout) as client:
-                    # MinerU uses FastAPI, check /openapi.json for health
-                    response = await client.get(f"{instance.url}/openapi.json")
-                    if response.status_code == 200:
-                        self.update_heartbeat(instance.id)
-                        if instance.status == InstanceStatus.OFFLINE:
-                            self.set_status(instance.id, InstanceStatus.IDLE)
-                    else:
-                        if instance.current_task_id is None:
-                            self.set_status(instance.id, InstanceStatus.ERROR)
+                client = self.clients.http_client(instance.url)
+                response = await client.get(f"{instance.url}{instance.health_path}", timeout=timeout)
             except Exception:
-                if instance.current_task_id is None:
-                    self.set_status(instance.id, InstanceStatus.OFFLINE)
+                response = None
+            else:
+                PROBE_SECONDS.labels(instance.id).observe(time.monotonic() - started)
+
+        if response is not None and response.status_code == 200:
+            self.update_heartbeat(instance.id)
+            self._mark_reachable(instance.id)
+            self._schedule_probe(instance, healthy=True, interval=interval)
+            return
+
+        if not instance.current_task_ids:
+            self.set_status(instance.id, InstanceStatus.ERROR if response is not None else InstanceStatus.OFFLINE)
+        self._schedule_probe(instance, healthy=False, interval=interval)
+
+    def _schedule_probe(self, instance: MinerUInstance, healthy: bool, interval: float) -> None:
+        """Set the next probe time: back off while healthy, retry quickly while not."""
+        with self._lock:
+            if healthy:
+                instance.healthy_probes += 1
+                delay = interval * min(2 ** (instance.healthy_probes - 1), HEALTHY_BACKOFF_MAX)
+            else:
+                instance.healthy_probes = 0
+                delay = min(UNHEALTHY_PROBE_INTERVAL, interval)
+            delay *= random.uniform(1 - PROBE_JITTER, 1.0)
+            instance.next_probe_at = time.monotonic() + delay
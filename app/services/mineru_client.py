@@ -1,54 +1,173 @@
+import asyncio
 import base64
-from typing import Any
+import logging
+from typing import Any, BinaryIO
 import httpx
 
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Payload keys used by the center itself and never forwarded as form fields
+FILE_PAYLOAD_KEYS = {"file_base64", "file_name", "file_ref", "file_size", "file_pages"}
+
 
 class MinerUClient:
     """HTTP client for MinerU instances."""
 
-    def __init__(self, base_url: str, timeout: int = 300):
+    def __init__(self, base_url: str, timeout: int = 300, http_client: httpx.AsyncClient | None = None):
         self.base_url = base_url.rstrip("/")
         # Add extra buffer to httpx timeout so asyncio.wait_for fires first
         self.timeout = timeout + 10
+        # Shared pooled client from MinerUClientRegistry; a throwaway client
+        # is created per request when none is given.
+        self._http_client = http_client
+
+    async def _post(self, url: str, **kwargs: Any) -> httpx.Response:
+        if self._http_client is not None:
+            return await self._http_client.post(url, timeout=self.timeout, **kwargs)
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            return await client.post(url, **kwargs)
+
+    async def _get(self, url: str, timeout: float) -> httpx.Response:
+        if self._http_client is not None:
+            return await self._http_client.get(url, timeout=timeout)
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            return await client.get(url)
 
-    async def submit_task(self, payload: dict[str, Any], instance_backend: str | None = None) -> dict[str, Any]:
+    async def submit_task(self, payload: dict[str, Any], instance_backend: str | None = None,
+                          file: BinaryIO | None = None) -> dict[str, Any]:
         """Submit a task to MinerU instance via multipart/form-data.
 
         Args:
-            payload: The task payload containing file_base64, file_name, and form fields.
+            payload: The task payload containing file_name, form fields and
+                either a spooled file (passed as ``file``) or file_base64.
             instance_backend: The backend configured on the target instance.
                 If payload backend is 'auto' or missing, it will be replaced
                 with the instance's backend value.
+            file: Open spooled file; streamed from disk in chunks.
         """
+        # Work on a copy so the task payload (and its cache key) stays as submitted
+        payload = dict(payload)
+
         # Backend conversion logic
         payload_backend = payload.get("backend")
         if payload_backend == "auto" or not payload_backend:
             if instance_backend:
                 payload["backend"] = instance_backend
 
-        # Decode file from base64
-        file_base64 = payload.get("file_base64", "")
         file_name = payload.get("file_name", "document.pdf")
-        file_content = base64.b64decode(file_base64)
+        if file is not None:
+            file_content = file
+        else:
+            # Legacy inline payload: decode file from base64
+            file_content = base64.b64decode(payload.get("file_base64", ""))
 
         # Build form data (exclude file-related keys)
-        exclude_keys = {"file_base64", "file_name"}
-        data = {k: v for k, v in payload.items() if k not in exclude_keys}
+        data = {k: v for k, v in payload.items() if k not in FILE_PAYLOAD_KEYS}
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/file_parse",
-                files={"files": (file_name, file_content, "application/pdf")},
-                data=data,
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._post(
+            f"{self.base_url}/file_parse",
+            files={"files": (file_name, file_content, "application/pdf")},
+            data=data,
+        )
+        response.raise_for_status()
+        return response.json()
 
     async def health_check(self, timeout: int = 10) -> bool:
         """Check if instance is healthy."""
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.get(f"{self.base_url}/openapi.json")
-                return response.status_code == 200
+            response = await self._get(f"{self.base_url}/openapi.json", timeout)
+            return response.status_code == 200
         except Exception:
             return False
+
+
+class MinerUClientRegistry:
+    """Long-lived pooled httpx clients, one per MinerU instance URL.
+
+    Keeps TCP (and HTTP/2 where negotiated) connections alive between tasks
+    and health checks instead of opening a new connection pool per request.
+    """
+
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 60.0, http2: bool = True):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http2 = http2 and HTTP2_AVAILABLE
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._closing: set[asyncio.Task] = set()
+
+        # Metrics
+        self.clients_created = 0
+        self.requests_sent = 0
+        self.connections_opened = 0
+
+    def http_client(self, base_url: str) -> httpx.AsyncClient:
+        """Get (or create) the pooled httpx client for base_url."""
+        base_url = base_url.rstrip("/")
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self._limits,
+                http2=self._http2,
+                event_hooks={"request": [self._attach_trace]},
+            )
+            self._clients[base_url] = client
+            self.clients_created += 1
+        return client
+
+    def get(self, base_url: str, timeout: int = 300) -> MinerUClient:
+        """Get a MinerU client backed by the pooled connection for base_url."""
+        return MinerUClient(base_url, timeout, http_client=self.http_client(base_url))
+
+    async def _attach_trace(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event_name.endswith("send_request_headers.started"):
+            self.requests_sent += 1
+
+    def discard(self, base_url: str) -> None:
+        """Close and forget the pooled client for base_url (instance removed or URL changed)."""
+        client = self._clients.pop(base_url.rstrip("/"), None)
+        if client is None:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(client.aclose())
+        except RuntimeError:
+            return
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def aclose(self) -> None:
+        """Close all pooled clients (shutdown)."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP client: {e}")
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Connection pool counters. Requests not needing a new TCP connect reused one."""
+        return {
+            "clients": len(self._clients),
+            "clients_created": self.clients_created,
+            "http2": self._http2,
+            "requests": self.requests_sent,
+            "connections_opened": self.connections_opened,
+            "connections_reused": max(0, self.requests_sent - self.connections_opened),
+        }
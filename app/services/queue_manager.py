@@ -1,15 +1,59 @@
-import heapq
+import itertools
+import math
 import threading
+import time
 from typing import Callable
-from ..models.task import Task, TaskStatus
+
+from sortedcontainers import SortedList
+
+from ..models.task import MAX_PRIORITY, Task, TaskStatus
 
 
 class QueueManager:
-    """Thread-safe priority queue manager for tasks."""
+    """Thread-safe priority queue manager for tasks.
+
+    Tasks are kept in a sorted list of (-band, tag, queued_at, seq,
+    task_id) entries, so enqueue, removal, position and page lookups are
+    O(log n). Each tenant also has its own sorted sub-queue of its entries.
+
+    With fair share off the tag is 0 and tasks are FIFO within a priority.
+    With fair share on, the tag is a virtual finish time per priority: a
+    tenant's next task is tagged ``max(round, tenant's last tag) + 1 /
+    weight``, and dequeuing advances the priority's round to the dequeued
+    tag. Within a priority, tenants with queued work are served round-robin
+    in proportion to their weights, however many tasks each has queued.
+
+    The band is the task's priority. With aging on, a task gains one level
+    for every ``aging_interval`` boundary its aging clock has passed, so the
+    band is ``priority - floor(aged_at / aging_interval)``: the effective
+    priority ``band + floor(now / aging_interval)`` rises, but the order
+    between queued tasks never changes and nothing is re-sorted as time
+    passes. ``aged_at`` is the task's queue time, or the ``aged_at`` of the
+    task after it in its priority's fair order if that is older: a slot in
+    the fair order ages from when the task now behind it started waiting,
+    so one tenant's burst can't hold a band to itself, and tasks of one
+    priority keep their fair-share order while they age. Effective
+    priorities above MAX_PRIORITY are shown as MAX_PRIORITY; those tasks
+    keep their place ahead of newer ones.
+    """
 
     def __init__(self):
-        self._queue: list[Task] = []
+        self._entries = SortedList()
+        self._entry_map: dict[str, tuple] = {}
         self._task_map: dict[str, Task] = {}
+        self._priority_counts: dict[int, int] = {}
+        self._tenant_entries: dict[str, SortedList] = {}
+        self._fair_share = False
+        self._weights: dict[str, float] = {}
+        self._aging_interval = 0.0
+        # Fair share rounds: priority -> round, (priority, tenant) -> last tag
+        self._round: dict[int, float] = {}
+        self._tenant_round: dict[tuple[int, str], float] = {}
+        self._tenant_counts: dict[tuple[int, str], int] = {}
+        # Aging: priority -> (tag, queued_at, seq, task_id) in fair order, task_id -> aged_at
+        self._fair_order: dict[int, SortedList] = {}
+        self._aged_at: dict[str, float] = {}
+        self._seq = itertools.count()
         self._lock = threading.Lock()
         self._on_change_callbacks: list[Callable] = []
 
@@ -25,45 +69,160 @@ class QueueManager:
             except Exception:
                 pass
 
+    @staticmethod
+    def _order_time(task: Task) -> float:
+        """Timestamp the task is queued by (FIFO and aging)."""
+        return (task.order_at or task.created_at).timestamp()
+
+    def _make_entry(self, task: Task) -> tuple:
+        """Sort entry for a task: higher band first, then fair-share tag, then FIFO. Must hold lock."""
+        queued_at = self._order_time(task)
+        seq = next(self._seq)
+        tag = 0.0
+        if self._fair_share:
+            key = (task.priority, task.tenant)
+            tag = max(self._round.get(task.priority, 0.0), self._tenant_round.get(key, 0.0))
+            tag += 1 / self._weights.get(task.tenant, 1.0)
+            self._tenant_round[key] = tag
+        band = task.priority
+        if self._aging_interval:
+            fair_order = self._fair_order.get(task.priority)
+            if fair_order is None:
+                fair_order = self._fair_order[task.priority] = SortedList()
+            fair_key = (tag, queued_at, seq, task.id)
+            aged_at = queued_at
+            index = fair_order.bisect_right(fair_key)
+            if index < len(fair_order):
+                aged_at = min(aged_at, self._aged_at[fair_order[index][-1]])
+            fair_order.add(fair_key)
+            self._aged_at[task.id] = aged_at
+            band -= math.floor(aged_at / self._aging_interval)
+        return (-band, tag, queued_at, seq, task.id)
+
+    def effective_priority(self, task: Task) -> int:
+        """Priority the task is currently ordered at (its priority plus aging)."""
+        with self._lock:
+            entry = self._entry_map.get(task.id)
+            if not self._aging_interval or entry is None:
+                return task.priority
+            return min(-entry[0] + math.floor(time.time() / self._aging_interval), MAX_PRIORITY)
+
+    def _index_unlocked(self, task: Task, entry: tuple) -> None:
+        """Record an inserted entry in the maps and the tenant's sub-queue. Must hold lock."""
+        self._entry_map[task.id] = entry
+        self._task_map[task.id] = task
+        self._priority_counts[task.priority] = self._priority_counts.get(task.priority, 0) + 1
+        key = (task.priority, task.tenant)
+        self._tenant_counts[key] = self._tenant_counts.get(key, 0) + 1
+        sub_queue = self._tenant_entries.get(task.tenant)
+        if sub_queue is None:
+            sub_queue = self._tenant_entries[task.tenant] = SortedList()
+        sub_queue.add(entry)
+
+    def _insert_unlocked(self, task: Task) -> int:
+        """Insert a task. Returns its 1-indexed position. Must hold lock."""
+        entry = self._make_entry(task)
+        self._entries.add(entry)
+        self._index_unlocked(task, entry)
+        return self._entries.bisect_left(entry) + 1
+
+    def _insert_many_unlocked(self, tasks: list[Task]) -> None:
+        """Insert tasks with one bulk sorted-list update. Must hold lock."""
+        entries = [self._make_entry(task) for task in tasks]
+        self._entries.update(entries)
+        for task, entry in zip(tasks, entries):
+            self._index_unlocked(task, entry)
+
+    def _delete_unlocked(self, task_id: str) -> Task | None:
+        """Delete a task by ID. Must hold lock."""
+        entry = self._entry_map.pop(task_id, None)
+        if entry is None:
+            return None
+        self._entries.remove(entry)
+        task = self._task_map.pop(task_id)
+        self._priority_counts[task.priority] -= 1
+        if not self._priority_counts[task.priority]:
+            self._round.pop(task.priority, None)
+        sub_queue = self._tenant_entries[task.tenant]
+        sub_queue.remove(entry)
+        if not sub_queue:
+            del self._tenant_entries[task.tenant]
+        key = (task.priority, task.tenant)
+        self._tenant_counts[key] -= 1
+        if not self._tenant_counts[key]:
+            # An idle tenant starts again from the round when it comes back
+            del self._tenant_counts[key]
+            self._tenant_round.pop(key, None)
+        if self._aged_at.pop(task_id, None) is not None:
+            fair_order = self._fair_order[task.priority]
+            fair_order.remove(entry[1:])
+            if not fair_order:
+                del self._fair_order[task.priority]
+        return task
+
     def enqueue(self, task: Task) -> int:
         """Add task to queue. Returns position in queue."""
         with self._lock:
             if task.id in self._task_map:
                 raise ValueError(f"Task {task.id} already in queue")
-            heapq.heappush(self._queue, task)
-            self._task_map[task.id] = task
-            position = self._get_position_unlocked(task.id)
+            position = self._insert_unlocked(task)
             self._notify_change()
             return position
 
-    def dequeue(self) -> Task | None:
-        """Remove and return highest priority task."""
+    def enqueue_many(self, tasks: list[Task]) -> None:
+        """Add several tasks under one lock acquisition with a single change notification."""
         with self._lock:
-            while self._queue:
-                task = heapq.heappop(self._queue)
+            for task in tasks:
                 if task.id in self._task_map:
-                    del self._task_map[task.id]
-                    self._notify_change()
-                    return task
-            return None
+                    raise ValueError(f"Task {task.id} already in queue")
+            self._insert_many_unlocked(tasks)
+            self._notify_change()
+
+    def dequeue(self, skip_tenants: set[str] | None = None) -> Task | None:
+        """Remove and return highest priority task.
+
+        Tasks of the tenants in skip_tenants (e.g. at their running quota)
+        stay queued; the first task of any other tenant is returned.
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+            if skip_tenants:
+                heads = [sub_queue[0] for tenant, sub_queue in self._tenant_entries.items()
+                         if tenant not in skip_tenants]
+                if not heads:
+                    return None
+                entry = min(heads)
+            else:
+                entry = self._entries[0]
+            task = self._delete_unlocked(entry[-1])
+            if self._fair_share and self._priority_counts[task.priority]:
+                self._round[task.priority] = max(self._round.get(task.priority, 0.0), entry[1])
+            self._notify_change()
+            return task
 
     def peek(self) -> Task | None:
         """Return highest priority task without removing."""
         with self._lock:
-            while self._queue:
-                if self._queue[0].id in self._task_map:
-                    return self._queue[0]
-                heapq.heappop(self._queue)
-            return None
+            if not self._entries:
+                return None
+            return self._task_map[self._entries[0][-1]]
 
     def remove(self, task_id: str) -> bool:
         """Remove task from queue. Returns True if removed."""
         with self._lock:
-            if task_id in self._task_map:
-                del self._task_map[task_id]
+            if self._delete_unlocked(task_id) is None:
+                return False
+            self._notify_change()
+            return True
+
+    def remove_many(self, task_ids: list[str]) -> list[Task]:
+        """Remove the queued tasks among task_ids in one pass. Returns the removed tasks."""
+        with self._lock:
+            removed = [task for task_id in task_ids if (task := self._delete_unlocked(task_id)) is not None]
+            if removed:
                 self._notify_change()
-                return True
-            return False
+            return removed
 
     def get(self, task_id: str) -> Task | None:
         """Get task by ID."""
@@ -71,47 +230,122 @@ class QueueManager:
             return self._task_map.get(task_id)
 
     def get_all(self) -> list[Task]:
-        """Get all tasks in queue (sorted by priority)."""
-        with self._lock:
-            tasks = [t for t in self._queue if t.id in self._task_map]
-            return sorted(tasks, reverse=True)
-
-    def _get_position_unlocked(self, task_id: str) -> int:
-        """Get position of task in queue (1-indexed). Must hold lock."""
-        sorted_tasks = sorted(
-            [t for t in self._queue if t.id in self._task_map],
-            reverse=True
-        )
-        for i, task in enumerate(sorted_tasks):
-            if task.id == task_id:
-                return i + 1
-        return -1
+        """Get all tasks in queue (in dispatch order)."""
+        with self._lock:
+            return [self._task_map[entry[-1]] for entry in self._entries]
+
+    def get_page(self, offset: int, limit: int) -> list[Task]:
+        """Get up to limit tasks starting at offset (0-indexed, in dispatch order)."""
+        with self._lock:
+            entries = self._entries.islice(max(offset, 0), max(offset, 0) + max(limit, 0))
+            return [self._task_map[entry[-1]] for entry in entries]
 
     def get_position(self, task_id: str) -> int:
-        """Get position of task in queue (1-indexed)."""
+        """Get position of task in queue (1-indexed), or -1 if not queued."""
         with self._lock:
-            return self._get_position_unlocked(task_id)
+            entry = self._entry_map.get(task_id)
+            if entry is None:
+                return -1
+            return self._entries.bisect_left(entry) + 1
 
     def size(self) -> int:
         """Return number of tasks in queue."""
         with self._lock:
             return len(self._task_map)
 
+    def count_by_priority(self) -> dict[int, int]:
+        """Queued task count per priority."""
+        with self._lock:
+            return {p: n for p, n in self._priority_counts.items() if n}
+
+    def count_by_tenant(self) -> dict[str, int]:
+        """Queued task count per tenant."""
+        with self._lock:
+            return {tenant: len(sub_queue) for tenant, sub_queue in self._tenant_entries.items()}
+
+    def count_for_tenant(self, tenant: str) -> int:
+        """Queued task count of one tenant."""
+        with self._lock:
+            sub_queue = self._tenant_entries.get(tenant)
+            return len(sub_queue) if sub_queue is not None else 0
+
+    def set_fair_share(self, enabled: bool, weights: dict[str, float] | None = None) -> None:
+        """Turn per-tenant fair share on or off and set tenant weights (default 1).
+
+        Queued tasks are re-tagged in their current order, so the change
+        applies to the existing backlog too.
+        """
+        weights = dict(weights or {})
+        with self._lock:
+            if enabled == self._fair_share and weights == self._weights:
+                return
+            self._fair_share = enabled
+            self._weights = weights
+            self._rebuild_unlocked()
+
+    def set_aging(self, interval: float) -> None:
+        """Raise queued tasks one priority level per interval seconds waited (0 = off).
+
+        Queued tasks are re-sorted once for the new setting.
+        """
+        with self._lock:
+            if interval == self._aging_interval:
+                return
+            self._aging_interval = interval
+            self._rebuild_unlocked()
+
+    def _rebuild_unlocked(self) -> None:
+        """Re-create every entry (in current order) after an ordering setting changed. Must hold lock."""
+        tasks = [self._task_map[entry[-1]] for entry in self._entries]
+        self._clear_unlocked()
+        self._insert_many_unlocked(tasks)
+        self._notify_change()
+
+    def _clear_unlocked(self) -> None:
+        """Drop every task and fair-share round. Must hold lock."""
+        self._entries.clear()
+        self._entry_map.clear()
+        self._task_map.clear()
+        self._priority_counts.clear()
+        self._tenant_entries.clear()
+        self._round.clear()
+        self._tenant_round.clear()
+        self._tenant_counts.clear()
+        self._fair_order.clear()
+        self._aged_at.clear()
+
     def clear(self) -> None:
         """Clear all tasks from queue."""
         with self._lock:
-            self._queue.clear()
-            self._task_map.clear()
+            self._clear_unlocked()
             self._notify_change()
 
+    def update_priorities(self, task_ids: list[str], priority: int) -> list[Task]:
+        """Move the queued tasks among task_ids to a new priority in one pass.
+
+        Tasks keep their FIFO order (created_at) within the new priority
+        (behind their tenant's queued tasks there when fair share is on).
+        Returns the tasks that were queued.
+        """
+        with self._lock:
+            moved = [task for task_id in task_ids if (task := self._delete_unlocked(task_id)) is not None]
+            for task in moved:
+                task.priority = priority
+            self._insert_many_unlocked(moved)
+            if moved:
+                self._notify_change()
+            return moved
+
     def update_task(self, task_id: str, **kwargs) -> Task | None:
         """Update task properties."""
         with self._lock:
             if task_id not in self._task_map:
                 return None
-            task = self._task_map[task_id]
+            task = self._delete_unlocked(task_id)
             for key, value in kwargs.items():
                 if hasattr(task, key):
                     setattr(task, key, value)
+            # Re-insert so a priority change moves the task
+            self._insert_unlocked(task)
             self._notify_change()
             return task
@@ -0,0 +1,219 @@
+"""Content-hash result cache for parsed documents.
+
+Results are keyed on the SHA-256 of the file bytes (the spool file_ref) plus
+the parse-relevant form fields, stored as JSON files on disk and evicted in
+LRU order when the entry or byte limit is exceeded.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Form fields that change the parse output (in addition to every return_* flag)
+CACHE_KEY_FIELDS = ("backend", "parse_method", "lang_list", "start_page_id", "end_page_id")
+
+
+def make_cache_key(payload: dict[str, Any]) -> str | None:
+    """Build the cache key for a task payload, or None if it has no spooled file."""
+    file_ref = payload.get("file_ref")
+    if not file_ref:
+        return None
+    options = {
+        k: str(v) for k, v in payload.items()
+        if k in CACHE_KEY_FIELDS or k.startswith("return_")
+    }
+    digest = hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()
+    return f"{file_ref}-{digest[:16]}"
+
+
+class ResultCache:
+    """On-disk LRU cache of MinerU results.
+
+    A shared cache (cluster mode) is written by other processes too, so the
+    in-memory index is only a hint: lookups and invalidations check the disk,
+    adopting entries found there into the index and forgetting removed ones.
+    """
+
+    def __init__(self, root: str, max_entries: int = 1000, max_bytes: int = 1024 * 1024 * 1024,
+                 shared: bool = False):
+        self.root = root
+        self.shared = shared
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._index: OrderedDict[str, int] = OrderedDict()  # key -> size, oldest first
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU index from the files on disk (mtime = last use)."""
+        if not os.path.isdir(self.root):
+            return
+        entries = []
+        for sub in os.scandir(self.root):
+            if not sub.is_dir() or sub.name == "tmp":
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+        if entries:
+            logger.info(f"Loaded {len(entries)} cached results ({self._bytes / 1024 / 1024:.1f} MB)")
+
+    def _check_disk(self, key: str) -> bool:
+        """Sync the index entry for key with the disk (shared caches). Returns True if it exists."""
+        try:
+            size = os.path.getsize(self._path_for(key))
+        except OSError:
+            # Removed by another process
+            self._forget(key)
+            return False
+        if key not in self._index:
+            self._index[key] = size
+            self._bytes += size
+            self._evict()
+        return key in self._index
+
+    def has(self, key: str) -> bool:
+        """Check for an entry without counting a lookup."""
+        if self.shared:
+            return self._check_disk(key)
+        return key in self._index
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return the cached result for key, or None on a miss."""
+        if not self.has(key):
+            self.misses += 1
+            return None
+        path = self._path_for(key)
+
+        def read() -> dict[str, Any]:
+            with open(path, "rb") as f:
+                result = json.load(f)
+            os.utime(path)
+            return result
+
+        try:
+            result = await asyncio.to_thread(read)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+            self._forget(key)
+            self.misses += 1
+            return None
+        if key in self._index:
+            self._index.move_to_end(key)
+        self.hits += 1
+        return result
+
+    async def put(self, key: str, result: dict[str, Any]) -> None:
+        """Store a result and evict least recently used entries over the limits."""
+        path = self._path_for(key)
+        tmp_dir = os.path.join(self.root, "tmp")
+
+        def write() -> int:
+            data = json.dumps(result).encode()
+            os.makedirs(tmp_dir, exist_ok=True)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            return len(data)
+
+        try:
+            size = await asyncio.to_thread(write)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Failed to cache result {key}: {e}")
+            return
+
+        self._bytes -= self._index.pop(key, 0)
+        self._index[key] = size
+        self._bytes += size
+        self._evict()
+
+    def _adopt_dir(self, path: str, prefix: str = "") -> None:
+        """Index the entries in one cache subdirectory that other processes wrote."""
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            return
+        for entry in entries:
+            key = entry.name[:-5]
+            if entry.name.endswith(".json") and key.startswith(prefix) and key not in self._index:
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                self._index[key] = size
+                self._bytes += size
+
+    def _evict(self) -> None:
+        while self._index and (len(self._index) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._index))
+            self._remove(key)
+            self.evictions += 1
+
+    def _forget(self, key: str) -> None:
+        self._bytes -= self._index.pop(key, 0)
+
+    def _remove(self, key: str) -> None:
+        self._forget(key)
+        try:
+            os.remove(self._path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self, key: str) -> bool:
+        """Remove one entry. Returns True if it existed."""
+        if not self.has(key):
+            return False
+        self._remove(key)
+        return True
+
+    def invalidate_file(self, file_hash: str) -> int:
+        """Remove every entry for a file (all option combinations)."""
+        if self.shared:
+            self._adopt_dir(os.path.join(self.root, file_hash[:2]), f"{file_hash}-")
+        keys = [k for k in self._index if k.startswith(f"{file_hash}-")]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> int:
+        """Remove all entries."""
+        if self.shared and os.path.isdir(self.root):
+            for sub in os.scandir(self.root):
+                if sub.is_dir() and sub.name != "tmp":
+                    self._adopt_dir(sub.path)
+        keys = list(self._index)
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def get_stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,243 @@
+"""Durable store for the results of completed tasks.
+
+Every completed task's MinerU response is written to disk as zstd-compressed
+blobs, one per retrievable part (the full JSON plus markdown, middle_json,
+content_list, model_output and images split out of its documents), so a
+client can download just the part it needs. The SQLite ``task_results``
+table is the index: part sizes and creation time per task. Entries expire
+after ``ttl`` seconds (pruned every PRUNE_INTERVAL seconds by the app, see
+``prune_loop``) and the oldest are dropped once the stored bytes exceed
+``max_bytes``.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Iterator
+
+import zstandard
+
+from . import database
+
+logger = logging.getLogger(__name__)
+
+# Retrievable parts and their media types
+RESULT_PARTS = {
+    "full": "application/json",
+    "md": "text/markdown; charset=utf-8",
+    "middle_json": "application/json",
+    "content_list": "application/json",
+    "model_output": "application/json",
+    "images": "application/json",
+}
+
+# Decompressed bytes per streamed chunk
+CHUNK_SIZE = 64 * 1024
+# Entries removed per retention query
+PRUNE_BATCH = 100
+# Seconds between retention sweeps of prune_loop
+PRUNE_INTERVAL = 600.0
+
+
+def _decode(value: Any) -> Any:
+    """Decode a JSON string field (MinerU returns middle_json etc. as strings)."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def split_parts(result: dict[str, Any]) -> dict[str, bytes]:
+    """Serialize a MinerU response into its retrievable parts.
+
+    ``md`` is the markdown of every document joined by blank lines; the JSON
+    parts map document name to that document's field.
+    """
+    parts = {"full": json.dumps(result, ensure_ascii=False).encode()}
+    documents = {
+        name: doc for name, doc in (result.get("results") or {}).items() if isinstance(doc, dict)
+    }
+    markdown = [doc["md_content"] for doc in documents.values() if doc.get("md_content")]
+    if markdown:
+        parts["md"] = "\n\n".join(markdown).encode()
+    for part in ("middle_json", "content_list", "model_output", "images"):
+        values = {name: _decode(doc[part]) for name, doc in documents.items() if doc.get(part)}
+        if values:
+            parts[part] = json.dumps(values, ensure_ascii=False).encode()
+    return parts
+
+
+def iter_decompressed(path: str, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+    """Yield decompressed bytes ``start..end`` (inclusive) of a stored part."""
+    dctx = zstandard.ZstdDecompressor()
+    position = 0
+    with open(path, "rb") as f:
+        for chunk in dctx.read_to_iter(f, write_size=CHUNK_SIZE):
+            chunk_end = position + len(chunk)
+            if chunk_end > start:
+                lo = max(start - position, 0)
+                hi = len(chunk) if end is None else min(end + 1 - position, len(chunk))
+                if hi > lo:
+                    yield chunk[lo:hi]
+            position = chunk_end
+            if end is not None and position > end:
+                return
+
+
+def iter_compressed(path: str) -> Iterator[bytes]:
+    """Yield the raw zstd frame of a stored part (for ``Content-Encoding: zstd``)."""
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+class ResultStore:
+    """zstd-compressed result blobs on disk, indexed in SQLite."""
+
+    def __init__(self, root: str, ttl: float = 7 * 24 * 3600, max_bytes: int = 10 * 1024 * 1024 * 1024,
+                 level: int = 3):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.level = level
+        self._entries = 0
+        self._bytes = 0
+        self.evictions = 0
+        self._prune_lock = asyncio.Lock()
+
+    def _dir_for(self, task_id: str) -> str:
+        return os.path.join(self.root, task_id[:2], task_id)
+
+    def path_for(self, task_id: str, part: str) -> str:
+        return os.path.join(self._dir_for(task_id), f"{part}.zst")
+
+    async def load(self) -> None:
+        """Read the totals from the index and drop expired entries."""
+        self._entries, self._bytes = await database.get_result_store_size()
+        if self._entries:
+            logger.info(f"Result store holds {self._entries} results ({self._bytes / 1024 / 1024:.1f} MB)")
+        await self.prune()
+
+    async def put(self, task_id: str, result: dict[str, Any]) -> None:
+        """Compress and store a completed task's result, then apply retention."""
+        target = self._dir_for(task_id)
+        tmp_root = os.path.join(self.root, "tmp")
+
+        def write() -> dict[str, list[int]]:
+            cctx = zstandard.ZstdCompressor(level=self.level)
+            tmp_dir = os.path.join(tmp_root, uuid.uuid4().hex)
+            os.makedirs(tmp_dir)
+            sizes = {}
+            try:
+                for part, data in split_parts(result).items():
+                    compressed = cctx.compress(data)
+                    with open(os.path.join(tmp_dir, f"{part}.zst"), "wb") as f:
+                        f.write(compressed)
+                    sizes[part] = [len(data), len(compressed)]
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.rmtree(target, ignore_errors=True)
+                os.replace(tmp_dir, target)
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+            return sizes
+
+        try:
+            parts = await asyncio.to_thread(write)
+        except (OSError, TypeError, ValueError, zstandard.ZstdError) as e:
+            logger.warning(f"Failed to store result of task {task_id}: {e}")
+            return
+
+        stored = sum(compressed for _, compressed in parts.values())
+        try:
+            replaced = await database.save_result_index(task_id, time.time(), stored, parts)
+        except Exception as e:
+            logger.error(f"Failed to index result of task {task_id}: {e}")
+            shutil.rmtree(target, ignore_errors=True)
+            return
+        if replaced is None:
+            self._entries += 1
+        self._bytes += stored - (replaced or 0)
+        if self._bytes > self.max_bytes:
+            await self.prune()
+
+    async def get_entry(self, task_id: str) -> dict[str, Any] | None:
+        """Index entry of a stored, unexpired result: ``{"created_at", "parts": {part: [size, stored]}}``."""
+        entry = await database.get_result_index(task_id)
+        if entry is None:
+            return None
+        if self.ttl and entry["created_at"] <= time.time() - self.ttl:
+            await self.prune()
+            return None
+        return entry
+
+    async def read(self, task_id: str, part: str = "full") -> bytes | None:
+        """Decompressed bytes of a stored part, or None if it is not stored."""
+        path = self.path_for(task_id, part)
+
+        def read() -> bytes | None:
+            try:
+                return b"".join(iter_decompressed(path))
+            except FileNotFoundError:
+                return None
+
+        return await asyncio.to_thread(read)
+
+    async def prune(self) -> int:
+        """Delete expired entries, then the oldest ones until under max_bytes."""
+        removed = 0
+        async with self._prune_lock:
+            if self.ttl:
+                while batch := await database.get_expired_results(time.time() - self.ttl, PRUNE_BATCH):
+                    removed += await self._remove(batch)
+            while self._bytes > self.max_bytes:
+                batch = await database.get_oldest_results(PRUNE_BATCH)
+                if not batch:
+                    break
+                excess, victims = self._bytes - self.max_bytes, []
+                for task_id, stored in batch:
+                    victims.append((task_id, stored))
+                    excess -= stored
+                    if excess <= 0:
+                        break
+                removed += await self._remove(victims)
+                self.evictions += len(victims)
+        return removed
+
+    async def prune_loop(self, interval: float = PRUNE_INTERVAL) -> None:
+        """Prune expired entries every interval seconds until cancelled."""
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                await self.prune()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Result store prune error: {e}")
+
+    async def _remove(self, batch: list[tuple[str, int]]) -> int:
+        await database.delete_result_index([task_id for task_id, _ in batch])
+        self._entries -= len(batch)
+        self._bytes -= sum(stored for _, stored in batch)
+
+        def unlink() -> None:
+            for task_id, _ in batch:
+                shutil.rmtree(self._dir_for(task_id), ignore_errors=True)
+
+        await asyncio.to_thread(unlink)
+        return len(batch)
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "entries": self._entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+        }
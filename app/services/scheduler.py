@@ -1,20 +1,58 @@
 import asyncio
+import heapq
+import itertools
 import logging
+import time
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from ..models.task import Task, TaskStatus
-from ..models.instance import InstanceStatus
-from .mineru_client import MinerUClient
+import httpx
+
+from ..models.task import DEFAULT_TENANT, Task, TaskStatus
+from .result_cache import make_cache_key
+from .selection import estimate_pages
+from .sharding import ShardGroup, plan_shards, merge_shard_results
 from . import database
+from ..utils.metrics import LONG_BUCKETS, counter, histogram
+from ..utils.retry import backoff_delay
 
 if TYPE_CHECKING:
     from .queue_manager import QueueManager
     from .instance_pool import InstancePool
+    from .spool import FileSpool
+    from .result_cache import ResultCache
+    from .result_store import ResultStore
+    from .cluster import ClusterCoordinator
     from ..models.config import CenterConfig
 
 logger = logging.getLogger(__name__)
 
+# Fallback wake-up interval for the dispatch loop. Dispatch is driven by
+# queue/pool change events; this timer only covers queue timeouts and any
+# missed notification.
+FALLBACK_INTERVAL = 5.0
+
+QUEUE_WAIT_SECONDS = histogram(
+    "mineru_center_queue_wait_seconds", "Time from enqueue to dispatch", buckets=LONG_BUCKETS
+)
+TENANT_QUEUE_WAIT_SECONDS = histogram(
+    "mineru_center_tenant_queue_wait_seconds", "Time from enqueue to dispatch per tenant",
+    ("tenant",), buckets=LONG_BUCKETS
+)
+TASK_DURATION_SECONDS = histogram(
+    "mineru_center_task_duration_seconds", "Time from dispatch to successful completion",
+    ("instance_id", "backend"), buckets=LONG_BUCKETS
+)
+UPLOAD_BYTES = counter("mineru_center_upload_bytes_total", "File bytes sent to instances", ("instance_id",))
+TASKS_FINISHED = counter("mineru_center_tasks_finished_total", "Tasks reaching a final state", ("status",))
+TASK_RETRIES = counter("mineru_center_task_retries_total", "Retries scheduled", ("reason",))
+TASK_TIMEOUTS = counter("mineru_center_task_timeouts_total", "Timed out attempts", ("stage",))
+
+# Retry backoff: config.retry_delay * RETRY_BACKOFF ** (retry - 1), capped and jittered
+RETRY_BACKOFF = 2.0
+RETRY_MAX_DELAY = 300.0
+RETRY_JITTER = 0.5
+
 
 class Scheduler:
     """Core task scheduler - runs asynchronously."""
@@ -23,18 +61,140 @@ class Scheduler:
         self,
         queue_manager: "QueueManager",
         instance_pool: "InstancePool",
-        config: "CenterConfig"
+        config: "CenterConfig",
+        spool: "FileSpool | None" = None,
+        result_cache: "ResultCache | None" = None,
+        result_store: "ResultStore | None" = None
     ):
         self.queue = queue_manager
         self.pool = instance_pool
         self.config = config
+        self.spool = spool
+        self.result_cache = result_cache
+        self.result_store = result_store
+        # Set in cluster mode: new tasks go through the shared queue in the database
+        self.cluster: "ClusterCoordinator | None" = None
         self._running = False
         self._task: asyncio.Task | None = None
         self._running_tasks: dict[str, Task] = {}
+        self._executions: dict[str, asyncio.Task] = {}  # task id -> request to its instance
         self._failed_tasks: dict[str, Task] = {}  # Store failed tasks for retry
         self._task_futures: dict[str, asyncio.Future] = {}
+        # Single-flight: coalescing key -> leader task, leader id -> attached tasks
+        self._inflight: dict[str, Task] = {}
+        self._followers: dict[str, list[Task]] = {}
+        self._queued_by_key: dict[str, set[str]] = {}  # key -> ids of queued tasks
+        self._shard_groups: dict[str, ShardGroup] = {}  # parent id -> shards in flight
+        # Delayed retries: heap of (ready_at loop time, seq, task); cancelled
+        # entries are dropped lazily when they are no longer in _retrying
+        self._retry_heap: list[tuple[float, int, Task]] = []
+        self._retrying: dict[str, Task] = {}
+        self._retry_seq = itertools.count()
         self._lock = asyncio.Lock()
         self._on_change_callbacks: list = []  # Change notification callbacks
+        self._wakeup = asyncio.Event()
+        # Watchers (SSE / long-poll): one shared future per watched task, resolved
+        # with the task on its next status change, and one for any queue change
+        self._task_events: dict[str, asyncio.Future] = {}
+        self._queue_event: asyncio.Future | None = None
+
+        # Wake the dispatcher when work is enqueued or an instance frees up
+        self.queue.add_change_callback(self.wake)
+        self.queue.add_change_callback(self._publish_queue_change)
+        self.pool.add_change_callback(self.wake)
+
+    def wake(self) -> None:
+        """Wake the dispatch loop so it re-checks the queue and instances."""
+        self._wakeup.set()
+
+    def enqueue(self, task: Task) -> int:
+        """Add a task to the queue. Returns position in queue.
+
+        Tasks with a spooled file are indexed by their coalescing key so an
+        identical task finishing can complete them straight from the queue.
+        """
+        task.enqueued_at = time.monotonic()
+        position = self.queue.enqueue(task)
+        key = make_cache_key(task.payload)
+        if key is not None:
+            self._queued_by_key.setdefault(key, set()).add(task.id)
+        self._publish(task)
+        return position
+
+    def enqueue_many(self, tasks: list[Task]) -> None:
+        """Add several tasks to the queue in one pass (see enqueue)."""
+        now = time.monotonic()
+        for task in tasks:
+            task.enqueued_at = now
+        self.queue.enqueue_many(tasks)
+        for task in tasks:
+            key = make_cache_key(task.payload)
+            if key is not None:
+                self._queued_by_key.setdefault(key, set()).add(task.id)
+            self._publish(task)
+
+    async def submit(self, tasks: list[Task]) -> None:
+        """Queue new tasks whose rows are saved.
+
+        In cluster mode they are handed to the shared queue and run on
+        whichever replica claims them; otherwise they are enqueued here.
+        """
+        if self.cluster is not None:
+            await self.cluster.submit(tasks)
+        else:
+            self.enqueue_many(tasks)
+
+    def next_task_event(self, task_id: str) -> asyncio.Future:
+        """Future resolved with the task at its next status change.
+
+        All watchers of a task share one future, so a transition costs one
+        set_result no matter how many clients wait on it. Await it through
+        asyncio.shield or asyncio.wait so a timed-out waiter doesn't cancel it.
+        """
+        future = self._task_events.get(task_id)
+        if future is None or future.done():
+            future = self._task_events[task_id] = asyncio.get_running_loop().create_future()
+        return future
+
+    def next_queue_event(self) -> asyncio.Future:
+        """Future resolved at the next queue change (positions may have moved)."""
+        if self._queue_event is None or self._queue_event.done():
+            self._queue_event = asyncio.get_running_loop().create_future()
+        return self._queue_event
+
+    def _publish(self, task: Task) -> None:
+        """Wake everyone watching this task."""
+        future = self._task_events.pop(task.id, None)
+        if future is not None and not future.done():
+            future.set_result(task)
+
+    def _publish_queue_change(self) -> None:
+        future, self._queue_event = self._queue_event, None
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def find_task(self, task_id: str) -> Task | None:
+        """A task the scheduler still holds: queued, running, retrying or failed.
+
+        In cluster mode this includes tasks submitted here that another
+        replica runs.
+        """
+        return (
+            self.queue.get(task_id)
+            or self._running_tasks.get(task_id)
+            or self._retrying.get(task_id)
+            or self._failed_tasks.get(task_id)
+            or (self.cluster.find_task(task_id) if self.cluster is not None else None)
+        )
+
+    def _unindex_queued(self, task: Task) -> None:
+        """Drop a task that left the queue from the coalescing index."""
+        key = make_cache_key(task.payload)
+        ids = self._queued_by_key.get(key) if key is not None else None
+        if ids is not None:
+            ids.discard(task.id)
+            if not ids:
+                del self._queued_by_key[key]
 
     def add_change_callback(self, callback) -> None:
         """Register a callback for state changes."""
@@ -53,6 +213,7 @@ class Scheduler:
         if self._running:
             return
         self._running = True
+        self._wakeup.set()
         self._task = asyncio.create_task(self._run_loop())
         logger.info("Scheduler started")
 
@@ -68,12 +229,32 @@ class Scheduler:
         logger.info("Scheduler stopped")
 
     async def _run_loop(self) -> None:
-        """Main scheduler loop."""
+        """Main scheduler loop.
+
+        Sleeps until woken by a queue or instance change, until the next
+        delayed retry is due or an instance's breaker cool-down ends, falling back to a slow timer so queue timeouts
+        are still checked when nothing happens.
+        """
+        loop = asyncio.get_running_loop()
+        last_timeout_check = loop.time()
         while self._running:
             try:
+                timeout = FALLBACK_INTERVAL
+                if self._retry_heap:
+                    timeout = min(timeout, max(self._retry_heap[0][0] - loop.time(), 0.0))
+                probe_at = self.pool.next_breaker_probe_at()
+                if probe_at is not None:
+                    timeout = min(timeout, max(probe_at - time.monotonic(), 0.0))
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                await self._promote_due_retries()
                 await self._dispatch_pending_tasks()
-                await self._check_timeouts()
-                await asyncio.sleep(0.5)
+                if loop.time() - last_timeout_check >= FALLBACK_INTERVAL:
+                    last_timeout_check = loop.time()
+                    await self._check_timeouts()
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -83,32 +264,285 @@ class Scheduler:
     async def _dispatch_pending_tasks(self) -> None:
         """Dispatch pending tasks to available instances."""
         while True:
-            instance = self.pool.get_idle_instance()
+            instance = self.pool.get_idle_instance(self.config.selection_policy)
             if not instance:
                 break
 
-            task = self.queue.dequeue()
+            task = self.queue.dequeue(self._tenants_at_running_limit())
             if not task:
                 break
 
+            if await self._coalesce(task):
+                continue
+
+            if await self._split(task):
+                continue
+
             await self._dispatch_task(task, instance.id)
 
+    def count_running_by_tenant(self) -> dict[str, int]:
+        """Running task count per tenant (a split document counts as its shards)."""
+        counts: dict[str, int] = {}
+        for task in self._running_tasks.values():
+            if task.id not in self._shard_groups:
+                counts[task.tenant] = counts.get(task.tenant, 0) + 1
+        return counts
+
+    def get_tenant_stats(self) -> dict[str, dict]:
+        """Queued and running tasks, dispatches and queue wait quantiles per tenant."""
+        queued = self.queue.count_by_tenant()
+        running = self.count_running_by_tenant()
+        waits = {key[0]: child for key, child in TENANT_QUEUE_WAIT_SECONDS.children().items()}
+        stats = {}
+        for tenant in sorted({*queued, *running, *waits}):
+            wait = waits.get(tenant)
+            stats[tenant] = {
+                "queued": queued.get(tenant, 0),
+                "running": running.get(tenant, 0),
+                "dispatched": wait.count if wait else 0,
+                "wait_p50": wait.quantile(0.5) if wait else None,
+                "wait_p99": wait.quantile(0.99) if wait else None,
+            }
+        return stats
+
+    def _tenants_at_running_limit(self) -> set[str] | None:
+        """Tenants whose queued tasks must wait for one of their running tasks to finish."""
+        limit = self.config.tenant_max_running
+        if not limit:
+            return None
+        return {tenant for tenant, count in self.count_running_by_tenant().items() if count >= limit}
+
+    async def _coalesce(self, task: Task) -> bool:
+        """Attach a dequeued task to an identical task that is already in flight.
+
+        Identical means same file content and parse options (the result cache
+        key). Returns True if the task was attached or completed from the
+        result cache, in which case it must not be dispatched.
+        """
+        key = make_cache_key(task.payload)
+        if key is None:
+            return False
+        self._unindex_queued(task)
+
+        leader = self._inflight.get(key)
+        if leader is task:
+            # Leader coming back from a retry
+            return False
+        if leader is None:
+            # An identical task may have completed while this one was queued
+            if self._cache_enabled() and self.result_cache.has(key):
+                result = await self.result_cache.get(key)
+                if result is not None:
+                    task.started_at = datetime.now()
+                    await self._finish_task(task, TaskStatus.COMPLETED, result=result)
+                    logger.info(f"Task {task.id} served from result cache")
+                    return True
+            self._inflight[key] = task
+            return False
+
+        task.status = TaskStatus.RUNNING
+        task.started_at = datetime.now()
+        task.instance_id = leader.instance_id
+        self._publish(task)
+        async with self._lock:
+            self._running_tasks[task.id] = task
+        self._followers.setdefault(leader.id, []).append(task)
+
+        instance = self.pool.get_instance(leader.instance_id) if leader.instance_id else None
+        try:
+            await database.update_task_status(
+                task.id,
+                TaskStatus.RUNNING.value,
+                started_at=task.started_at.isoformat(),
+                instance_id=task.instance_id,
+                instance_name=instance.name if instance else None
+            )
+        except Exception as e:
+            logger.error(f"Failed to update task status in database: {e}")
+
+        logger.info(f"Task {task.id} attached to identical in-flight task {leader.id}")
+        return True
+
+    async def _settle_followers(self, leader: Task) -> None:
+        """Hand a finished leader's outcome to every task attached to it."""
+        key = make_cache_key(leader.payload)
+        if key is not None and self._inflight.get(key) is leader:
+            del self._inflight[key]
+        followers = self._followers.pop(leader.id, [])
+        if key is not None and leader.status == TaskStatus.COMPLETED:
+            # Identical tasks still waiting in the queue share the result too
+            for task_id in self._queued_by_key.pop(key, ()):
+                task = self.queue.get(task_id)
+                if task is not None and self.queue.remove(task_id):
+                    followers.append(task)
+        if not followers:
+            return
+
+        if leader.status == TaskStatus.CANCELLED:
+            # The work was never done; requeue the followers so one of them leads
+            async with self._lock:
+                for task in followers:
+                    self._running_tasks.pop(task.id, None)
+            for task in followers:
+                task.status = TaskStatus.PENDING
+                task.started_at = None
+                task.instance_id = None
+                self.enqueue(task)
+                try:
+                    await database.update_task_status(
+                        task.id,
+                        TaskStatus.PENDING.value,
+                        started_at=None,
+                        instance_id=None,
+                        instance_name=None
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to update task status in database: {e}")
+            return
+
+        for task in followers:
+            task.retry_count = leader.retry_count
+            await self._finish_task(task, TaskStatus(leader.status), result=leader.result, error=leader.error)
+        logger.info(f"Task {leader.id} settled {len(followers)} coalesced task(s)")
+
+    async def _split(self, task: Task) -> bool:
+        """Fan a large document out as page-range child tasks.
+
+        Returns True if the task was split; it then stays RUNNING without an
+        instance until every shard has finished.
+        """
+        if task.parent_id is not None:
+            return False
+        ranges = plan_shards(task.payload, self.config.shard_min_pages, self.config.shard_pages)
+        if not ranges:
+            return False
+
+        task.status = TaskStatus.RUNNING
+        task.started_at = datetime.now()
+        task.instance_id = None
+        self._publish(task)
+        children = [
+            Task(
+                payload={**task.payload, "start_page_id": str(start), "end_page_id": str(end)},
+                priority=task.priority,
+                order_at=task.order_at or task.created_at,  # Keep the parent's place in the queue
+                parent_id=task.id,
+                shard_index=index,
+                batch_id=task.batch_id,
+                tenant=task.tenant
+            )
+            for index, (start, end) in enumerate(ranges)
+        ]
+        self._shard_groups[task.id] = ShardGroup(task, children, ranges)
+        async with self._lock:
+            self._running_tasks[task.id] = task
+
+        try:
+            await database.update_task_status(
+                task.id,
+                TaskStatus.RUNNING.value,
+                started_at=task.started_at.isoformat()
+            )
+        except Exception as e:
+            logger.error(f"Failed to update task status in database: {e}")
+
+        file_ref = task.payload.get("file_ref")
+        for child in children:
+            if file_ref and self.spool is not None:
+                # Each shard holds its own reference to the spooled file
+                self.spool.acquire(file_ref)
+            try:
+                await database.save_task(
+                    task_id=child.id,
+                    status=child.status.value,
+                    priority=child.priority,
+                    payload=child.payload,
+                    file_name=child.payload.get("file_name"),
+                    created_at=child.created_at.isoformat(),
+                    parent_id=task.id,
+                    shard_index=child.shard_index,
+                    batch_id=child.batch_id,
+                    tenant=child.tenant,
+                    # Held by this replica with the parent, so its status writes pass the lease fence
+                    lease_owner=self.cluster.replica_id if self.cluster is not None else None
+                )
+            except Exception as e:
+                logger.error(f"Failed to save task to database: {e}")
+            self.enqueue(child)
+
+        logger.info(f"Task {task.id} split into {len(children)} shards")
+        return True
+
+    async def _on_shard_finished(self, child: Task) -> None:
+        """Record a finished shard; complete or fail the parent when appropriate."""
+        group = self._shard_groups.get(child.parent_id)
+        if group is None:
+            return
+        parent = group.parent
+
+        if child.status == TaskStatus.COMPLETED:
+            group.results[child.shard_index] = child.result
+            if not group.done:
+                return
+            del self._shard_groups[parent.id]
+            try:
+                merged = merge_shard_results(
+                    [group.results[i] for i in range(len(group.children))], group.ranges
+                )
+            except Exception as e:
+                await self._fail_sharded(parent, f"Failed to merge shard results: {e}")
+                return
+            await self._handle_task_success(parent, merged)
+            return
+
+        # The shard exhausted its own retries (or was cancelled): give up on
+        # the document; a manual retry of the parent re-splits it
+        del self._shard_groups[parent.id]
+        async with self._lock:
+            self._failed_tasks.pop(child.id, None)
+        for other in group.children:
+            if other is not child and other.status in (TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.RETRYING):
+                await self.cancel_task(other.id)
+        start, end = group.ranges[child.shard_index]
+        await self._fail_sharded(
+            parent, f"Shard {child.shard_index} (pages {start}-{end}) {child.status}: {child.error}"
+        )
+
+    async def _fail_sharded(self, parent: Task, error: str) -> None:
+        await self._finish_task(parent, TaskStatus.FAILED, error=error)
+        await self._settle_followers(parent)
+        self._notify_change()
+        logger.error(f"Task {parent.id} failed: {error}")
+
+    def _detach_follower(self, task: Task) -> bool:
+        """Remove a task from its leader's follower list. Returns True if it was attached."""
+        for followers in self._followers.values():
+            if task in followers:
+                followers.remove(task)
+                return True
+        return False
+
     async def _dispatch_task(self, task: Task, instance_id: str) -> None:
         """Dispatch a single task to an instance."""
         instance = self.pool.get_instance(instance_id)
         if not instance:
             # Re-queue the task
-            self.queue.enqueue(task)
+            self.enqueue(task)
             return
 
         # Update states
         task.status = TaskStatus.RUNNING
         task.started_at = datetime.now()
         task.instance_id = instance_id
+        self._publish(task)
 
-        self.pool.set_status(instance_id, InstanceStatus.BUSY)
-        self.pool.set_current_task(instance_id, task.id)
+        self.pool.acquire_slot(instance_id, task.id)
         self.pool.increment_total_tasks(instance_id)
+        if task.enqueued_at is not None:
+            waited = time.monotonic() - task.enqueued_at
+            QUEUE_WAIT_SECONDS.observe(waited)
+            TENANT_QUEUE_WAIT_SECONDS.labels(task.tenant).observe(waited)
+        UPLOAD_BYTES.labels(instance_id).inc(task.payload.get("file_size") or 0)
 
         async with self._lock:
             self._running_tasks[task.id] = task
@@ -126,7 +560,14 @@ class Scheduler:
             logger.error(f"Failed to update task status in database: {e}")
 
         # Create async task for execution
-        asyncio.create_task(self._execute_task(task, instance_id))
+        execution = asyncio.create_task(self._execute_task(task, instance_id))
+        self._executions[task.id] = execution
+        execution.add_done_callback(lambda done: self._execution_done(task.id, done))
+
+    def _execution_done(self, task_id: str, execution: asyncio.Task) -> None:
+        # A retry may already have started a newer execution of the task
+        if self._executions.get(task_id) is execution:
+            del self._executions[task_id]
 
     async def _execute_task(self, task: Task, instance_id: str) -> None:
         """Execute task on instance."""
@@ -135,107 +576,163 @@ class Scheduler:
             await self._handle_task_failure(task, "Instance not found")
             return
 
-        client = MinerUClient(instance.url, self.config.task_timeout)
+        client = self.pool.clients.get(instance.url, self.config.task_timeout)
+        started = time.monotonic()
 
         try:
             result = await asyncio.wait_for(
-                client.submit_task(task.payload, instance.backend),
+                self._submit(client, task, instance.backend),
                 timeout=self.config.task_timeout
             )
-            await self._handle_task_success(task, result)
         except asyncio.TimeoutError:
-            await self._handle_task_timeout(task)
+            if not await self._drop_if_cancelled(task):
+                await self._handle_task_timeout(task)
         except Exception as e:
-            await self._handle_task_failure(task, str(e))
+            if not await self._drop_if_cancelled(task):
+                # A 4xx is about the document, not the instance
+                client_error = isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500
+                await self._handle_task_failure(task, str(e), instance_fault=not client_error)
+        else:
+            self.pool.record_latency(instance_id, time.monotonic() - started, estimate_pages(task.payload))
+            if not await self._drop_if_cancelled(task):
+                await self._handle_task_success(task, result)
         finally:
-            self._release_instance(instance_id)
+            self.pool.release_slot(instance_id, task.id)
 
-    async def _handle_task_success(self, task: Task, result: dict) -> None:
-        """Handle successful task completion."""
+    async def _drop_if_cancelled(self, task: Task) -> bool:
+        """Discard the outcome of a task that was cancelled while running."""
+        if task.status != TaskStatus.CANCELLED:
+            return False
+        self._release_file(task)
+        await self._settle_followers(task)
+        return True
+
+    async def _submit(self, client, task: Task, backend: str) -> dict:
+        """Send a task to an instance, streaming its spooled file from disk."""
+        file_ref = task.payload.get("file_ref")
+        if not file_ref:
+            return await client.submit_task(task.payload, backend)
+        if self.spool is None:
+            raise RuntimeError("Task references a spooled file but no spool is configured")
+        with self.spool.open(file_ref) as f:
+            return await client.submit_task(task.payload, backend, file=f)
+
+    def _release_file(self, task: Task) -> None:
+        """Drop the task's reference to its spooled file once it can no longer run."""
+        file_ref = task.payload.get("file_ref")
+        if file_ref and self.spool is not None:
+            self.spool.release(file_ref)
+
+    def _cache_enabled(self) -> bool:
+        return self.result_cache is not None and self.config.enable_result_cache
+
+    async def complete_from_cache(self, task: Task) -> bool:
+        """Complete a new task from the result cache.
+
+        Returns True on a hit; the task is then COMPLETED and must not be enqueued.
+        """
+        if not self._cache_enabled():
+            return False
+        key = make_cache_key(task.payload)
+        if key is None:
+            return False
+        result = await self.result_cache.get(key)
+        if result is None:
+            return False
+        if self.result_store is not None:
+            await self.result_store.put(task.id, result)
         task.status = TaskStatus.COMPLETED
-        task.completed_at = datetime.now()
         task.result = result
+        task.started_at = task.completed_at = datetime.now()
+        self._release_file(task)
+        logger.info(f"Task {task.id} served from result cache")
+        return True
+
+    async def _finish_task(
+        self,
+        task: Task,
+        status: TaskStatus,
+        result: dict | None = None,
+        error: str | None = None
+    ) -> None:
+        """Move a task to a terminal state, wake its waiters and persist it."""
+        if (status == TaskStatus.COMPLETED and result is not None
+                and task.parent_id is None and self.result_store is not None):
+            # Stored before the status changes, so /result is ready once "completed" is observable
+            await self.result_store.put(task.id, result)
+        TASKS_FINISHED.labels(status.value).inc()
+        task.status = status
+        task.completed_at = datetime.now()
+        if result is not None:
+            task.result = result
+        if error is not None:
+            task.error = error
 
-        # Calculate duration
+        # Calculate duration if started_at exists
         duration = None
         if task.started_at:
             duration = (task.completed_at - task.started_at).total_seconds()
 
         async with self._lock:
             self._running_tasks.pop(task.id, None)
-            if task.id in self._task_futures:
-                self._task_futures[task.id].set_result(task)
+            if status != TaskStatus.COMPLETED:
+                # Failed tasks keep their spooled file for a manual retry
+                self._failed_tasks[task.id] = task
+            self._resolve_future(task)
+        if status == TaskStatus.COMPLETED:
+            self._release_file(task)
 
-        # Update database: RUNNING → COMPLETED
+        fields = {"completed_at": task.completed_at.isoformat(), "duration": duration}
+        if status != TaskStatus.COMPLETED:
+            fields.update(error=task.error, retry_count=task.retry_count)
         try:
-            await database.update_task_status(
-                task.id,
-                TaskStatus.COMPLETED.value,
-                completed_at=task.completed_at.isoformat(),
-                duration=duration
-            )
+            await database.update_task_status(task.id, status.value, **fields)
         except Exception as e:
             logger.error(f"Failed to update task status in database: {e}")
 
+        if task.parent_id is not None:
+            await self._on_shard_finished(task)
+
+    def _resolve_future(self, task: Task) -> None:
+        """Resolve the task's waiter future, if any. Caller holds self._lock."""
+        future = self._task_futures.get(task.id)
+        if future is not None and not future.done():
+            future.set_result(task)
+        self._publish(task)
+
+    async def _handle_task_success(self, task: Task, result: dict) -> None:
+        """Handle successful task completion."""
+        if task.instance_id:
+            self.pool.record_outcome(task.instance_id, task.id, True, self.config)
+            instance = self.pool.get_instance(task.instance_id)
+            if instance and task.started_at:
+                TASK_DURATION_SECONDS.labels(task.instance_id, instance.backend).observe(
+                    (datetime.now() - task.started_at).total_seconds()
+                )
+        if self._cache_enabled():
+            key = make_cache_key(task.payload)
+            if key is not None:
+                await self.result_cache.put(key, result)
+
+        await self._finish_task(task, TaskStatus.COMPLETED, result=result)
+        await self._settle_followers(task)
+
         logger.info(f"Task {task.id} completed successfully")
 
-    async def _handle_task_failure(self, task: Task, error: str) -> None:
+    async def _handle_task_failure(self, task: Task, error: str, instance_fault: bool = True) -> None:
         """Handle task failure."""
         task.error = error
+        if task.instance_id and instance_fault:
+            self.pool.record_outcome(task.instance_id, task.id, False, self.config)
 
         if task.retry_count < self.config.max_retries:
-            task.retry_count += 1
-            task.status = TaskStatus.PENDING
-            task.started_at = None
-            task.instance_id = None
-            await asyncio.sleep(self.config.retry_delay)
-            self.queue.enqueue(task)
-
-            # Update database: retry - reset to PENDING
-            try:
-                await database.update_task_status(
-                    task.id,
-                    TaskStatus.PENDING.value,
-                    started_at=None,
-                    instance_id=None,
-                    instance_name=None,
-                    error=error,
-                    retry_count=task.retry_count
-                )
-            except Exception as e:
-                logger.error(f"Failed to update task status in database: {e}")
-
-            logger.info(f"Task {task.id} requeued (retry {task.retry_count})")
+            await self._schedule_retry(task, "failure")
         else:
             # Only count as failed when all retries exhausted
             if task.instance_id:
                 self.pool.increment_failed_tasks(task.instance_id)
-            task.status = TaskStatus.FAILED
-            task.completed_at = datetime.now()
-
-            # Calculate duration if started_at exists
-            duration = None
-            if task.started_at:
-                duration = (task.completed_at - task.started_at).total_seconds()
-
-            async with self._lock:
-                self._running_tasks.pop(task.id, None)
-                self._failed_tasks[task.id] = task
-                if task.id in self._task_futures:
-                    self._task_futures[task.id].set_result(task)
-
-            # Update database: → FAILED
-            try:
-                await database.update_task_status(
-                    task.id,
-                    TaskStatus.FAILED.value,
-                    completed_at=task.completed_at.isoformat(),
-                    error=error,
-                    retry_count=task.retry_count,
-                    duration=duration
-                )
-            except Exception as e:
-                logger.error(f"Failed to update task status in database: {e}")
+            await self._finish_task(task, TaskStatus.FAILED)
+            await self._settle_followers(task)
 
             self._notify_change()
             logger.error(f"Task {task.id} failed: {error}")
@@ -243,70 +740,84 @@ class Scheduler:
     async def _handle_task_timeout(self, task: Task) -> None:
         """Handle task timeout."""
         task.error = "Task execution timeout"
+        TASK_TIMEOUTS.labels("execution").inc()
+        if task.instance_id:
+            self.pool.record_outcome(task.instance_id, task.id, False, self.config)
 
         if task.retry_count < self.config.max_retries:
-            task.retry_count += 1
-            task.status = TaskStatus.PENDING
-            task.started_at = None
-            task.instance_id = None
-            await asyncio.sleep(self.config.retry_delay)
-            self.queue.enqueue(task)
-
-            # Update database: retry - reset to PENDING
-            try:
-                await database.update_task_status(
-                    task.id,
-                    TaskStatus.PENDING.value,
-                    started_at=None,
-                    instance_id=None,
-                    instance_name=None,
-                    error=task.error,
-                    retry_count=task.retry_count
-                )
-            except Exception as e:
-                logger.error(f"Failed to update task status in database: {e}")
-
-            logger.info(f"Task {task.id} requeued after timeout (retry {task.retry_count})")
+            await self._schedule_retry(task, "timeout")
         else:
             # Only count as failed when all retries exhausted
             if task.instance_id:
                 self.pool.increment_failed_tasks(task.instance_id)
-            task.status = TaskStatus.TIMEOUT
-            task.completed_at = datetime.now()
+            await self._finish_task(task, TaskStatus.TIMEOUT)
+            await self._settle_followers(task)
 
-            # Calculate duration if started_at exists
-            duration = None
-            if task.started_at:
-                duration = (task.completed_at - task.started_at).total_seconds()
+            self._notify_change()
+            logger.error(f"Task {task.id} timed out")
 
-            async with self._lock:
-                self._running_tasks.pop(task.id, None)
-                self._failed_tasks[task.id] = task
-                if task.id in self._task_futures:
-                    self._task_futures[task.id].set_result(task)
+    async def _schedule_retry(self, task: Task, reason: str) -> None:
+        """Park a failed task in the delayed-retry heap with exponential backoff."""
+        TASK_RETRIES.labels(reason).inc()
+        task.retry_count += 1
+        task.status = TaskStatus.RETRYING
+        task.started_at = None
+        task.instance_id = None
+        delay = backoff_delay(
+            task.retry_count,
+            delay=self.config.retry_delay,
+            backoff=RETRY_BACKOFF,
+            max_delay=RETRY_MAX_DELAY,
+            jitter=RETRY_JITTER
+        )
+        ready_at = asyncio.get_running_loop().time() + delay
+        async with self._lock:
+            self._running_tasks.pop(task.id, None)
+            self._retrying[task.id] = task
+        self._publish(task)
+        heapq.heappush(self._retry_heap, (ready_at, next(self._retry_seq), task))
+        # Let the dispatcher recompute its sleep for the new deadline
+        self.wake()
 
-            # Update database: → TIMEOUT
+        # Update database: → RETRYING
+        try:
+            await database.update_task_status(
+                task.id,
+                TaskStatus.RETRYING.value,
+                started_at=None,
+                instance_id=None,
+                instance_name=None,
+                error=task.error,
+                retry_count=task.retry_count
+            )
+        except Exception as e:
+            logger.error(f"Failed to update task status in database: {e}")
+
+        self._notify_change()
+        logger.info(f"Task {task.id} retrying in {delay:.1f}s (retry {task.retry_count}): {task.error}")
+
+    async def _promote_due_retries(self) -> None:
+        """Move retries whose backoff has elapsed back into the queue."""
+        now = asyncio.get_running_loop().time()
+        while self._retry_heap and self._retry_heap[0][0] <= now:
+            _, _, task = heapq.heappop(self._retry_heap)
+            if self._retrying.pop(task.id, None) is None:
+                continue  # Cancelled while waiting
+            task.status = TaskStatus.PENDING
+            self.enqueue(task)
             try:
-                await database.update_task_status(
-                    task.id,
-                    TaskStatus.TIMEOUT.value,
-                    completed_at=task.completed_at.isoformat(),
-                    error=task.error,
-                    retry_count=task.retry_count,
-                    duration=duration
-                )
+                await database.update_task_status(task.id, TaskStatus.PENDING.value)
             except Exception as e:
                 logger.error(f"Failed to update task status in database: {e}")
 
-            self._notify_change()
-            logger.error(f"Task {task.id} timed out")
+    def get_retrying_task(self, task_id: str) -> Task | None:
+        """Get a task waiting out its retry backoff."""
+        return self._retrying.get(task_id)
 
-    def _release_instance(self, instance_id: str) -> None:
-        """Release instance after task completion."""
-        instance = self.pool.get_instance(instance_id)
-        if instance and instance.enabled:
-            self.pool.set_status(instance_id, InstanceStatus.IDLE)
-        self.pool.set_current_task(instance_id, None)
+    def get_all_retrying_tasks(self) -> list[Task]:
+        """Get all tasks waiting out their retry backoff, soonest first."""
+        order = {entry[2].id: entry[0] for entry in self._retry_heap}
+        return sorted(self._retrying.values(), key=lambda t: order.get(t.id, 0.0))
 
     async def _check_timeouts(self) -> None:
         """Check for queue timeouts."""
@@ -316,13 +827,14 @@ class Scheduler:
         for task in queue_tasks:
             elapsed = (now - task.created_at).total_seconds()
             if elapsed > self.config.queue_timeout:
-                self.queue.remove(task.id)
-                task.status = TaskStatus.TIMEOUT
-                task.error = "Queue timeout"
-                task.completed_at = now
-                async with self._lock:
-                    if task.id in self._task_futures:
-                        self._task_futures[task.id].set_result(task)
+                if not self.queue.remove(task.id):
+                    continue
+                self._unindex_queued(task)
+                TASK_TIMEOUTS.labels("queue").inc()
+                # Persisted like any other final state, so recovery and the
+                # cluster's pending count don't see the task again
+                await self._finish_task(task, TaskStatus.TIMEOUT, error="Queue timeout")
+                await self._settle_followers(task)
                 logger.warning(f"Task {task.id} timed out in queue")
 
     def pre_register_task_future(self, task_id: str) -> None:
@@ -345,7 +857,9 @@ class Scheduler:
             if task_id in self._running_tasks:
                 task = self._running_tasks[task_id]
             else:
-                task = self.queue.get(task_id)
+                task = self.queue.get(task_id) or self._retrying.get(task_id)
+                if task is None and self.cluster is not None:
+                    task = self.cluster.find_task(task_id)
 
             if not task:
                 # If a pre-registered future exists, wait for it
@@ -364,6 +878,65 @@ class Scheduler:
             async with self._lock:
                 self._task_futures.pop(task_id, None)
 
+    async def resolve_remote(self, task: Task) -> None:
+        """Wake the waiters of a task that another replica changed (cluster mode)."""
+        async with self._lock:
+            if task.status in (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.TIMEOUT, TaskStatus.CANCELLED):
+                self._resolve_future(task)
+            else:
+                self._publish(task)
+
+    def held_task_ids(self) -> set[str]:
+        """Ids of the unfinished top-level tasks this scheduler holds."""
+        tasks = [*self.queue.get_all(), *self._running_tasks.values(), *self._retrying.values()]
+        return {task.id for task in tasks if task.parent_id is None}
+
+    async def abort_tasks(self, task_ids: list[str]) -> list[Task]:
+        """Stop holding tasks without persisting anything. Returns the tasks dropped.
+
+        Cluster mode: this replica lost their lease and another replica owns
+        the rows now. Queued and retrying tasks are dropped, running requests
+        (and the shards of split tasks) are cancelled, and tasks coalesced
+        onto an aborted leader are queued again. The returned tasks are reset
+        to PENDING so waiters here can follow them through the database.
+        """
+        aborted = self.queue.remove_many(task_ids)
+        for task_id in task_ids:
+            task = self._retrying.pop(task_id, None)
+            if task is not None:
+                aborted.append(task)
+        async with self._lock:
+            for task_id in task_ids:
+                task = self._running_tasks.pop(task_id, None)
+                if task is not None:
+                    aborted.append(task)
+        if not aborted:
+            return []
+
+        for task in aborted:
+            self._detach_follower(task)
+        for task in aborted:
+            group = self._shard_groups.pop(task.id, None)
+            children = group.children if group is not None else []
+            self.queue.remove_many([child.id for child in children])
+            for run in [task, *children]:
+                async with self._lock:
+                    self._running_tasks.pop(run.id, None)
+                execution = self._executions.pop(run.id, None)
+                if execution is not None:
+                    execution.cancel()
+                self._unindex_queued(run)
+                self._release_file(run)
+            # Followers fall back to the queue as when a leader is cancelled
+            task.status = TaskStatus.CANCELLED
+            await self._settle_followers(task)
+            task.status = TaskStatus.PENDING
+            task.started_at = None
+            task.instance_id = None
+            self._publish(task)
+        self._notify_change()
+        return aborted
+
     def get_running_task(self, task_id: str) -> Task | None:
         """Get a running task by ID."""
         return self._running_tasks.get(task_id)
@@ -372,24 +945,144 @@ class Scheduler:
         """Get all running tasks."""
         return list(self._running_tasks.values())
 
+    async def recover_tasks(self) -> dict[str, int]:
+        """Re-queue the tasks a previous process left pending, running or retrying.
+
+        Call before start(). Interrupted tasks run again from scratch (keeping
+        their retry count); shard children are cancelled because their parent
+        is re-queued and splits again; tasks whose spooled file is gone fail.
+        Returns counts per outcome.
+        """
+        rows = await database.get_unfinished_tasks()
+        summary = {"pending": 0, "interrupted": 0, "shards_dropped": 0, "missing_file": 0}
+        tasks: list[Task] = []
+        updates: dict[str, dict] = {}
+        now = datetime.now().isoformat()
+        for row in rows:
+            if row["parent_id"] is not None:
+                updates[row["id"]] = {"status": TaskStatus.CANCELLED.value, "completed_at": now,
+                                      "error": "Interrupted by restart; the parent task is split again"}
+                summary["shards_dropped"] += 1
+                continue
+            payload = row["payload"] or {}
+            file_ref = payload.get("file_ref")
+            if not file_ref or self.spool is None or not self.spool.exists(file_ref):
+                updates[row["id"]] = {"status": TaskStatus.FAILED.value, "completed_at": now,
+                                      "error": "Interrupted by restart; spooled file is missing"}
+                summary["missing_file"] += 1
+                continue
+            if row["status"] == TaskStatus.PENDING.value:
+                summary["pending"] += 1
+            else:
+                updates[row["id"]] = {"status": TaskStatus.PENDING.value, "started_at": None,
+                                      "instance_id": None, "instance_name": None}
+                summary["interrupted"] += 1
+            self.spool.acquire(file_ref)
+            tasks.append(Task(
+                id=row["id"],
+                payload=payload,
+                priority=row["priority"],
+                created_at=datetime.fromisoformat(row["created_at"]),
+                retry_count=row["retry_count"] or 0,
+                batch_id=row["batch_id"],
+                tenant=row["tenant"] or DEFAULT_TENANT
+            ))
+
+        # Rows arrive in dispatch order, so the bulk insert is a near-linear merge
+        if tasks:
+            self.enqueue_many(tasks)
+        await database.update_tasks(updates)
+        return summary
+
+    def select_tasks(self, status: str | None = None, batch_id: str | None = None) -> list[Task]:
+        """Tasks the scheduler holds (queued, running, retrying, failed), optionally filtered.
+
+        Shards are never selected by batch: batch actions go through their parent.
+        """
+        tasks = [
+            *self.queue.get_all(), *self._running_tasks.values(),
+            *self._retrying.values(), *self._failed_tasks.values()
+        ]
+        return [
+            task for task in tasks
+            if (status is None or task.status == status)
+            and (batch_id is None or (task.batch_id == batch_id and task.parent_id is None))
+        ]
+
     async def cancel_task(self, task_id: str) -> bool:
         """Cancel a task."""
-        # Try to remove from queue
-        if self.queue.remove(task_id):
-            return True
+        return bool(await self.cancel_tasks([task_id]))
 
-        # Check if running
-        async with self._lock:
-            if task_id in self._running_tasks:
-                task = self._running_tasks[task_id]
+    async def cancel_tasks(self, task_ids: list[str]) -> list[str]:
+        """Cancel queued, retrying and running tasks. Returns the ids cancelled.
+
+        Queued tasks leave the queue in one pass and every row is updated in
+        one buffered write.
+        """
+        cancelled = self.queue.remove_many(task_ids)
+        removed = {task.id for task in cancelled}
+        for task_id in task_ids:
+            if task_id not in removed and task_id in self._retrying:
+                cancelled.append(self._retrying.pop(task_id))
+        for task in cancelled:
+            task.status = TaskStatus.CANCELLED
+            task.completed_at = datetime.now()
+            self._unindex_queued(task)
+            async with self._lock:
+                self._resolve_future(task)
+            self._release_file(task)
+            # A leader waiting for its retry may have tasks attached
+            await self._settle_followers(task)
+
+        removed = {task.id for task in cancelled}
+        for task_id in task_ids:
+            if task_id in removed:
+                continue
+            # Check if running
+            async with self._lock:
+                task = self._running_tasks.pop(task_id, None)
+                if task is None:
+                    continue
                 task.status = TaskStatus.CANCELLED
                 task.completed_at = datetime.now()
-                self._running_tasks.pop(task_id, None)
-                if task_id in self._task_futures:
-                    self._task_futures[task_id].set_result(task)
-                return True
+                self._resolve_future(task)
+            cancelled.append(task)
+
+            group = self._shard_groups.pop(task.id, None)
+            if group is not None:
+                # A split parent never runs itself; release it and stop its shards
+                self._release_file(task)
+                await self._settle_followers(task)
+                children = [
+                    child.id for child in group.children
+                    if child.status in (TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.RETRYING)
+                ]
+                await self.cancel_tasks(children)
+            elif self._detach_follower(task):
+                # Coalesced tasks never reach _execute_task, so release here
+                self._release_file(task)
+
+        remote: list[str] = []
+        if self.cluster is not None:
+            # Tasks held by another replica, or still waiting in the shared queue
+            local = {task.id for task in cancelled}
+            remote = await self.cluster.cancel([task_id for task_id in task_ids if task_id not in local])
+
+        if not cancelled:
+            return remote
+        TASKS_FINISHED.labels(TaskStatus.CANCELLED.value).inc(len(cancelled))
+        try:
+            await database.update_tasks({
+                task.id: {"status": TaskStatus.CANCELLED.value, "completed_at": task.completed_at.isoformat()}
+                for task in cancelled
+            })
+        except Exception as e:
+            logger.error(f"Failed to update task status in database: {e}")
 
-        return False
+        for task in cancelled:
+            if task.parent_id is not None:
+                await self._on_shard_finished(task)
+        return [task.id for task in cancelled] + remote
 
     def get_all_failed_tasks(self) -> list[Task]:
         """Get all failed tasks."""
@@ -397,70 +1090,69 @@ class Scheduler:
 
     async def retry_failed_task(self, task_id: str) -> bool:
         """Retry a single failed task."""
-        async with self._lock:
-            task = self._failed_tasks.pop(task_id, None)
-        if not task:
-            return False
-        # Reset task for retry
-        task.status = TaskStatus.PENDING
-        task.error = None
-        task.retry_count = 0
-        task.started_at = None
-        task.completed_at = None
-        task.instance_id = None
-        self.queue.enqueue(task)
-
-        # Update database: FAILED → PENDING
-        try:
-            await database.update_task_status(
-                task.id,
-                TaskStatus.PENDING.value,
-                started_at=None,
-                completed_at=None,
-                instance_id=None,
-                instance_name=None,
-                error=None,
-                retry_count=0
-            )
-        except Exception as e:
-            logger.error(f"Failed to update task status in database: {e}")
-
-        self._notify_change()
-        logger.info(f"Task {task_id} manually retried")
-        return True
+        return bool(await self.retry_failed_tasks([task_id]))
 
     async def retry_all_failed_tasks(self) -> int:
         """Retry all failed tasks. Returns count of retried tasks."""
+        return len(await self.retry_failed_tasks())
+
+    async def retry_failed_tasks(self, task_ids: list[str] | None = None) -> list[str]:
+        """Requeue failed tasks (all of them if task_ids is None). Returns the ids requeued.
+
+        The tasks are enqueued in one pass and their rows reset in one buffered write.
+        """
         async with self._lock:
-            tasks = list(self._failed_tasks.values())
-            self._failed_tasks.clear()
-        count = 0
+            if task_ids is None:
+                tasks = list(self._failed_tasks.values())
+                self._failed_tasks.clear()
+            else:
+                tasks = [task for task_id in task_ids if (task := self._failed_tasks.pop(task_id, None))]
+        if not tasks:
+            return []
         for task in tasks:
+            # Reset task for retry
             task.status = TaskStatus.PENDING
             task.error = None
             task.retry_count = 0
             task.started_at = None
             task.completed_at = None
             task.instance_id = None
-            self.queue.enqueue(task)
+        self.enqueue_many(tasks)
 
-            # Update database: FAILED → PENDING
-            try:
-                await database.update_task_status(
-                    task.id,
-                    TaskStatus.PENDING.value,
-                    started_at=None,
-                    completed_at=None,
-                    instance_id=None,
-                    instance_name=None,
-                    error=None,
-                    retry_count=0
-                )
-            except Exception as e:
-                logger.error(f"Failed to update task status in database: {e}")
+        # Update database: FAILED → PENDING
+        try:
+            await database.update_tasks({
+                task.id: {
+                    "status": TaskStatus.PENDING.value, "started_at": None, "completed_at": None,
+                    "instance_id": None, "instance_name": None, "error": None, "retry_count": 0
+                }
+                for task in tasks
+            })
+        except Exception as e:
+            logger.error(f"Failed to update task status in database: {e}")
 
-            count += 1
-        if count > 0:
-            self._notify_change()
-        logger.info(f"Retried {count} failed tasks")
-        return count
+        self._notify_change()
+        logger.info(f"Manually retried {len(tasks)} failed tasks")
+        return [task.id for task in tasks]
+
+    async def set_priority(self, task_ids: list[str], priority: int) -> list[str]:
+        """Change the priority of queued, retrying and failed tasks. Returns the ids changed.
+
+        Queued tasks are re-sorted in one pass; retrying and failed tasks use
+        the new priority when they are next enqueued.
+        """
+        changed = self.queue.update_priorities(task_ids, priority)
+        moved = {task.id for task in changed}
+        for task_id in task_ids:
+            task = self._retrying.get(task_id) or self._failed_tasks.get(task_id)
+            if task is not None and task_id not in moved:
+                task.priority = priority
+                changed.append(task)
+        if not changed:
+            return []
+        try:
+            await database.update_tasks({task.id: {"priority": priority} for task in changed})
+        except Exception as e:
+            logger.error(f"Failed to update task priority in database: {e}")
+        self._notify_change()
+        return [task.id for task in changed]
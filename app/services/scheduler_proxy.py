@@ -0,0 +1,58 @@
+"""Forwarding from HTTP worker processes to the scheduler process.
+
+In multi-worker mode (``MINERU_CENTER_WORKERS`` > 1) the workers don't
+dispatch: their queue, running set and instance pool stay empty. Views of
+that in-memory state (``/api/stats``, the stats WebSocket, the pending,
+running, retrying and failed task listings) are fetched from the scheduler
+process instead, and actions on it (retrying failed tasks, bulk actions) are
+forwarded there.
+"""
+
+import logging
+from typing import Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the scheduler process
+PROXY_TIMEOUT = 10.0
+
+
+class SchedulerUnavailable(Exception):
+    """The scheduler process didn't answer a forwarded request."""
+
+
+class SchedulerProxy:
+    """Forwards requests to the scheduler process over a pooled client."""
+
+    def __init__(self, base_url: str, timeout: float = PROXY_TIMEOUT,
+                 client: httpx.AsyncClient | None = None):
+        self.base_url = base_url.rstrip("/")
+        self._client = client or httpx.AsyncClient(base_url=self.base_url, timeout=timeout)
+
+    async def get_json(self, path: str, params: dict[str, Any] | None = None) -> Any:
+        """GET path from the scheduler process; raises SchedulerUnavailable if it can't answer."""
+        try:
+            response = await self._client.get(path, params=params)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Scheduler process request {path} failed: {e}")
+            raise SchedulerUnavailable(str(e)) from e
+
+    async def request(self, method: str, path: str, json: Any = None) -> tuple[int, Any]:
+        """Send a request to the scheduler process and return its status code and JSON body.
+
+        Error responses are returned too, so callers can pass them on;
+        raises SchedulerUnavailable if the scheduler process can't answer.
+        """
+        try:
+            response = await self._client.request(method, path, json=json)
+            return response.status_code, response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Scheduler process request {method} {path} failed: {e}")
+            raise SchedulerUnavailable(str(e)) from e
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,112 @@
+"""Instance selection policies.
+
+The scheduler asks the instance pool for an instance with a free slot; the
+policy named by ``CenterConfig.selection_policy`` picks one of the candidates.
+Policies only see instances that are enabled, IDLE and have a free slot.
+"""
+
+import random
+from typing import Any
+
+from ..models.instance import MinerUInstance
+
+# Weight of the newest sample in the per-instance latency averages
+EWMA_ALPHA = 0.3
+
+
+def estimate_pages(payload: dict[str, Any]) -> int | None:
+    """Pages a task will parse, from the spooled page count and page range."""
+    file_pages = payload.get("file_pages")
+    if not file_pages:
+        return None
+    try:
+        start = max(int(payload.get("start_page_id", 0)), 0)
+        end = min(int(payload.get("end_page_id", file_pages - 1)), file_pages - 1)
+    except (TypeError, ValueError):
+        return file_pages
+    return max(end - start + 1, 1)
+
+
+def _load(instance: MinerUInstance) -> float:
+    return instance.active_tasks / instance.max_concurrency
+
+
+def _per_page(candidates: list[MinerUInstance]) -> bool:
+    """Whether every measured candidate has a seconds-per-page average.
+
+    Costs are only comparable in one unit: per page if all measured
+    instances have one, otherwise per task for all of them.
+    """
+    return all(inst.ewma_seconds_per_page or not inst.ewma_latency for inst in candidates)
+
+
+def _expected_wait(instance: MinerUInstance, per_page: bool) -> float:
+    """Time until a new task on this instance finishes: its cost times the tasks ahead of it per slot.
+
+    0 if never measured.
+    """
+    cost = (instance.ewma_seconds_per_page if per_page else instance.ewma_latency) or 0.0
+    return cost * (instance.active_tasks + 1) / instance.max_concurrency
+
+
+class SelectionPolicy:
+    """Base class: pick one instance out of a non-empty candidate list."""
+
+    def select(self, candidates: list[MinerUInstance]) -> MinerUInstance:
+        raise NotImplementedError
+
+
+class RoundRobinPolicy(SelectionPolicy):
+    """Rotate through instances in the order they were first seen."""
+
+    def __init__(self):
+        self._order: dict[str, int] = {}
+        self._last = -1
+
+    def select(self, candidates: list[MinerUInstance]) -> MinerUInstance:
+        for inst in candidates:
+            self._order.setdefault(inst.id, len(self._order))
+        ranked = sorted(candidates, key=lambda inst: self._order[inst.id])
+        chosen = next((inst for inst in ranked if self._order[inst.id] > self._last), ranked[0])
+        self._last = self._order[chosen.id]
+        return chosen
+
+
+class LeastOutstandingPolicy(SelectionPolicy):
+    """Fewest running tasks relative to the instance's slot count."""
+
+    def select(self, candidates: list[MinerUInstance]) -> MinerUInstance:
+        return min(candidates, key=_load)
+
+
+class EwmaLatencyPolicy(SelectionPolicy):
+    """Shortest expected completion time from the EWMA seconds per page.
+
+    Instances without measurements score 0 so they are tried first.
+    """
+
+    def select(self, candidates: list[MinerUInstance]) -> MinerUInstance:
+        per_page = _per_page(candidates)
+        return min(candidates, key=lambda inst: (_expected_wait(inst, per_page), _load(inst)))
+
+
+class PowerOfTwoPolicy(SelectionPolicy):
+    """Power of two choices: sample two instances, keep the less loaded one."""
+
+    def __init__(self, rng: random.Random | None = None):
+        self._rng = rng or random.Random()
+
+    def select(self, candidates: list[MinerUInstance]) -> MinerUInstance:
+        if len(candidates) == 1:
+            return candidates[0]
+        a, b = self._rng.sample(candidates, 2)
+        per_page = _per_page([a, b])
+        return min((a, b), key=lambda inst: (_load(inst), _expected_wait(inst, per_page)))
+
+
+SELECTION_POLICIES: dict[str, type[SelectionPolicy]] = {
+    "round_robin": RoundRobinPolicy,
+    "least_outstanding": LeastOutstandingPolicy,
+    "ewma_latency": EwmaLatencyPolicy,
+    "p2c": PowerOfTwoPolicy,
+}
@@ -0,0 +1,115 @@
+"""Split large documents into page-range shards and merge their results.
+
+A sharded task is parsed as several child tasks, each with its own
+``start_page_id``/``end_page_id``, so one long PDF can use several MinerU
+instances at once. When all children complete, their results are stitched
+back together in page order.
+"""
+
+import json
+from typing import Any
+
+from ..models.task import Task
+
+
+class ShardGroup:
+    """In-flight state of a sharded parent task."""
+
+    def __init__(self, parent: Task, children: list[Task], ranges: list[tuple[int, int]]):
+        self.parent = parent
+        self.children = children
+        self.ranges = ranges
+        self.results: dict[int, dict[str, Any]] = {}
+
+    @property
+    def done(self) -> bool:
+        return len(self.results) == len(self.children)
+
+
+def plan_shards(payload: dict[str, Any], shard_min_pages: int, shard_pages: int) -> list[tuple[int, int]]:
+    """Page ranges (inclusive, 0-based) to split a task into, or [] to run it whole."""
+    file_pages = payload.get("file_pages")
+    if not shard_min_pages or not file_pages:
+        return []
+    try:
+        start = max(int(payload.get("start_page_id", 0)), 0)
+        end = min(int(payload.get("end_page_id", file_pages - 1)), file_pages - 1)
+    except (TypeError, ValueError):
+        return []
+    if end - start + 1 < max(shard_min_pages, 2):
+        return []
+    return [(s, min(s + shard_pages - 1, end)) for s in range(start, end + 1, shard_pages)]
+
+
+def _load(value: Any) -> tuple[Any, bool]:
+    """Decode a JSON string field. Returns (value, was_string)."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value), True
+        except ValueError:
+            return value, False
+    return value, False
+
+
+def _offset_page_idx(items: list, start: int) -> None:
+    """Shift page_idx to document pages if the shard numbered pages from 0."""
+    indexes = [item["page_idx"] for item in items if isinstance(item, dict) and isinstance(item.get("page_idx"), int)]
+    if not indexes or min(indexes) >= start:
+        return
+    for item in items:
+        if isinstance(item, dict) and isinstance(item.get("page_idx"), int):
+            item["page_idx"] += start
+
+
+def _merge_document(parts: list[tuple[dict[str, Any], int]]) -> dict[str, Any]:
+    """Merge one document's per-shard outputs (md, middle_json, content_list, ...)."""
+    merged: dict[str, Any] = {}
+    for key in dict.fromkeys(k for part, _ in parts for k in part):
+        values = [(part[key], start) for part, start in parts if key in part]
+        first, _ = values[0]
+        if key == "md_content":
+            merged[key] = "\n\n".join(v for v, _ in values if v)
+        elif key == "middle_json":
+            pdf_info, encode = [], False
+            base: dict[str, Any] | None = None
+            for value, start in values:
+                doc, was_string = _load(value)
+                encode = encode or was_string
+                if not isinstance(doc, dict):
+                    continue
+                pages = doc.get("pdf_info") or []
+                _offset_page_idx(pages, start)
+                pdf_info.extend(pages)
+                base = base or doc
+            if base is None:
+                merged[key] = first
+                continue
+            base = {**base, "pdf_info": pdf_info}
+            merged[key] = json.dumps(base, ensure_ascii=False) if encode else base
+        elif key in ("content_list", "model_output"):
+            items, encode = [], False
+            for value, start in values:
+                data, was_string = _load(value)
+                encode = encode or was_string
+                if isinstance(data, list):
+                    if key == "content_list":
+                        _offset_page_idx(data, start)
+                    items.extend(data)
+            merged[key] = json.dumps(items, ensure_ascii=False) if encode else items
+        elif isinstance(first, dict):
+            merged[key] = {k: v for value, _ in values if isinstance(value, dict) for k, v in value.items()}
+        else:
+            merged[key] = first
+    return merged
+
+
+def merge_shard_results(results: list[dict[str, Any]], ranges: list[tuple[int, int]]) -> dict[str, Any]:
+    """Merge MinerU /file_parse responses of consecutive shards in page order."""
+    merged = {k: v for k, v in results[0].items() if k != "results"}
+    documents: dict[str, list[tuple[dict[str, Any], int]]] = {}
+    for result, (start, _) in zip(results, ranges):
+        for name, doc in (result.get("results") or {}).items():
+            if isinstance(doc, dict):
+                documents.setdefault(name, []).append((doc, start))
+    merged["results"] = {name: _merge_document(parts) for name, parts in documents.items()}
+    return merged
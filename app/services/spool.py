@@ -0,0 +1,290 @@
+"""Content-addressed on-disk spool for uploaded files.
+
+Uploads are streamed to disk in chunks while being hashed, and stored under
+their SHA-256 so queued tasks only carry a short file reference instead of
+the file bytes. PDF pages are counted on the way through so the scheduler can
+estimate the size of a task.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from typing import BinaryIO
+
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+# Uploads unpacked by save_archive, and the members it spools (files MinerU parses)
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+DOCUMENT_SUFFIXES = (".pdf", ".png", ".jpg", ".jpeg")
+
+# Page objects in an uncompressed PDF object table ("/Type /Pages" is the tree node)
+PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+
+
+class PageCounter:
+    """Count PDF page objects across streamed chunks.
+
+    Returns None for files without visible page objects (e.g. object streams
+    or non-PDF uploads), meaning the page count is unknown.
+    """
+
+    _OVERLAP = 64
+
+    def __init__(self):
+        self._tail = b""
+        self._tail_offset = 0  # absolute offset of self._tail
+        self._counted_upto = 0
+        self._pages = 0
+
+    def feed(self, chunk: bytes, final: bool = False) -> None:
+        buffer = self._tail + chunk
+        for match in PAGE_PATTERN.finditer(buffer):
+            # A match at the very end may still turn into "/Pages"
+            if match.end() == len(buffer) and not final:
+                continue
+            end = self._tail_offset + match.end()
+            if end > self._counted_upto:
+                self._pages += 1
+                self._counted_upto = end
+        keep = min(len(buffer), self._OVERLAP)
+        self._tail_offset += len(buffer) - keep
+        self._tail = buffer[len(buffer) - keep:]
+
+    @property
+    def pages(self) -> int | None:
+        return self._pages or None
+
+
+def count_pdf_pages(data: bytes) -> int | None:
+    counter = PageCounter()
+    counter.feed(data, final=True)
+    return counter.pages
+
+
+def is_archive(file_name: str | None) -> bool:
+    return bool(file_name) and file_name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _is_document(member_name: str) -> bool:
+    base = os.path.basename(member_name)
+    return (not base.startswith(".") and "__MACOSX/" not in member_name
+            and base.lower().endswith(DOCUMENT_SUFFIXES))
+
+
+class FileSpool:
+    """Content-addressed file store with in-memory reference counts.
+
+    A shared spool (cluster mode) is used by several replicas, whose reference
+    counts only cover their own tasks, so release never deletes; unreferenced
+    files are removed by purge_unreferenced with the database's references.
+    """
+
+    def __init__(self, root: str, shared: bool = False):
+        self.root = root
+        self.shared = shared
+        self._refs: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, file_ref: str) -> str:
+        """Get the on-disk path of a spooled file."""
+        return os.path.join(self.root, file_ref[:2], file_ref)
+
+    def exists(self, file_ref: str) -> bool:
+        return os.path.exists(self.path_for(file_ref))
+
+    def open(self, file_ref: str) -> BinaryIO:
+        """Open a spooled file for streaming reads."""
+        return open(self.path_for(file_ref), "rb")
+
+    def _new_temp_path(self) -> str:
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    def _commit(self, tmp_path: str, file_ref: str) -> None:
+        """Move a fully written temp file to its content address."""
+        final_path = self.path_for(file_ref)
+        with self._lock:
+            if os.path.exists(final_path):
+                # Same content already spooled; refresh its age for shared-spool purges
+                os.remove(tmp_path)
+                os.utime(final_path)
+                return
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+
+    async def save_upload(self, upload: UploadFile) -> tuple[str, int, int | None]:
+        """Stream an upload to the spool in chunks.
+
+        Returns:
+            Tuple of (file_ref, size in bytes, PDF page count or None).
+            The caller holds one reference.
+        """
+        tmp_path = self._new_temp_path()
+        sha256 = hashlib.sha256()
+        pages = PageCounter()
+        size = 0
+
+        def write_chunk(f: BinaryIO, chunk: bytes) -> None:
+            sha256.update(chunk)
+            pages.feed(chunk)
+            f.write(chunk)
+
+        try:
+            with open(tmp_path, "wb") as f:
+                while chunk := await upload.read(CHUNK_SIZE):
+                    await asyncio.to_thread(write_chunk, f, chunk)
+                    size += len(chunk)
+            pages.feed(b"", final=True)
+            file_ref = sha256.hexdigest()
+            # Take the reference before committing so a concurrent release
+            # of the same content cannot delete it underneath us
+            self.acquire(file_ref)
+            await asyncio.to_thread(self._commit, tmp_path, file_ref)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return file_ref, size, pages.pages
+
+    async def save_bytes(self, data: bytes) -> tuple[str, int, int | None]:
+        """Spool an in-memory file (e.g. a decoded file_base64 payload)."""
+        file_ref = hashlib.sha256(data).hexdigest()
+        self.acquire(file_ref)
+        if not self.exists(file_ref):
+            tmp_path = self._new_temp_path()
+
+            def write() -> None:
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                self._commit(tmp_path, file_ref)
+
+            await asyncio.to_thread(write)
+
+        return file_ref, len(data), count_pdf_pages(data)
+
+    def _save_stream(self, source: BinaryIO) -> tuple[str, int, int | None]:
+        """Copy a readable file object into the spool. Blocking; run it in a thread."""
+        tmp_path = self._new_temp_path()
+        sha256 = hashlib.sha256()
+        pages = PageCounter()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                while chunk := source.read(CHUNK_SIZE):
+                    sha256.update(chunk)
+                    pages.feed(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            pages.feed(b"", final=True)
+            file_ref = sha256.hexdigest()
+            self.acquire(file_ref)
+            self._commit(tmp_path, file_ref)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return file_ref, size, pages.pages
+
+    async def save_archive(self, upload: UploadFile) -> list[tuple[str, str, int, int | None]]:
+        """Spool the PDF and image members of a zip or (compressed) tar upload.
+
+        Returns:
+            (member file name, file_ref, size, page count) per document, in
+            archive order. The caller holds one reference to each.
+
+        Raises:
+            ValueError: the upload is not a readable archive.
+        """
+        def extract() -> list[tuple[str, str, int, int | None]]:
+            saved = []
+            try:
+                upload.file.seek(0)
+                if zipfile.is_zipfile(upload.file):
+                    upload.file.seek(0)
+                    with zipfile.ZipFile(upload.file) as archive:
+                        for info in archive.infolist():
+                            if not info.is_dir() and _is_document(info.filename):
+                                with archive.open(info) as member:
+                                    saved.append((os.path.basename(info.filename), *self._save_stream(member)))
+                    return saved
+                upload.file.seek(0)
+                # Streaming mode: members are read in order without seeking back
+                with tarfile.open(fileobj=upload.file, mode="r|*") as archive:
+                    for info in archive:
+                        if info.isfile() and _is_document(info.name):
+                            member = archive.extractfile(info)
+                            saved.append((os.path.basename(info.name), *self._save_stream(member)))
+            except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+                for _, file_ref, _, _ in saved:
+                    self.release(file_ref)
+                raise ValueError(f"Unreadable archive {upload.filename}: {e}") from e
+            return saved
+
+        return await asyncio.to_thread(extract)
+
+    async def purge_unreferenced(self, referenced: set[str] | None = None, min_age: float = 0.0) -> int:
+        """Delete spooled files no task references, and leftover temp files.
+
+        Meant for startup, after recovered tasks have taken their references
+        and before uploads are accepted. A shared spool passes the references
+        of every replica and a min_age that spares files still being uploaded.
+        """
+        with self._lock:
+            referenced = set(self._refs) | (referenced or set())
+        cutoff = time.time() - min_age
+
+        def purge() -> int:
+            if not os.path.isdir(self.root):
+                return 0
+            removed = 0
+            for sub in os.scandir(self.root):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    if sub.name != "tmp" and entry.name in referenced:
+                        continue
+                    try:
+                        if min_age and entry.stat().st_mtime > cutoff:
+                            continue
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
+            return removed
+
+        return await asyncio.to_thread(purge)
+
+    def acquire(self, file_ref: str) -> None:
+        """Add a reference to a spooled file."""
+        with self._lock:
+            self._refs[file_ref] = self._refs.get(file_ref, 0) + 1
+
+    def release(self, file_ref: str) -> None:
+        """Drop a reference; the file is deleted when no task references it."""
+        with self._lock:
+            count = self._refs.get(file_ref, 0) - 1
+            if count > 0:
+                self._refs[file_ref] = count
+                return
+            self._refs.pop(file_ref, None)
+            if self.shared:
+                return
+            try:
+                os.remove(self.path_for(file_ref))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove spooled file {file_ref}: {e}")
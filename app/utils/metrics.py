@@ -0,0 +1,211 @@
+"""Lightweight in-process metrics with Prometheus text exposition.
+
+Plain Python counters meant to be updated on hot paths: incrementing a
+counter is an attribute add, observing a histogram is a bisect plus two
+additions, with no locking (all callers run on the event loop or under their
+owner's lock). Metric families are registered in ``REGISTRY`` and rendered
+by ``GET /metrics``.
+"""
+
+import bisect
+import math
+from typing import Any, Callable, Iterable
+
+# Upper bounds in seconds, suited to HTTP probes and small requests
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds in seconds for queue waits and document parses
+LONG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+class Counter:
+    """Monotonic value."""
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Gauge:
+    """Value that can go up and down."""
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """(upper bound, observations <= bound) pairs, ending with +Inf."""
+        pairs, total = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), self._counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q: float) -> float | None:
+        """Approximate quantile: the upper bound of the bucket holding it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound if bound != math.inf else self.buckets[-1]
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {("+Inf" if bound == math.inf else bound): total for bound, total in self.cumulative()},
+        }
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class MetricFamily:
+    """A named metric with one child (Counter, Gauge or Histogram) per label set."""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] | None = None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets or DEFAULT_BUCKETS
+        self._children: dict[tuple[str, ...], Any] = {}
+
+    def _new_child(self) -> Any:
+        if self.kind == "counter":
+            return Counter()
+        if self.kind == "gauge":
+            return Gauge()
+        return Histogram(self.buckets)
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def get(self, *values: Any) -> Any | None:
+        """Existing child for a label set, without creating one."""
+        return self._children.get(tuple(str(v) for v in values))
+
+    def children(self) -> dict[tuple[str, ...], Any]:
+        """Existing children by label values."""
+        return dict(self._children)
+
+    def remove(self, *values: Any) -> None:
+        self._children.pop(tuple(str(v) for v in values), None)
+
+    def clear(self) -> None:
+        self._children.clear()
+
+    # Shortcuts for metrics without labels
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in self._children.items():
+            if self.kind == "histogram":
+                for bound, total in child.cumulative():
+                    labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {total}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+                lines.append(f"{self.name}_count{labels} {child.count}")
+            else:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}")
+        return lines
+
+
+class Registry:
+    """Metric families plus collectors that refresh scrape-time gauges."""
+
+    def __init__(self):
+        self._families: dict[str, MetricFamily] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, family: MetricFamily) -> MetricFamily:
+        if family.name in self._families:
+            raise ValueError(f"Metric {family.name} already registered")
+        self._families[family.name] = family
+        return family
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run collector before each render (e.g. to set gauges from live state)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines: list[str] = []
+        for family in self._families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> MetricFamily:
+    return REGISTRY.register(MetricFamily("counter", name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> MetricFamily:
+    return REGISTRY.register(MetricFamily("gauge", name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: tuple[str, ...] = (),
+              buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> MetricFamily:
+    return REGISTRY.register(MetricFamily("histogram", name, documentation, labelnames, buckets))
@@ -1,6 +1,7 @@
 import asyncio
 import functools
 import logging
+import random
 from typing import TypeVar, Callable, Any
 
 logger = logging.getLogger(__name__)
@@ -8,6 +9,27 @@ logger = logging.getLogger(__name__)
 T = TypeVar("T")
 
 
+def backoff_delay(
+    attempt: int,
+    delay: float = 1.0,
+    backoff: float = 2.0,
+    max_delay: float | None = None,
+    jitter: float = 0.0
+) -> float:
+    """Delay before retry number ``attempt`` (1-based).
+
+    Grows as ``delay * backoff ** (attempt - 1)``, capped at ``max_delay``.
+    With ``jitter`` in (0, 1], the delay is drawn uniformly from
+    ``[d * (1 - jitter), d]`` so retries of many tasks spread out.
+    """
+    current = delay * backoff ** max(attempt - 1, 0)
+    if max_delay is not None:
+        current = min(current, max_delay)
+    if jitter:
+        current = random.uniform(current * (1 - min(jitter, 1.0)), current)
+    return current
+
+
 def retry_async(
     max_retries: int = 3,
     delay: float = 1.0,
@@ -19,7 +41,6 @@ def retry_async(
         @functools.wraps(func)
         async def wrapper(*args: Any, **kwargs: Any) -> T:
             last_exception = None
-            current_delay = delay
 
             for attempt in range(max_retries + 1):
                 try:
@@ -30,8 +51,7 @@ def retry_async(
                         logger.warning(
                             f"Retry {attempt + 1}/{max_retries} for {func.__name__}: {e}"
                         )
-                        await asyncio.sleep(current_delay)
-                        current_delay *= backoff
+                        await asyncio.sleep(backoff_delay(attempt + 1, delay, backoff))
                     else:
                         logger.error(
                             f"All {max_retries} retries failed for {func.__name__}: {e}"
@@ -55,7 +75,6 @@ def retry_sync(
         def wrapper(*args: Any, **kwargs: Any) -> T:
             import time
             last_exception = None
-            current_delay = delay
 
             for attempt in range(max_retries + 1):
                 try:
@@ -66,8 +85,7 @@ def retry_sync(
                         logger.warning(
                             f"Retry {attempt + 1}/{max_retries} for {func.__name__}: {e}"
                         )
-                        time.sleep(current_delay)
-                        current_delay *= backoff
+                        time.sleep(backoff_delay(attempt + 1, delay, backoff))
                     else:
                         logger.error(
                             f"All {max_retries} retries failed for {func.__name__}: {e}"
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Benchmark enqueue-to-dispatch latency of the scheduler.
+
+Runs the real QueueManager / InstancePool / Scheduler against a fake MinerU
+server and reports how long a task waits between ``enqueue`` and the moment
+it is dispatched to a free instance, plus the CPU used while idle.
+
+Usage:
+    python benchmarks/bench_dispatch_latency.py --tasks 200 --instances 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.models.config import CenterConfig  # noqa: E402
+from app.models.instance import InstanceStatus  # noqa: E402
+from app.models.task import Task  # noqa: E402
+from app.services import database  # noqa: E402
+from app.services.instance_pool import InstancePool  # noqa: E402
+from app.services.queue_manager import QueueManager  # noqa: E402
+from app.services.scheduler import Scheduler  # noqa: E402
+from fake_mineru import start_server  # noqa: E402
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(num_tasks: int, num_instances: int, idle_seconds: float) -> None:
+    await database.init_database()
+    server, url = await start_server()
+
+    queue = QueueManager()
+    pool = InstancePool()
+    scheduler = Scheduler(queue, pool, CenterConfig())
+    for i in range(num_instances):
+        instance = pool.add_instance(url, f"fake-{i}")
+        pool.set_status(instance.id, InstanceStatus.IDLE)
+
+    await scheduler.start()
+    await asyncio.sleep(0.1)
+
+    # Idle CPU: nothing queued, scheduler should be parked on its event
+    cpu_before = time.process_time()
+    await asyncio.sleep(idle_seconds)
+    idle_cpu = time.process_time() - cpu_before
+
+    latencies = []
+    for _ in range(num_tasks):
+        task = Task(payload={"file_name": "bench.pdf", "file_base64": ""})
+        scheduler.pre_register_task_future(task.id)
+        queue.enqueue(task)
+        done = await scheduler.wait_for_task(task.id)
+        latencies.append((done.started_at - done.created_at).total_seconds() * 1000)
+
+    await scheduler.stop()
+    await database.close_database()
+    server.should_exit = True
+    await asyncio.sleep(0.1)
+
+    print(f"tasks: {num_tasks}, instances: {num_instances}")
+    print(f"enqueue->dispatch latency (ms): "
+          f"p50={statistics.median(latencies):.3f} "
+          f"p95={percentile(latencies, 95):.3f} "
+          f"p99={percentile(latencies, 99):.3f} "
+          f"max={max(latencies):.3f}")
+    print(f"idle CPU over {idle_seconds:.1f}s: {idle_cpu * 1000:.1f} ms "
+          f"({idle_cpu / idle_seconds * 100:.2f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--instances", type=int, default=2)
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "bench.db")
+        asyncio.run(run(args.tasks, args.instances, args.idle_seconds))
+
+
+if __name__ == "__main__":
+    main()
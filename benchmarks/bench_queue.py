@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Benchmark QueueManager operations at a large queue depth.
+
+Fills the queue with ``--tasks`` tasks of mixed priority, then times
+enqueue, position lookups, page reads (as used by ``/api/tasks?status=pending``),
+removals from the middle of the queue and draining with dequeue.
+
+Usage:
+    python benchmarks/bench_queue.py --tasks 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.models.task import Task  # noqa: E402
+from app.services.queue_manager import QueueManager  # noqa: E402
+
+
+def timed(label: str, count: int, fn) -> None:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {count:>8} ops  {elapsed * 1000:9.1f} ms  {elapsed / count * 1e6:8.2f} us/op")
+
+
+def run(n: int, lookups: int, page_size: int, seed: int) -> None:
+    rng = random.Random(seed)
+    queue = QueueManager()
+    tasks = [Task(payload={"file_name": f"doc-{i}.pdf"}, priority=rng.randint(1, 10)) for i in range(n)]
+    sample = [t.id for t in rng.sample(tasks, min(lookups, n))]
+
+    timed("enqueue", n, lambda: [queue.enqueue(t) for t in tasks])
+    timed("get_position", len(sample), lambda: [queue.get_position(tid) for tid in sample])
+
+    pages = max(1, n // page_size)
+    offsets = [rng.randrange(pages) * page_size for _ in range(lookups)]
+    timed(f"get_page (size {page_size})", len(offsets), lambda: [queue.get_page(o, page_size) for o in offsets])
+
+    timed("remove (random)", len(sample), lambda: [queue.remove(tid) for tid in sample])
+    remaining = queue.size()
+    timed("dequeue (drain)", remaining, lambda: [queue.dequeue() for _ in range(remaining)])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.tasks, args.lookups, args.page_size, args.seed)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""Benchmark center memory while queueing many large PDFs.
+
+Uploads ``--count`` synthetic PDFs of ``--size-mb`` MB each to ``/file_parse``
+in async mode with no MinerU instance attached, so every task stays queued,
+and reports the process RSS and the in-memory payload size of the queue.
+
+The defaults (1,000 x 20 MB) write about 20 GB to the spool directory.
+
+Usage:
+    python benchmarks/bench_upload_memory.py --count 1000 --size-mb 20
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+from app.models.config import CenterConfig  # noqa: E402
+from app.services import database  # noqa: E402
+from app.services.spool import FileSpool  # noqa: E402
+
+
+class SyntheticPDF(io.RawIOBase):
+    """File-like object producing a unique fake PDF without holding it in memory."""
+
+    def __init__(self, index: int, size: int):
+        self._header = f"%PDF-1.7\n% synthetic document {index}\n".encode()
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self._size + offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self._size - self._pos)
+        if n <= 0:
+            return 0
+        chunk = bytearray(b"\0" * n)
+        if self._pos < len(self._header):
+            head = self._header[self._pos:self._pos + n]
+            chunk[:len(head)] = head
+        buffer[:n] = chunk
+        self._pos += n
+        return n
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux)."""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+async def run(count: int, size_mb: int, spool_dir: str) -> None:
+    await database.init_database()
+    main.set_global_config(CenterConfig(max_queue_size=count + 1))
+    main.file_spool = FileSpool(spool_dir)
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    size = size_mb * 1024 * 1024
+    transport = httpx.ASGITransport(app=main.app)
+    rss_start = rss_mb()
+    started = time.perf_counter()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://center") as client:
+        for i in range(count):
+            response = await client.post(
+                "/file_parse",
+                files={"files": (f"doc-{i}.pdf", SyntheticPDF(i, size), "application/pdf")},
+                data={"async": "true"},
+            )
+            response.raise_for_status()
+            if (i + 1) % max(1, count // 10) == 0:
+                print(f"  queued {i + 1}/{count}  rss={rss_mb():.1f} MB")
+
+    elapsed = time.perf_counter() - started
+    queued = main.queue_manager.get_all()
+    payload_bytes = sum(len(json.dumps(task.payload)) for task in queued)
+    await database.close_database()
+
+    print(f"queued tasks: {len(queued)} x {size_mb} MB ({count * size_mb / 1024:.1f} GB uploaded)")
+    print(f"upload throughput: {count * size_mb / elapsed:.1f} MB/s")
+    print(f"queued payload size in memory: {payload_bytes / 1024:.1f} KB")
+    print(f"RSS: start={rss_start:.1f} MB end={rss_mb():.1f} MB "
+          f"peak={resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--spool-dir", default=None,
+                        help="Spool directory (default: temporary directory, removed afterwards)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "bench.db")
+        asyncio.run(run(args.count, args.size_mb, args.spool_dir or os.path.join(tmp, "spool")))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,61 @@
+"""Minimal fake MinerU server used by the benchmarks.
+
+Implements just enough of the MinerU API (``/file_parse`` and
+``/openapi.json``) to exercise the center without a GPU.
+"""
+
+import asyncio
+
+import uvicorn
+from fastapi import FastAPI, UploadFile, File, Form
+
+
+def create_app(parse_delay: float = 0.0) -> FastAPI:
+    """Create a fake MinerU app that answers /file_parse after parse_delay seconds."""
+    app = FastAPI(title="Fake MinerU")
+    app.state.parse_count = 0
+
+    @app.post("/file_parse")
+    async def file_parse(
+        files: UploadFile = File(...),
+        backend: str = Form("pipeline"),
+        start_page_id: str = Form("0"),
+        end_page_id: str = Form("99999"),
+    ):
+        app.state.parse_count += 1
+        size = 0
+        while chunk := await files.read(1024 * 1024):
+            size += len(chunk)
+        if parse_delay:
+            await asyncio.sleep(parse_delay)
+        name = (files.filename or "document.pdf").rsplit(".", 1)[0]
+        return {
+            "backend": backend,
+            "version": "fake",
+            "results": {
+                name: {
+                    "md_content": f"# {name}\n\npages {start_page_id}-{end_page_id}, {size} bytes\n",
+                }
+            },
+        }
+
+    return app
+
+
+async def start_server(parse_delay: float = 0.0, port: int = 0) -> tuple[uvicorn.Server, str]:
+    """Start the fake server in the running event loop.
+
+    Returns the server (call ``server.should_exit = True`` to stop it) and its base URL.
+    """
+    config = uvicorn.Config(create_app(parse_delay), host="127.0.0.1", port=port,
+                            log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{bound_port}"
+
+
+if __name__ == "__main__":
+    uvicorn.run(create_app(), host="127.0.0.1", port=8001)
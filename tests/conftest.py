@@ -0,0 +1,37 @@
+import asyncio
+import os
+
+import pytest
+
+from app.models.config import CenterConfig
+from app.services import database
+from app.services.instance_pool import InstancePool
+from app.services.queue_manager import QueueManager
+from app.services.scheduler import Scheduler
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(tmp_path, monkeypatch):
+    """Fresh SQLite database with the write-behind flusher running."""
+    monkeypatch.setattr(database, "DB_PATH", os.path.join(tmp_path, "center.db"))
+    # Locks and events bind to the loop that first waits on them; each test gets its own loop
+    monkeypatch.setattr(database, "_conn_lock", asyncio.Lock())
+    monkeypatch.setattr(database, "_writer", database._WriteBehindQueue())
+    await database.init_database(flush_interval=0.01)
+    yield database
+    await database.close_database()
+
+
+@pytest.fixture
+def make_scheduler():
+    """Build a Scheduler (not started) over a fresh queue and instance pool."""
+
+    def make(**config) -> Scheduler:
+        return Scheduler(QueueManager(), InstancePool(), CenterConfig(**config))
+
+    return make
@@ -0,0 +1,90 @@
+import pytest
+from starlette.requests import Request
+
+from app.models.task import Task
+from app.services import admission as admission_module
+from app.services.admission import AdmissionController, AdmissionRejected, client_id, tenant_id
+
+
+def request(headers: dict[str, str], host: str = "10.0.0.1") -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": (host, 12345),
+    })
+
+
+def controller(make_scheduler, **config) -> AdmissionController:
+    sched = make_scheduler(**config)
+    return AdmissionController(sched.queue, sched.pool, sched)
+
+
+def fill(admission: AdmissionController, n: int, tenant: str = "default") -> None:
+    for _ in range(n):
+        admission.queue.enqueue(Task(payload={}, tenant=tenant))
+
+
+def test_client_id_ignores_self_declared_client_header():
+    assert client_id(request({"X-Client-Id": "fresh-bucket"})) == "10.0.0.1"
+    assert client_id(request({"X-API-Key": "k1", "X-Client-Id": "other"})) == "k1"
+
+
+def test_tenant_comes_from_api_key_unless_header_is_trusted():
+    keyed = request({"X-API-Key": "k1", "X-Tenant-Id": "someone-else"})
+    assert tenant_id(keyed).startswith("key-")
+    assert tenant_id(keyed, trust_header=True) == tenant_id(keyed)
+
+    declared = request({"X-Tenant-Id": "acme"})
+    assert tenant_id(declared) == "default"
+    assert tenant_id(declared, trust_header=True) == "acme"
+
+
+def test_full_queue_rejected_with_retry_after(make_scheduler):
+    admission = controller(make_scheduler, max_queue_size=10, priority_reserve=0.2, reserve_min_priority=8)
+    fill(admission, 8)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.check_capacity(5)
+    assert rejected.value.status_code == 503
+    assert rejected.value.headers["Retry-After"] == str(admission_module.UNKNOWN_RETRY_AFTER)
+
+    # The reserve stays open to high-priority work until the queue is full
+    admission.check_capacity(8, 2)
+    with pytest.raises(AdmissionRejected):
+        admission.check_capacity(9, 3)
+
+
+def test_rate_limit_per_client(make_scheduler, monkeypatch):
+    admission = controller(make_scheduler, rate_limit_per_client=1, rate_limit_burst=2)
+    now = [100.0]
+    monkeypatch.setattr(admission_module.time, "monotonic", lambda: now[0])
+
+    admission.take_tokens("a", 2)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.take_tokens("a")
+    assert (rejected.value.status_code, rejected.value.retry_after) == (429, 1)
+    # Other clients have their own bucket
+    admission.take_tokens("b")
+
+    now[0] += 1
+    admission.take_tokens("a")
+
+
+def test_rejected_request_spends_no_tokens(make_scheduler):
+    admission = controller(make_scheduler, max_queue_size=1, priority_reserve=0,
+                           rate_limit_per_client=0.001, rate_limit_burst=1)
+    fill(admission, 1)
+    with pytest.raises(AdmissionRejected):
+        admission.admit("a", 5)
+    admission.queue.clear()
+    admission.admit("a", 5)
+
+
+def test_tenant_quota(make_scheduler):
+    admission = controller(make_scheduler, tenant_max_queued=2)
+    fill(admission, 2, "busy")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("c", 5, tenant="busy")
+    assert rejected.value.status_code == 429
+    admission.admit("c", 5, tenant="quiet")
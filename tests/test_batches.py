@@ -0,0 +1,47 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import batches as batches_api
+from app.config import settings
+from app.services.admission import AdmissionController
+from app.services.spool import FileSpool
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(db, make_scheduler, tmp_path):
+    sched = make_scheduler(max_queue_size=5000, rate_limit_burst=5000)
+    app = FastAPI()
+    app.include_router(batches_api.router)
+    app.dependency_overrides[batches_api.get_scheduler] = lambda: sched
+    app.dependency_overrides[batches_api.get_config] = lambda: sched.config
+    app.dependency_overrides[batches_api.get_file_spool] = lambda: FileSpool(str(tmp_path / "spool"))
+    app.dependency_overrides[batches_api.get_admission] = lambda: AdmissionController(sched.queue, sched.pool, sched)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://center") as client:
+        yield client, sched
+
+
+def uploads(n: int) -> list[tuple[str, tuple[str, bytes, str]]]:
+    return [("files", (f"page-{i}.png", f"image {i}".encode(), "image/png")) for i in range(n)]
+
+
+async def test_batch_accepts_more_than_a_thousand_files(client):
+    client, sched = client
+    response = await client.post("/api/batches", files=uploads(1200), data={"priority": "7"})
+
+    assert response.status_code == 200
+    assert response.json()["total"] == 1200
+    assert sched.queue.size() == 1200
+    assert {task.priority for task in sched.queue.get_all()} == {7}
+
+
+async def test_batch_over_the_file_limit_is_rejected(client, monkeypatch):
+    client, sched = client
+    monkeypatch.setattr(settings, "batch_max_files", 10)
+
+    response = await client.post("/api/batches", files=uploads(11))
+
+    assert response.status_code == 400
+    assert sched.queue.size() == 0
@@ -0,0 +1,144 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.task import Task, TaskStatus
+
+pytestmark = pytest.mark.anyio
+
+
+async def save(db, task_id: str, priority: int = 5, created_at: str = "2026-01-01T00:00:00",
+               tenant: str | None = None) -> None:
+    await db.save_task(task_id, "pending", priority, {}, f"{task_id}.pdf", created_at, tenant=tenant)
+    await db.flush()
+
+
+async def lease_owner(db, task_id: str) -> str | None:
+    return (await db.get_task_states([task_id]))[task_id]["lease_owner"]
+
+
+async def test_claim_renew_and_reclaim_expired_leases(db):
+    await save(db, "low", priority=1)
+    await save(db, "high", priority=9)
+    await save(db, "mid", priority=5)
+    now = time.time()
+
+    rows = await db.claim_tasks("r1", 2, now + 30)
+    assert [row["id"] for row in rows] == ["high", "mid"]
+    assert [row["id"] for row in await db.claim_tasks("r2", 5, now + 120)] == ["low"]
+    assert await db.renew_leases("r1", now + 60) == {"high", "mid"}
+
+    # r1 stops renewing: its tasks go back to the pool once the lease is over
+    assert await db.reclaim_expired_leases(now + 31) == 0
+    assert await db.reclaim_expired_leases(now + 61) == 2
+    assert await lease_owner(db, "high") is None
+    assert await lease_owner(db, "low") == "r2"
+    assert [row["id"] for row in await db.claim_tasks("r2", 5, now + 90)] == ["high", "mid"]
+
+
+async def test_claim_shares_tenants_by_weight_and_running_quota(db):
+    for i in range(4):
+        await save(db, f"a{i}", created_at=f"2026-01-01T00:00:0{i}", tenant="a")
+    for i in range(2):
+        await save(db, f"b{i}", created_at=f"2026-01-01T00:01:0{i}", tenant="b")
+    await save(db, "c0", created_at="2026-01-01T00:02:00", tenant="c")
+    now = time.time()
+
+    # Tenant b weighs 2: b0 and b1 tag 0.5 and 1, a0 and c0 tag 1
+    rows = await db.claim_tasks("r1", 4, now + 30, fair_share=True, weights={"b": 2})
+    assert [row["id"] for row in rows] == ["b0", "a0", "b1", "c0"]
+
+    # a already has a0 leased; the quota of 2 leaves it one more
+    rows = await db.claim_tasks("r2", 5, now + 30, fair_share=True, tenant_max_running=2)
+    assert [row["id"] for row in rows] == ["a1"]
+
+
+async def test_claim_orders_by_aged_priority(db):
+    await save(db, "old", priority=3, created_at=(datetime.now() - timedelta(seconds=250)).isoformat())
+    await save(db, "new", priority=5, created_at=datetime.now().isoformat())
+    now = time.time()
+
+    assert [row["id"] for row in await db.claim_tasks("r1", 1, now + 30)] == ["new"]
+    await db.reclaim_expired_leases(now + 31)
+    # "old" has passed at least two 100 s boundaries: it reaches 5 and is older
+    rows = await db.claim_tasks("r1", 1, now + 30, aging_interval=100)
+    assert [row["id"] for row in rows] == ["old"]
+
+
+async def test_unclaimed_tasks_time_out_in_shared_queue(db):
+    await save(db, "stale", created_at=(datetime.now() - timedelta(seconds=700)).isoformat())
+    await save(db, "fresh", created_at=datetime.now().isoformat())
+    await save(db, "leased", priority=9, created_at=(datetime.now() - timedelta(seconds=700)).isoformat())
+    await db.claim_tasks("r1", 1, time.time() + 30)
+
+    assert await db.timeout_unclaimed_tasks(600) == ["stale"]
+    row = await db.get_task("stale")
+    assert (row["status"], row["error"]) == ("timeout", "Queue timeout")
+    assert (await db.get_task("fresh"))["status"] == "pending"
+
+
+async def test_reclaim_cancels_shards_with_their_parent(db):
+    await save(db, "parent")
+    now = time.time()
+    await db.claim_tasks("r1", 1, now + 30)
+    await db.save_task("shard", "pending", 5, {}, "parent.pdf", "2026-01-01T00:00:00",
+                       parent_id="parent", shard_index=0, lease_owner="r1")
+    await db.flush()
+
+    assert await db.reclaim_expired_leases(now + 31) == 1
+    states = await db.get_task_states(["parent", "shard"])
+    assert states["parent"]["status"] == "pending"
+    assert states["shard"]["status"] == "cancelled"
+
+
+async def test_stale_replica_status_writes_are_fenced(db):
+    await save(db, "a")
+    now = time.time()
+    await db.claim_tasks("r1", 1, now + 30)
+    await db.reclaim_expired_leases(now + 31)
+    await db.claim_tasks("r2", 1, now + 60)
+
+    # r1 finishes late, after r2 took the task over: its write is dropped
+    db.set_lease_owner("r1")
+    await db.update_task_status("a", "completed", completed_at="t1")
+    await db.flush()
+    row = await db.get_task("a")
+    assert (row["status"], row["completed_at"]) == ("pending", None)
+
+    db.set_lease_owner("r2")
+    await db.update_task_status("a", "running", started_at="t2")
+    await db.flush()
+    assert (await db.get_task("a"))["status"] == "running"
+
+
+async def test_abort_cancels_running_request(db, make_scheduler):
+    sched = make_scheduler()
+    instance = sched.pool.add_instance("http://mineru.test", "a")
+    submitted, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def hanging_submit(client, task, backend):
+        submitted.set()
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    sched._submit = hanging_submit
+    running = Task(payload={"file_name": "a.pdf"})
+    queued = Task(payload={"file_name": "b.pdf"})
+    await sched._dispatch_task(running, instance.id)
+    sched.enqueue(queued)
+    await submitted.wait()
+    assert sched.held_task_ids() == {running.id, queued.id}
+
+    aborted = await sched.abort_tasks([running.id, queued.id])
+
+    assert {task.id for task in aborted} == {running.id, queued.id}
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert sched.held_task_ids() == set()
+    assert running.status == TaskStatus.PENDING and running.instance_id is None
+    await asyncio.sleep(0)
+    assert instance.active_tasks == 0
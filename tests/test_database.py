@@ -0,0 +1,106 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import tasks as tasks_api
+from app.models.task import Task
+from app.services import database
+
+pytestmark = pytest.mark.anyio
+
+
+async def save(db, task_id: str, status: str = "pending") -> None:
+    await db.save_task(task_id, status, 5, {}, f"{task_id}.pdf", "2026-01-01T00:00:00")
+
+
+@pytest.fixture
+def failing_commit(db, monkeypatch):
+    """Make the next n commits of the shared connection fail."""
+    connection = database._conn
+    commit = connection.commit
+    remaining = {"n": 0}
+
+    async def flaky_commit():
+        if remaining["n"]:
+            remaining["n"] -= 1
+            raise RuntimeError("disk I/O error")
+        await commit()
+
+    monkeypatch.setattr(connection, "commit", flaky_commit)
+
+    def fail(n: int = 1) -> None:
+        remaining["n"] = n
+
+    return fail
+
+
+async def test_write_behind_merges_updates(db):
+    await save(db, "a")
+    await db.update_task_status("a", "running", started_at="t1")
+    await db.update_task_status("a", "completed", completed_at="t2")
+    await db.flush()
+    row = await db.get_task("a")
+    assert (row["status"], row["started_at"], row["completed_at"]) == ("completed", "t1", "t2")
+
+
+async def test_failed_flush_keeps_writes_for_retry(db, failing_commit):
+    await save(db, "a")
+    await db.flush()
+
+    failing_commit()
+    await db.update_task_status("a", "running", started_at="t1", instance_id="i1")
+    await save(db, "b")
+    assert await database._writer.flush() is False
+    assert database._writer.pending() == 2
+
+    # Written while the failed batch waits: takes precedence over it
+    await db.update_task_status("a", "completed", completed_at="t2")
+    await db.update_task_status("b", "running")
+    assert await database._writer.flush() is True
+
+    a, b = await db.get_task("a"), await db.get_task("b")
+    assert (a["status"], a["started_at"], a["instance_id"], a["completed_at"]) == ("completed", "t1", "i1", "t2")
+    assert b["status"] == "running"
+    assert database._writer.pending() == 0
+
+
+async def test_flush_loop_retries_after_failure(db, failing_commit, monkeypatch):
+    monkeypatch.setattr(database, "FLUSH_RETRY_DELAY", 0.01)
+    failing_commit(2)
+    await save(db, "a")
+    # Two failed attempts, then the background loop commits it
+    await asyncio.sleep(0.3)
+    assert database._writer.pending() == 0
+    assert (await db.get_task("a"))["status"] == "pending"
+
+
+async def test_task_stats_count_retrying(db):
+    await save(db, "a")
+    await save(db, "b", "retrying")
+    await save(db, "c", "timeout")
+    stats = await db.get_task_stats()
+    assert (stats["total"], stats["pending"], stats["retrying"], stats["failed"]) == (3, 1, 1, 1)
+
+
+async def test_bulk_action_reports_unsaved_tasks(db, failing_commit, make_scheduler):
+    sched = make_scheduler()
+    task = Task(payload={"file_name": "a.pdf"})
+    await save(db, task.id)
+    await db.flush()
+    sched.enqueue(task)
+    app = FastAPI()
+    app.include_router(tasks_api.router)
+    app.dependency_overrides[tasks_api.get_scheduler] = lambda: sched
+    app.dependency_overrides[tasks_api.get_scheduler_proxy] = lambda: None
+
+    # Fails the handler's flush and the flusher's attempts around it
+    failing_commit(100)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://center") as client:
+        response = await client.post("/api/tasks/bulk", json={"action": "set_priority", "task_ids": [task.id],
+                                                                "priority": 9})
+    failing_commit(0)
+
+    assert response.json()["task_ids"] == [task.id]
+    assert response.json()["failed"] == [task.id]
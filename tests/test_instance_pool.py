@@ -0,0 +1,59 @@
+import time
+
+import httpx
+import pytest
+
+from app.api import metrics as metrics_api
+from app.models.instance import BreakerState, InstanceStatus
+from app.services import circuit_breaker
+
+
+def test_backend_label_stays_plain_after_update(make_scheduler):
+    sched = make_scheduler()
+    instance = sched.pool.add_instance("http://mineru.test", "a")
+    sched.pool.update_instance(instance.id, backend="vllm-async-engine")
+
+    metrics_api.collect(sched.queue, sched.pool, sched)
+
+    assert f'instance_id="{instance.id}",name="a",backend="vllm-async-engine"' in (
+        "\n".join(metrics_api.INSTANCE_INFO.render())
+    )
+
+
+@pytest.mark.anyio
+async def test_probe_revives_instance_with_full_slots_as_busy(make_scheduler, monkeypatch):
+    pool = make_scheduler().pool
+    instance = pool.add_instance("http://mineru.test", "a", max_concurrency=1)
+    pool.acquire_slot(instance.id, "running-task")
+    pool.set_status(instance.id, InstanceStatus.OFFLINE)
+
+    class HealthyClient:
+        async def get(self, url, timeout):
+            return httpx.Response(200)
+
+    monkeypatch.setattr(pool.clients, "http_client", lambda url: HealthyClient())
+    await pool._probe(instance, timeout=1, interval=30)
+
+    assert instance.status == InstanceStatus.BUSY
+
+
+def test_half_open_breaker_waits_for_its_probe(make_scheduler):
+    sched = make_scheduler(breaker_consecutive_failures=1)
+    pool, config = sched.pool, sched.config
+    instance = pool.add_instance("http://mineru.test", "a", max_concurrency=4)
+    for task_id in ("stale-ok", "stale-failed", "tripping"):
+        pool.acquire_slot(instance.id, task_id)
+    pool.record_outcome(instance.id, "tripping", False, config)
+    assert instance.breaker_state == BreakerState.OPEN
+
+    assert circuit_breaker.allows_dispatch(instance, now=time.monotonic() + config.breaker_open_seconds)
+    pool.acquire_slot(instance.id, "probe")
+
+    # Tasks sent before the breaker tripped finish while the probe runs
+    pool.record_outcome(instance.id, "stale-ok", True, config)
+    pool.record_outcome(instance.id, "stale-failed", False, config)
+    assert instance.breaker_state == BreakerState.HALF_OPEN
+    assert instance.breaker_probe_task_id == "probe"
+
+    pool.record_outcome(instance.id, "probe", True, config)
+    assert instance.breaker_state == BreakerState.CLOSED
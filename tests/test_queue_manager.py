@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+from app.models.task import Task
+from app.services import queue_manager as queue_module
+from app.services.queue_manager import QueueManager
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def task(name: str, tenant: str = "default", priority: int = 5, at: float = 0.0) -> Task:
+    return Task(payload={"name": name}, tenant=tenant, priority=priority, created_at=T0 + timedelta(seconds=at))
+
+
+def names(queue: QueueManager) -> list[str]:
+    return [t.payload["name"] for t in queue.get_all()]
+
+
+def drain(queue: QueueManager) -> list[str]:
+    order = []
+    while (t := queue.dequeue()) is not None:
+        order.append(t.payload["name"])
+    return order
+
+
+def test_priority_then_fifo():
+    queue = QueueManager()
+    queue.enqueue(task("low", priority=1, at=0))
+    queue.enqueue(task("a", at=1))
+    queue.enqueue(task("b", at=2))
+    queue.enqueue(task("high", priority=9, at=3))
+    assert drain(queue) == ["high", "a", "b", "low"]
+
+
+def test_fair_share_interleaves_tenants_within_priority():
+    queue = QueueManager()
+    queue.set_fair_share(True)
+    for i in range(4):
+        queue.enqueue(task(f"bulk{i}", "bulk", at=i))
+    queue.enqueue(task("small0", "small", at=10))
+    queue.enqueue(task("urgent", "bulk", priority=9, at=11))
+
+    assert names(queue) == ["urgent", "bulk0", "small0", "bulk1", "bulk2", "bulk3"]
+    assert queue.get_position(queue.get_all()[2].id) == 3
+
+
+def test_fair_share_weights_and_late_tenant():
+    queue = QueueManager()
+    queue.set_fair_share(True, {"heavy": 2})
+    for i in range(4):
+        queue.enqueue(task(f"h{i}", "heavy", at=i))
+        queue.enqueue(task(f"l{i}", "light", at=i))
+    assert queue.dequeue().payload["name"] == "h0"
+
+    # A tenant arriving later starts at the current round, not behind the backlog
+    queue.enqueue(task("new0", "new", at=20))
+    assert names(queue) == ["l0", "h1", "h2", "new0", "l1", "h3", "l2", "l3"]
+
+
+def test_dequeue_skips_tenants():
+    queue = QueueManager()
+    queue.set_fair_share(True)
+    for i in range(3):
+        queue.enqueue(task(f"a{i}", "a", at=i))
+    queue.enqueue(task("b0", "b", at=5))
+    assert queue.dequeue({"a"}).payload["name"] == "b0"
+    assert queue.dequeue({"a"}) is None
+    assert queue.dequeue().payload["name"] == "a0"
+    assert queue.count_by_tenant() == {"a": 2}
+
+
+def test_fair_share_state_is_dropped_when_drained():
+    queue = QueueManager()
+    queue.set_fair_share(True)
+    queue.set_aging(60)
+    for i in range(5):
+        queue.enqueue(task(f"t{i}", f"tenant{i % 2}", priority=1 + i % 3, at=i))
+    drain(queue)
+    assert not (queue._round or queue._tenant_round or queue._tenant_counts
+                or queue._fair_order or queue._aged_at or queue._tenant_entries)
+
+
+def test_toggling_fair_share_reorders_backlog():
+    queue = QueueManager()
+    for i in range(3):
+        queue.enqueue(task(f"a{i}", "a", at=i))
+    queue.enqueue(task("b0", "b", at=3))
+    assert names(queue) == ["a0", "a1", "a2", "b0"]
+    queue.set_fair_share(True)
+    assert names(queue) == ["a0", "b0", "a1", "a2"]
+    queue.set_fair_share(False)
+    assert names(queue) == ["a0", "a1", "a2", "b0"]
+
+
+def test_aging_lifts_waiting_tasks_without_resorting(monkeypatch):
+    queue = QueueManager()
+    queue.set_aging(60)
+    old = task("old-p1", priority=1, at=0)
+    queue.enqueue(old)
+    queue.enqueue(task("new-p9", priority=9, at=10 * 60))
+    queue.enqueue(task("new-p10", priority=10, at=10 * 60))
+    # Waited 10 intervals: 1 + 10 > 9, capped at 10 and ahead of the newer priority-10 task
+    assert names(queue) == ["old-p1", "new-p10", "new-p9"]
+
+    monkeypatch.setattr(queue_module.time, "time", lambda: (T0 + timedelta(seconds=10 * 60)).timestamp())
+    assert queue.effective_priority(old) == 10
+    monkeypatch.setattr(queue_module.time, "time", lambda: (T0 + timedelta(seconds=3 * 60)).timestamp())
+    assert queue.effective_priority(old) == 4
+    assert names(queue) == ["old-p1", "new-p10", "new-p9"]
+
+    queue.set_aging(0)
+    assert names(queue) == ["new-p10", "new-p9", "old-p1"]
+    assert queue.effective_priority(old) == 1
+
+
+def test_aging_keeps_fair_share_across_creation_buckets():
+    queue = QueueManager()
+    queue.set_fair_share(True)
+    queue.set_aging(60)
+    for i in range(20):
+        queue.enqueue(task(f"burst{i}", "burst", at=i))
+    # Arrives a whole interval later, but still gets the next fair turn
+    queue.enqueue(task("late0", "late", at=90))
+    queue.enqueue(task("late1", "late", at=91))
+    order = names(queue)
+    assert order[:4] == ["burst0", "late0", "burst1", "late1"]
+
+    # Priorities still age against each other: a priority-4 task that has
+    # waited two intervals goes ahead of fresh priority-5 work
+    queue.enqueue(task("aged-p4", "other", priority=4, at=-120))
+    assert names(queue)[0] == "aged-p4"
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.config import CenterConfig
+from app.models.task import Task, TaskStatus
+from app.services.instance_pool import InstancePool
+from app.services.queue_manager import QueueManager
+from app.services.scheduler import Scheduler
+from app.services.spool import FileSpool
+
+pytestmark = pytest.mark.anyio
+
+
+async def queue_task(db, sched: Scheduler, spool: FileSpool, created_at: datetime) -> Task:
+    file_ref, size, pages = await spool.save_bytes(b"%PDF test")
+    task = Task(payload={"file_name": "a.pdf", "file_ref": file_ref, "file_size": size}, created_at=created_at)
+    await db.save_task(task.id, task.status, task.priority, task.payload, "a.pdf", created_at.isoformat())
+    sched.enqueue(task)
+    return task
+
+
+def scheduler_with_spool(spool: FileSpool, **config) -> Scheduler:
+    return Scheduler(QueueManager(), InstancePool(), CenterConfig(**config), spool=spool)
+
+
+async def test_recover_requeues_pending_tasks_in_order(db, tmp_path):
+    spool = FileSpool(str(tmp_path / "spool"))
+    first = scheduler_with_spool(spool)
+    now = datetime.now()
+    tasks = [await queue_task(db, first, spool, now + timedelta(seconds=i)) for i in range(3)]
+
+    second = scheduler_with_spool(spool)
+    summary = await second.recover_tasks()
+
+    assert summary["pending"] == 3
+    assert [task.id for task in second.queue.get_all()] == [task.id for task in tasks]
+
+
+async def test_queue_timeout_is_persisted_and_not_recovered(db, tmp_path):
+    spool = FileSpool(str(tmp_path / "spool"))
+    sched = scheduler_with_spool(spool, queue_timeout=60)
+    task = await queue_task(db, sched, spool, datetime.now() - timedelta(seconds=120))
+
+    await sched._check_timeouts()
+    await db.flush()
+
+    assert task.status == TaskStatus.TIMEOUT
+    assert task.id in {t.id for t in sched.get_all_failed_tasks()}
+    row = await db.get_task(task.id)
+    assert row["status"] == TaskStatus.TIMEOUT.value
+    assert row["error"] == "Queue timeout"
+
+    restarted = scheduler_with_spool(spool, queue_timeout=60)
+    summary = await restarted.recover_tasks()
+    assert summary["pending"] == 0
+    assert restarted.queue.size() == 0
@@ -0,0 +1,23 @@
+import pytest
+
+from app.services.result_cache import ResultCache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_shared_cache_sees_entries_written_by_other_processes(tmp_path):
+    root = str(tmp_path / "cache")
+    scheduler_process = ResultCache(root, shared=True)
+    worker = ResultCache(root, shared=True)
+    private = ResultCache(root)
+
+    await scheduler_process.put("abc-1", {"md": "x"})
+    await scheduler_process.put("abc-2", {"md": "y"})
+
+    assert not private.has("abc-1")
+    assert await worker.get("abc-1") == {"md": "x"}
+    assert worker.get_stats()["hits"] == 1
+
+    assert worker.invalidate_file("abc") == 2
+    assert not scheduler_process.has("abc-1")
+    assert await scheduler_process.get("abc-2") is None
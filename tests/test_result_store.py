@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from app.services import database
+from app.services.result_store import ResultStore
+
+pytestmark = pytest.mark.anyio
+
+
+def result(text: str) -> dict:
+    return {"results": {"doc": {"md_content": text}}}
+
+
+async def test_put_replacing_a_result_counts_it_once(db, tmp_path):
+    store = ResultStore(str(tmp_path), ttl=0)
+    await store.put("task-1", result("first"))
+    await store.put("task-1", result("second, a longer result"))
+
+    stats = store.get_stats()
+    assert (stats["entries"], stats["bytes"]) == await database.get_result_store_size()
+    assert stats["entries"] == 1
+
+
+async def test_prune_loop_drops_expired_results(db, tmp_path):
+    store = ResultStore(str(tmp_path), ttl=0.05)
+    await store.put("task-1", result("old"))
+
+    loop = asyncio.create_task(store.prune_loop(interval=0.02))
+    await asyncio.sleep(0.2)
+    loop.cancel()
+    await loop
+
+    assert store.get_stats()["entries"] == 0
+    assert await database.get_result_index("task-1") is None
@@ -0,0 +1,66 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import tasks as tasks_api
+from app.models.task import Task, TaskStatus
+from app.services.scheduler_proxy import SchedulerProxy
+
+pytestmark = pytest.mark.anyio
+
+
+def app_for(sched, proxy: SchedulerProxy | None) -> FastAPI:
+    app = FastAPI()
+    app.include_router(tasks_api.router)
+    app.dependency_overrides[tasks_api.get_scheduler] = lambda: sched
+    app.dependency_overrides[tasks_api.get_queue_manager] = lambda: sched.queue
+    app.dependency_overrides[tasks_api.get_scheduler_proxy] = lambda: proxy
+    return app
+
+
+@pytest.fixture
+async def worker(db, make_scheduler):
+    """A non-dispatching worker (empty scheduler) forwarding to a scheduler process app."""
+    scheduler_process = make_scheduler()
+    upstream = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app_for(scheduler_process, None)), base_url="http://scheduler"
+    )
+    proxy = SchedulerProxy("http://scheduler", client=upstream)
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app_for(make_scheduler(), proxy)), base_url="http://worker"
+    )
+    yield client, scheduler_process
+    await client.aclose()
+    await proxy.aclose()
+
+
+async def failed_task(db, sched) -> Task:
+    task = Task(payload={"file_name": "a.pdf"}, priority=3)
+    await db.save_task(task.id, task.status, task.priority, task.payload, "a.pdf", task.created_at.isoformat())
+    await sched._finish_task(task, TaskStatus.FAILED, error="boom")
+    return task
+
+
+async def test_worker_lists_and_retries_failed_tasks_of_scheduler_process(db, worker):
+    client, sched = worker
+    first, second = await failed_task(db, sched), await failed_task(db, sched)
+
+    listed = (await client.get("/api/tasks/failed/list")).json()
+    assert {task["task_id"] for task in listed["tasks"]} == {first.id, second.id}
+
+    assert (await client.post(f"/api/tasks/{first.id}/retry")).status_code == 200
+    assert (await client.post("/api/tasks/missing/retry")).status_code == 404
+    assert [task.id for task in sched.queue.get_all()] == [first.id]
+
+    assert (await client.post("/api/tasks/retry-all")).json()["count"] == 1
+    assert {task.id for task in sched.queue.get_all()} == {first.id, second.id}
+
+
+async def test_worker_bulk_actions_reach_scheduler_process(db, worker):
+    client, sched = worker
+    task = await failed_task(db, sched)
+    await sched.retry_failed_task(task.id)
+
+    response = await client.post("/api/tasks/bulk", json={"action": "set_priority", "status": "pending", "priority": 9})
+    assert response.json()["task_ids"] == [task.id]
+    assert sched.queue.get(task.id).priority == 9
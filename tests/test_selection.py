@@ -0,0 +1,31 @@
+from app.models.instance import MinerUInstance
+from app.services.selection import EwmaLatencyPolicy
+
+
+def instance(name: str, latency: float | None = None, per_page: float | None = None,
+             active: int = 0, slots: int = 1) -> MinerUInstance:
+    return MinerUInstance(
+        name=name, url=f"http://{name}", max_concurrency=slots,
+        current_task_ids={f"{name}-{i}" for i in range(active)},
+        ewma_latency=latency, ewma_seconds_per_page=per_page,
+    )
+
+
+def test_ewma_weighs_latency_by_tasks_ahead_per_slot():
+    busy = instance("busy", latency=10, active=3, slots=4)
+    slower = instance("slower", latency=12, slots=4)
+    assert EwmaLatencyPolicy().select([busy, slower]) is slower
+
+
+def test_ewma_compares_instances_in_one_unit():
+    # 1 s/page but 100 s per task, against 5 s per task without page counts
+    paged = instance("paged", latency=100, per_page=1)
+    unpaged = instance("unpaged", latency=5)
+    assert EwmaLatencyPolicy().select([paged, unpaged]) is unpaged
+
+    fast_pages = instance("fast", latency=100, per_page=0.5)
+    assert EwmaLatencyPolicy().select([paged, fast_pages]) is fast_pages
+
+
+def test_ewma_tries_unmeasured_instances_first():
+    assert EwmaLatencyPolicy().select([instance("a", latency=1), instance("new")]).name == "new"
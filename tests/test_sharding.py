@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.task import Task, TaskStatus
+from app.services.sharding import merge_shard_results, plan_shards
+
+pytestmark = pytest.mark.anyio
+
+
+def shard_result(start: int, end: int) -> dict:
+    return {"results": {"doc": {
+        "md_content": f"pages {start}-{end}",
+        "content_list": [{"page_idx": i - start, "text": str(i)} for i in range(start, end + 1)],
+    }}}
+
+
+def test_plan_shards_splits_page_range():
+    payload = {"file_pages": 250, "start_page_id": "0", "end_page_id": "99999"}
+    assert plan_shards(payload, 100, 100) == [(0, 99), (100, 199), (200, 249)]
+    assert plan_shards(payload, 0, 100) == []
+    assert plan_shards({"file_pages": 50}, 100, 100) == []
+
+
+def test_merge_shard_results_in_page_order():
+    merged = merge_shard_results([shard_result(0, 1), shard_result(2, 3)], [(0, 1), (2, 3)])
+    doc = merged["results"]["doc"]
+    assert doc["md_content"] == "pages 0-1\n\npages 2-3"
+    assert [item["page_idx"] for item in doc["content_list"]] == [0, 1, 2, 3]
+
+
+async def split(sched, created_at: datetime) -> Task:
+    parent = Task(payload={"file_name": "big.pdf", "file_pages": 3}, created_at=created_at)
+    sched.enqueue(parent)
+    assert sched.queue.dequeue() is parent
+    assert await sched._split(parent)
+    return parent
+
+
+async def test_shards_complete_parent_with_merged_result(db, make_scheduler):
+    sched = make_scheduler(shard_min_pages=2, shard_pages=1)
+    parent = await split(sched, datetime.now())
+    children = sched.queue.get_all()
+    assert [child.shard_index for child in children] == [0, 1, 2]
+
+    for child in children:
+        sched.queue.remove(child.id)
+        child.started_at = datetime.now()
+        await sched._finish_task(child, TaskStatus.COMPLETED, result=shard_result(child.shard_index, child.shard_index))
+
+    assert parent.status == TaskStatus.COMPLETED
+    assert parent.result["results"]["doc"]["md_content"] == "pages 0-0\n\npages 1-1\n\npages 2-2"
+
+
+async def test_shards_keep_parent_place_but_time_out_from_their_own_enqueue(db, make_scheduler):
+    sched = make_scheduler(shard_min_pages=2, shard_pages=1, queue_timeout=60)
+    old = datetime.now() - timedelta(seconds=120)
+    parent = await split(sched, old)
+    # Queued after the shards but created later: stays behind them
+    later = Task(payload={"file_name": "small.pdf"}, created_at=old + timedelta(seconds=1))
+    sched.enqueue(later)
+    assert [task.parent_id for task in sched.queue.get_all()] == [parent.id] * 3 + [None]
+
+    await sched._check_timeouts()
+
+    assert [task.parent_id for task in sched.queue.get_all()] == [parent.id] * 3
+    assert later.status == TaskStatus.TIMEOUT
+    assert parent.status == TaskStatus.RUNNING
+
+
+async def test_shard_queue_timeout_fails_parent(db, make_scheduler):
+    sched = make_scheduler(shard_min_pages=2, shard_pages=1, queue_timeout=60)
+    parent = await split(sched, datetime.now())
+    stuck = sched.queue.get_all()[0]
+    stuck.created_at -= timedelta(seconds=120)
+
+    await sched._check_timeouts()
+
+    assert stuck.status == TaskStatus.TIMEOUT
+    assert parent.status == TaskStatus.FAILED
+    assert sched.queue.size() == 0
+
+
+async def test_shards_belong_to_parent_batch_but_are_not_counted(db, make_scheduler):
+    sched = make_scheduler(shard_min_pages=2, shard_pages=1)
+    parent = Task(payload={"file_name": "big.pdf", "file_pages": 3}, batch_id="b1")
+    await db.save_batch("b1", None, parent.created_at.isoformat(), {}, [parent])
+    sched.enqueue(parent)
+    assert sched.queue.dequeue() is parent
+    assert await sched._split(parent)
+
+    children = sched.queue.get_all()
+    assert {child.batch_id for child in children} == {"b1"}
+    assert {(await db.get_task(child.id))["batch_id"] for child in children} == {"b1"}
+
+    assert (await db.get_batch("b1"))["counts"] == {"running": 1}
+    assert [task["id"] for task in await db.get_batch_tasks("b1")] == [parent.id]
+    assert [task.id for task in sched.select_tasks(batch_id="b1")] == [parent.id]
@@ -33,7 +33,8 @@ export const tasksApi = {
 export const instancesApi = {
   list: () => api.get('/instances'),
 
-  add: (name, url, backend = 'pipeline') => api.post('/instances', { name, url, backend }),
+  add: (name, url, backend = 'pipeline', maxConcurrency = null) =>
+    api.post('/instances', { name, url, backend, max_concurrency: maxConcurrency || null }),
 
   update: (instanceId, data) => api.patch(`/instances/${instanceId}`, data),
 
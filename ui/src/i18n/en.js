@@ -33,6 +33,7 @@ export default {
     idle: 'IDLE',
     busy: 'BUSY',
     offline: 'OFFLINE',
+    slots: 'SLOTS',
     instanceStatus: 'INSTANCE.STATUS'
   },
   status: {
@@ -70,7 +71,10 @@ export default {
     backendVllm: 'vLLM Async Engine (GPU)',
     editNode: 'EDIT.SERVER.NODE',
     updateSuccess: 'Node updated',
-    cannotEditUrl: 'Cannot edit URL while task is running'
+    cannotEditUrl: 'Cannot edit URL while task is running',
+    breaker: 'BREAKER',
+    maxConcurrency: 'MAX.CONCURRENCY',
+    maxConcurrencyHint: 'Leave empty for the backend default (pipeline 1, vLLM 4)'
   },
   queue: {
     title: 'TASK.QUEUE',
@@ -33,6 +33,7 @@ export default {
     idle: '空闲',
     busy: '忙碌',
     offline: '离线',
+    slots: '并发槽位',
     instanceStatus: '实例状态'
   },
   status: {
@@ -70,7 +71,10 @@ export default {
     backendVllm: 'vLLM Async Engine (GPU)',
     editNode: '编辑服务器节点',
     updateSuccess: '节点更新成功',
-    cannotEditUrl: '运行任务中，无法修改地址'
+    cannotEditUrl: '运行任务中，无法修改地址',
+    breaker: '熔断',
+    maxConcurrency: '最大并发',
+    maxConcurrencyHint: '留空使用后端默认值（Pipeline 1，vLLM 4）'
   },
   queue: {
     title: '任务队列',
@@ -5,9 +5,9 @@ import { statsApi, instancesApi, configApi, tasksApi, createWebSocket } from '..
 export const useMainStore = defineStore('main', () => {
   // State
   const stats = ref({
-    queue: { pending: 0, running: 0 },
+    queue: { pending: 0, running: 0, retrying: 0 },
     tasks: { total: 0, completed: 0, failed: 0 },
-    instances: { total: 0, idle: 0, busy: 0, offline: 0 }
+    instances: { total: 0, idle: 0, busy: 0, offline: 0, slots_used: 0, slots_total: 0 }
   })
 
   const instances = ref([])
@@ -84,9 +84,9 @@ export const useMainStore = defineStore('main', () => {
     }
   }
 
-  async function addInstance(name, url, backend = 'pipeline') {
+  async function addInstance(name, url, backend = 'pipeline', maxConcurrency = null) {
     try {
-      await instancesApi.add(name, url, backend)
+      await instancesApi.add(name, url, backend, maxConcurrency)
       await fetchInstances()
       return true
     } catch (error) {
@@ -132,25 +132,61 @@ export const useMainStore = defineStore('main', () => {
     }
   }
 
+  // Stats WebSocket: a full snapshot on connect, then diffs keyed by id
+  const KEYED_SECTIONS = ['instances', 'queued_tasks', 'running_tasks', 'failed_tasks']
+  let wsState = null
+
+  function applySnapshot(data) {
+    wsState = { queue: data.queue, tasks: data.tasks }
+    for (const key of KEYED_SECTIONS) {
+      wsState[key] = new Map((data[key] || []).map(item => [item.id, item]))
+    }
+  }
+
+  function applyDiff(data) {
+    if (data.queue) wsState.queue = data.queue
+    if (data.tasks) wsState.tasks = data.tasks
+    for (const key of KEYED_SECTIONS) {
+      const change = data[key]
+      if (!change) continue
+      const items = wsState[key]
+      for (const id of change.remove) items.delete(id)
+      for (const item of change.upsert) items.set(item.id, item)
+      wsState[key] = new Map(change.order.map(id => [id, items.get(id)]))
+    }
+  }
+
+  function publishWsState() {
+    const instanceList = [...wsState.instances.values()]
+    const enabled = instanceList.filter(i => i.enabled)
+    stats.value = {
+      queue: wsState.queue,
+      tasks: wsState.tasks,
+      instances: {
+        total: instanceList.length,
+        idle: instanceList.filter(i => i.status === 'idle' && i.enabled).length,
+        busy: instanceList.filter(i => i.status === 'busy').length,
+        offline: instanceList.filter(i => i.status === 'offline' || i.status === 'error').length,
+        slots_used: enabled.reduce((sum, i) => sum + (i.active_tasks || 0), 0),
+        slots_total: enabled.reduce((sum, i) => sum + (i.max_concurrency || 1), 0)
+      }
+    }
+    instances.value = instanceList
+    queuedTasks.value = [...wsState.queued_tasks.values()]
+    runningTasks.value = [...wsState.running_tasks.values()]
+    failedTasks.value = [...wsState.failed_tasks.values()]
+  }
+
   function connectWebSocket() {
     ws = createWebSocket(
       (data) => {
         wsConnected.value = true
-        if (data.type === 'stats' && data.data) {
-          stats.value = {
-            queue: data.data.queue,
-            tasks: data.data.tasks,
-            instances: {
-              total: data.data.instances.length,
-              idle: data.data.instances.filter(i => i.status === 'idle' && i.enabled).length,
-              busy: data.data.instances.filter(i => i.status === 'busy').length,
-              offline: data.data.instances.filter(i => i.status === 'offline' || i.status === 'error').length
-            }
-          }
-          instances.value = data.data.instances
-          queuedTasks.value = data.data.queued_tasks || []
-          runningTasks.value = data.data.running_tasks || []
-          failedTasks.value = data.data.failed_tasks || []
+        if (data.type === 'snapshot' && data.data) {
+          applySnapshot(data.data)
+          publishWsState()
+        } else if (data.type === 'diff' && data.data && wsState) {
+          applyDiff(data.data)
+          publishWsState()
         }
       },
       () => {